@@ -0,0 +1,63 @@
+"""
+Benchmark clean-upu danych ofert: czas i pamięć na 100 tys. wierszy.
+
+    python benchmark_cleanup.py --rows 100000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from cleanup import clean_offers
+from get_data_mulithreaded import empty_offer
+
+
+def synthetic_records(rows, seed=0):
+    """Rekordy w formacie parse_offer z losowymi, ale realistycznymi wartościami."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        record = empty_offer(f"https://www.otodom.pl/pl/oferta/mieszkanie-{i}-ID{i:06d}")
+        area = rng.uniform(20, 150)
+        price = int(area * rng.uniform(9000, 30000))
+        floor = rng.choice(["parter", "1", "2", "3", "5", "> 10", "brak informacji"])
+        record.update({
+            "Tytuł oferty": f"Mieszkanie {rng.randint(1, 6)}-pokojowe, Warszawa {i}",
+            "Cena": f"{price:,}".replace(",", " "),
+            "Powierzchnia": f"{area:.2f}".replace(".", ","),
+            "Cena za m²": round(price / area, 2),
+            "Liczba pokoi": str(rng.randint(1, 6)),
+            "Rynek": rng.choice(["pierwotny", "wtórny"]),
+            "Piętro": f"{floor}/{rng.randint(1, 20)}" if rng.random() < 0.9 else floor,
+            "Okna": rng.choice(["plastikowe", "drewniane", "aluminiowe", "brak informacji"]),
+            "Ogrzewanie": rng.choice(["miejskie", "gazowe", "elektryczne", "brak informacji"]),
+            "Rok budowy": str(rng.randint(1900, 2026)),
+            "Czynsz": f"{rng.randint(300, 1500)} zł",
+            "Opis": "Przestronne mieszkanie z balkonem. " * rng.randint(5, 40),
+            "Szerokość geograficzna": f"{rng.uniform(52.1, 52.35):.6f}",
+            "Długość geograficzna": f"{rng.uniform(20.85, 21.25):.6f}",
+        })
+        records.append(record)
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark clean_offers")
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    records = synthetic_records(args.rows)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    data_set = clean_offers(records)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_100k = 100_000 / args.rows
+    print(f"wiersze:            {args.rows}")
+    print(f"czas:               {elapsed:.2f} s ({elapsed * per_100k:.2f} s / 100 tys. wierszy)")
+    print(f"szczyt alokacji:    {peak / 2**20:.1f} MiB ({peak * per_100k / 2**20:.1f} MiB / 100 tys. wierszy)")
+    print(f"rozmiar DataFrame:  {data_set.memory_usage(deep=True).sum() / 2**20:.1f} MiB")
+    print(data_set.dtypes.to_string())
@@ -0,0 +1,133 @@
+"""
+Benchmark backendów parsowania HTML na zapisanym korpusie stron otodom.
+
+Korpus to katalog z podkatalogami listing/ (strony wyników) i detail/ (strony ofert).
+Nagranie korpusu:
+    python benchmark_parsers.py --record --pages 3 --offers 100
+Pomiar:
+    python benchmark_parsers.py --corpus corpus
+"""
+import argparse
+import os
+import time
+
+import http_client
+from get_data_mulithreaded import empty_offer, parse_offer_dom
+from get_offers import extract_offer_links, listing_url
+from get_price_update import extract_price
+from offer_json import parse_offer_json
+from parsers import available_backends
+
+REFERENCE_BACKEND = "html5lib"
+
+
+def record_corpus(corpus_dir, pages, offers):
+    """Zapisuje strony wyników i ofert do katalogu korpusu."""
+    os.makedirs(os.path.join(corpus_dir, "listing"), exist_ok=True)
+    os.makedirs(os.path.join(corpus_dir, "detail"), exist_ok=True)
+
+    links = []
+    for page in range(pages):
+        r = http_client.get(listing_url(page + 1))
+        r.raise_for_status()
+        with open(os.path.join(corpus_dir, "listing", f"page_{page+1}.html"), "wb") as f:
+            f.write(r.content)
+        links.extend(extract_offer_links(r.content, "html.parser"))
+
+    for oferta in links[:offers]:
+        r = http_client.get(http_client.offer_url(oferta))
+        if r.status_code != 200:
+            continue
+        with open(os.path.join(corpus_dir, "detail", oferta.rstrip("/").split("/")[-1] + ".html"), "wb") as f:
+            f.write(r.content)
+
+
+def load_corpus(corpus_dir, kind):
+    directory = os.path.join(corpus_dir, kind)
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as f:
+            pages.append((name, f.read()))
+    return pages
+
+
+def run_extractor(extractor, pages, backend):
+    """Uruchamia ekstraktor na wszystkich stronach, zwraca (wyniki, strony/s)."""
+    start = time.perf_counter()
+    results = [extractor(name, content, backend) for name, content in pages]
+    elapsed = time.perf_counter() - start
+    return results, len(pages) / elapsed if elapsed else float("inf")
+
+
+def field_agreement(results, reference):
+    """Odsetek stron, na których dane pole ma tę samą wartość co w backendzie referencyjnym."""
+    agreement = {}
+    for result, expected in zip(results, reference):
+        if hasattr(expected, "items"):
+            items = [(key, result.get(key) == value) for key, value in expected.items()]
+        else:
+            items = [("value", result == expected)]
+        for key, equal in items:
+            agreement.setdefault(key, []).append(equal)
+    return {key: sum(values) / len(values) for key, values in agreement.items()}
+
+
+EXTRACTORS = {
+    "listing links": ("listing", lambda name, content, backend: sorted(extract_offer_links(content, backend))),
+    "offer DOM": ("detail", lambda name, content, backend: parse_offer_dom(name, content, backend)),
+    "offer price": ("detail", lambda name, content, backend: extract_price(content, backend)),
+}
+
+
+def benchmark(corpus_dir, backends):
+    corpus = {kind: load_corpus(corpus_dir, kind) for kind in ("listing", "detail")}
+
+    for extractor_name, (kind, extractor) in EXTRACTORS.items():
+        pages = corpus[kind]
+        if not pages:
+            continue
+        print(f"\n{extractor_name} ({len(pages)} stron)")
+        reference, _ = run_extractor(extractor, pages, REFERENCE_BACKEND)
+        for backend in backends:
+            results, pages_per_sec = run_extractor(extractor, pages, backend)
+            agreement = field_agreement(results, reference)
+            mean_agreement = sum(agreement.values()) / len(agreement) if agreement else 1.0
+            print(f"  {backend:<12} {pages_per_sec:10.1f} stron/s  zgodność z {REFERENCE_BACKEND}: {mean_agreement:.1%}")
+            for field, value in agreement.items():
+                if value < 1:
+                    print(f"      {field}: {value:.1%}")
+
+    # szybka ścieżka JSON nie zależy od backendu - dla porównania z parsowaniem DOM
+    pages = corpus["detail"]
+    if pages:
+        start = time.perf_counter()
+        parsed = [parse_offer_json(content, empty_offer(name)) for name, content in pages]
+        elapsed = time.perf_counter() - start
+        print(f"\noffer JSON ({len(pages)} stron)")
+        print(f"  {'__NEXT_DATA__':<12} {len(pages) / elapsed if elapsed else float('inf'):10.1f} stron/s  "
+              f"stron z JSON-em: {sum(p is not None for p in parsed) / len(pages):.1%}")
+        # zgodność pól z parsowaniem DOM na stronach z JSON-em ('Tytuł oferty' i 'Opis' mają
+        # z założenia inne źródło - patrz offer_json.parse_ad)
+        with_json = [(result, name, content) for result, (name, content) in zip(parsed, pages) if result is not None]
+        if with_json:
+            reference = [parse_offer_dom(name, content, REFERENCE_BACKEND) for _, name, content in with_json]
+            agreement = field_agreement([result for result, _, _ in with_json], reference)
+            mean_agreement = sum(agreement.values()) / len(agreement) if agreement else 1.0
+            print(f"  zgodność z DOM ({REFERENCE_BACKEND}): {mean_agreement:.1%}")
+            for field, value in agreement.items():
+                if value < 1:
+                    print(f"      {field}: {value:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark backendów parsowania HTML")
+    parser.add_argument("--corpus", default="corpus", help="katalog z podkatalogami listing/ i detail/")
+    parser.add_argument("--backends", nargs="*", default=None, help="domyślnie wszystkie zainstalowane")
+    parser.add_argument("--record", action="store_true", help="najpierw pobierz korpus z otodom.pl")
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--offers", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.record:
+        record_corpus(args.corpus, args.pages, args.offers)
+    benchmark(args.corpus, args.backends or available_backends())
@@ -0,0 +1,190 @@
+"""
+Benchmark całego przebiegu scrape.py (get_offers -> get_data_multithreaded -> zapis CSV)
+na lokalnym zastępniku otodom.pl (fake_otodom.py).
+
+    python benchmark_pipeline.py --pages 20 --latency 0.05 --jitter 0.02 --error-rate 0.01 --output bench.json
+
+Wynik (oferty/s, p50/p99 czasu oferty, czas CPU parsowania i clean-upu, szczytowe RSS procesu
+i procesów potomnych)
+jest zapisywany jako JSON razem z identyfikatorem commita, żeby porównywać kolejne zmiany.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import get_data_mulithreaded
+import get_data_multiprocess
+import http_client
+from fake_otodom import FakeOtodom
+from get_offers import get_offers
+from rate_control import ConcurrencyController
+
+
+class _Timings:
+    """Czasy zbierane przez opakowane funkcje (bezpieczne dla wątków)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.offer_latencies = []
+        self.parse_cpu = 0.0
+        self.cleanup_cpu = 0.0
+
+
+def _instrument(timings):
+    """
+    Opakowuje funkcje silników pomiarem czasu; zwraca funkcję przywracającą oryginały.
+    clean_offers jest podmieniane w każdym module, który je wywołuje (importują je bezpośrednio).
+    """
+    original_fetch = get_data_mulithreaded.fetch_and_parse_offer
+    original_parse = get_data_mulithreaded.parse_offer
+    original_clean = get_data_mulithreaded.clean_offers
+
+    def fetch_and_parse_offer(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original_fetch(*args, **kwargs)
+        finally:
+            with timings.lock:
+                timings.offer_latencies.append(time.perf_counter() - start)
+
+    def parse_offer(*args, **kwargs):
+        # thread_time - czas CPU bieżącego wątku, bez czekania na sieć
+        start = time.thread_time()
+        try:
+            return original_parse(*args, **kwargs)
+        finally:
+            with timings.lock:
+                timings.parse_cpu += time.thread_time() - start
+
+    def clean_offers(*args, **kwargs):
+        start = time.process_time()
+        try:
+            return original_clean(*args, **kwargs)
+        finally:
+            timings.cleanup_cpu += time.process_time() - start
+
+    get_data_mulithreaded.fetch_and_parse_offer = fetch_and_parse_offer
+    get_data_mulithreaded.parse_offer = parse_offer
+    get_data_mulithreaded.clean_offers = clean_offers
+    get_data_multiprocess.clean_offers = clean_offers
+
+    def restore():
+        get_data_mulithreaded.fetch_and_parse_offer = original_fetch
+        get_data_mulithreaded.parse_offer = original_parse
+        get_data_mulithreaded.clean_offers = original_clean
+        get_data_multiprocess.clean_offers = original_clean
+
+    return restore
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(pages=10, offers_per_page=36, max_threads=16, latency=0.0, jitter=0.0, error_rate=0.0,
+                  corpus_dir=None, throttle=False, processes=0) -> dict:
+    """
+    Uruchamia przebieg na lokalnym serwerze i zwraca słownik z wynikami.
+    processes > 0 - parsowanie w puli procesów (get_data_multiprocess): cpu_parse_s i szczytowe RSS
+    procesów roboczych pochodzą z pomiarów w tych procesach, a czasów pojedynczych ofert
+    (pobranie i parsowanie w różnych procesach) nie ma - offer_latency_* to wtedy null.
+    """
+    timings = _Timings()
+    worker_stats = {}
+    with FakeOtodom(corpus_dir, pages, offers_per_page, latency, jitter, error_rate) as fake, \
+            tempfile.TemporaryDirectory() as tmp:
+        controller = None
+        if not throttle:
+            # bez sztucznego limitu tempa - mierzymy kod, a nie ostrożność wobec otodom.pl
+            controller = ConcurrencyController(initial=max_threads, maximum=max_threads, rate=1e6, max_rate=1e6)
+        http_client.configure(base_url=fake.base_url, rate_controller=controller)
+        http_client.stats.reset()
+        restore = _instrument(timings)
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        try:
+            lista_ofert = get_offers(pages=pages)
+            listing_done = time.perf_counter()
+            if processes:
+                data = get_data_multiprocess.get_data_multiprocess(lista_ofert, io_threads=max_threads,
+                                                                   processes=processes, worker_stats=worker_stats)
+            else:
+                data = get_data_mulithreaded.get_data_multithreaded(lista_ofert, max_threads=max_threads)
+            data.to_csv(os.path.join(tmp, "dane.csv"), index=False)
+        finally:
+            restore()
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        server_requests = fake.requests
+
+    latency_p50 = latency_p99 = None
+    if timings.offer_latencies:
+        latency_p50, latency_p99 = (round(float(value) * 1000, 2)
+                                    for value in np.percentile(timings.offer_latencies, [50, 99]))
+    # ru_maxrss jest w KiB na Linuksie; RUSAGE_CHILDREN - największy zakończony proces potomny
+    peak_rss_children_kb = max(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+                               worker_stats.get("peak_rss_kb") or 0)
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {"pages": pages, "offers_per_page": offers_per_page, "max_threads": max_threads,
+                   "latency": latency, "jitter": jitter, "error_rate": error_rate,
+                   "parser": os.environ.get("FLAT_FINDER_PARSER", "html5lib"), "throttle": throttle,
+                   "processes": processes},
+        "offers": len(data),
+        "wall_s": round(wall, 3),
+        "listing_s": round(listing_done - start, 3),
+        "offers_per_s": round(len(data) / wall, 2) if wall else None,
+        "offer_latency_p50_ms": latency_p50,
+        "offer_latency_p99_ms": latency_p99,
+        "cpu_total_s": round(cpu, 3),
+        "cpu_parse_s": round(timings.parse_cpu + worker_stats.get("cpu_parse_s", 0.0), 3),
+        "cpu_cleanup_s": round(timings.cleanup_cpu, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        # procesy robocze z --processes (i inne procesy potomne)
+        "peak_rss_children_mb": round(peak_rss_children_kb / 1024, 1),
+        "server_requests": server_requests,
+        "http": http_client.stats.snapshot(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark całego przebiegu na lokalnym serwerze")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--offers-per-page", type=int, default=36)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--corpus", default=None, help="katalog korpusu z benchmark_parsers.py --record")
+    parser.add_argument("--throttle", action="store_true", help="użyj domyślnego sterowania tempem z http_client")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="parsowanie w N procesach (get_data_multiprocess); 0 - wątki jak w scrape.py")
+    parser.add_argument("--output", default=None, help="plik JSON, do którego dopisać wynik")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.pages, args.offers_per_page, args.threads, args.latency, args.jitter,
+                           args.error_rate, args.corpus, args.throttle, args.processes)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    if args.output:
+        # plik to lista wyników - kolejne uruchomienia (commity) są dopisywane
+        history = []
+        if os.path.exists(args.output):
+            with open(args.output, encoding="utf-8") as f:
+                history = json.load(f)
+        history.append(result)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2, ensure_ascii=False)
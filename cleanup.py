@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import tracer
+from records import ColumnarAccumulator
+
+# Wspólny clean-up danych ofert dla get_data, get_data_multithreaded i pipeline.
+# Każda kolumna jest przetwarzana raz, operacjami wektorowymi, a wynik ma zwarte typy:
+# kategorie dla pól słownikowych, float32 dla liczb i napisy Arrow dla długich tekstów.
+
+MISSING = ("brak danych", "brak informacji")
+
+kolejnosc = [
+    'link', 'Tytuł oferty', 'Cena', 'Powierzchnia', 'Cena za m²', 'Liczba pokoi', 'Rynek', 'Piętro',
+    'liczba pięter w budynku', 'Rodzaj zabudowy', 'Rok budowy', 'Typ ogłoszeniodawcy',
+    'Certyfikat energetyczny', 'Materiał budynku', 'Okna', 'Ogrzewanie', 'Stan wykończenia', 'Czynsz',
+    'Forma własności', 'Dostępne od', 'Opis', 'Szerokość geograficzna', 'Długość geograficzna',
+]
+
+NUMERIC_COLUMNS = ['Cena', 'Powierzchnia', 'Cena za m²', 'Rok budowy', 'Czynsz',
+                   'Szerokość geograficzna', 'Długość geograficzna']
+
+CATEGORY_COLUMNS = ['Liczba pokoi', 'Rynek', 'Rodzaj zabudowy', 'Typ ogłoszeniodawcy', 'Certyfikat energetyczny',
+                    'Materiał budynku', 'Okna', 'Ogrzewanie', 'Stan wykończenia', 'Forma własności']
+
+TEXT_COLUMNS = ['link', 'Tytuł oferty', 'Opis', 'Dostępne od']
+
+# nazwy kolumn w wyniku clean_offers
+RENAMED_COLUMNS = {'Cena za m²': 'cena za metr', 'Szerokość geograficzna': 'lat', 'Długość geograficzna': 'lon'}
+
+# jedno przejście str.translate zamiast łańcucha str.replace:
+# usuwa spacje (też twarde), "zł" i zamienia przecinek dziesiętny na kropkę
+NUMBER_TRANSLATION = str.maketrans({" ": None, "\xa0": None, "z": None, "ł": None, ",": "."})
+
+FLOOR_NAMES = {'parter': '0', '> 10': '11'} #wszystkie piętra wyżej niż 10 oznaczymy jako 11
+
+
+def _text_dtype():
+    """Napisy oparte na Arrow, gdy pyarrow jest zainstalowany; w przeciwnym razie zwykły StringDtype."""
+    try:
+        import pyarrow  # noqa: F401
+        return "string[pyarrow]"
+    except ImportError:
+        return "string"
+
+
+def _strings(series: pd.Series) -> pd.Series:
+    """Kolumna jako napisy z brakami danych zamienionymi na NaN."""
+    series = series.astype(object)
+    return series.where(~series.isin(MISSING), np.nan)
+
+
+def _to_float32(series: pd.Series) -> pd.Series:
+    text = _strings(series).astype(str).str.translate(NUMBER_TRANSLATION)
+    return pd.to_numeric(text, errors='coerce').astype('float32')
+
+
+@tracer.traced("cleanup", "cleanup")
+def clean_offers(results) -> pd.DataFrame:
+    """
+    Buduje DataFrame z rekordów ofert i wykonuje clean-up danych.
+    results może być ColumnarAccumulator, DataFrame albo listą OfferRecord/słowników.
+    """
+    if isinstance(results, pd.DataFrame):
+        raw = results
+    elif isinstance(results, ColumnarAccumulator):
+        raw = results.to_frame()
+    else:
+        # przez akumulator, żeby pusta lista - np. w trybie delta - też dała poprawne kolumny
+        accumulator = ColumnarAccumulator()
+        accumulator.extend(results)
+        raw = accumulator.to_frame()
+
+    data_set = pd.DataFrame(index=raw.index)
+
+    for column in NUMERIC_COLUMNS:
+        data_set[column] = _to_float32(raw[column])
+
+    # Piętro "3/10" -> piętro 3 i 10 pięter w budynku; str.split dzieli kolumnę w jednym przejściu.
+    # reindex zapewnia obie kolumny także dla pustego wejścia i gdy żadna wartość nie zawiera "/"
+    floor = _strings(raw['Piętro']).astype(str).str.split('/', n=1, expand=True).reindex(columns=[0, 1])
+    floor_number = floor[0].astype(object).str.strip().replace(FLOOR_NAMES)
+    data_set['Piętro'] = pd.to_numeric(floor_number, errors='coerce').astype('float32')
+    data_set['liczba pięter w budynku'] = pd.to_numeric(floor[1], errors='coerce').astype('float32')
+
+    for column in CATEGORY_COLUMNS:
+        data_set[column] = _strings(raw[column]).astype('category')
+
+    text_dtype = _text_dtype()
+    for column in TEXT_COLUMNS:
+        data_set[column] = _strings(raw[column]).astype(text_dtype)
+
+    # 'Rzut mieszkania' i 'Numer mieszkania' nie są wypełniane na stronach - pomijamy je
+    data_set = data_set[kolejnosc]
+    data_set = data_set.rename(columns=RENAMED_COLUMNS)
+    data_set = data_set.drop_duplicates(subset='link').reset_index(drop=True)
+
+    return data_set
@@ -0,0 +1,143 @@
+"""
+Ocena okazji: porównanie ceny za metr oferty z medianą ofert w okolicy.
+
+Dla każdej oferty liczona jest mediana 'cena za metr' sąsiadów w promieniu radius metrów
+(opcjonalnie tylko k najbliższych z nich) o tej samej liczbie pokoi i tym samym rynku.
+Wynik okazji = 1 - cena za metr / mediana, czyli 0.15 oznacza ofertę o 15% tańszą od okolicy.
+
+Sąsiedzi są szukani w siatce o boku radius: punkt ma wszystkich sąsiadów w swojej komórce
+i 8 komórkach dookoła, więc odległości liczone są tylko dla tych komórek, a nie dla wszystkich par.
+
+    python deal_scoring.py dane_2025_01_01.parquet --radius 800 --top 30
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# metry na stopień szerokości geograficznej; dla długości mnożone przez cos(szerokości)
+METERS_PER_DEGREE = 111_320.0
+# ile wierszy komórki naraz porównywać z kandydatami (ogranicza rozmiar macierzy odległości)
+BLOCK_ROWS = 256
+
+STRATA = ['Liczba pokoi', 'Rynek']
+
+
+def _project(lat, lon):
+    """Współrzędne w metrach na płaszczyźnie stycznej (wystarczające w skali miasta)."""
+    lat0 = np.nanmean(lat)
+    x = (lon - np.nanmean(lon)) * METERS_PER_DEGREE * np.cos(np.radians(lat0))
+    y = (lat - lat0) * METERS_PER_DEGREE
+    return x, y
+
+
+def _neighbour_medians(x, y, prices, radius, k, min_neighbours):
+    """
+    Mediana cen sąsiadów dla jednej warstwy (te same pokoje i rynek).
+    Zwraca (mediany, liczby sąsiadów); punkt nie jest swoim własnym sąsiadem.
+    """
+    n = len(x)
+    medians = np.full(n, np.nan)
+    counts = np.zeros(n, dtype=np.int64)
+    if n < 2:
+        return medians, counts
+
+    cell_x = np.floor(x / radius).astype(np.int64)
+    cell_y = np.floor(y / radius).astype(np.int64)
+    order = np.lexsort((cell_y, cell_x))
+    keys = np.stack([cell_x[order], cell_y[order]], axis=1)
+    cells, starts, sizes = np.unique(keys, axis=0, return_index=True, return_counts=True)
+    cell_index = {(cx, cy): (start, start + size) for (cx, cy), start, size in zip(cells.tolist(), starts, sizes)}
+
+    for (cx, cy), (start, end) in cell_index.items():
+        members = order[start:end]
+        candidates = np.concatenate([
+            order[slice(*cell_index[(cx + dx, cy + dy)])]
+            for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+            if (cx + dx, cy + dy) in cell_index
+        ])
+        candidate_prices = prices[candidates]
+
+        for block_start in range(0, len(members), BLOCK_ROWS):
+            block = members[block_start:block_start + BLOCK_ROWS]
+            distance = np.hypot(x[block, None] - x[candidates], y[block, None] - y[candidates])
+            # poza promieniem albo sam punkt - nie jest sąsiadem
+            distance[(distance > radius) | (block[:, None] == candidates)] = np.inf
+
+            if k is not None and k < len(candidates):
+                nearest = np.argpartition(distance, k - 1, axis=1)[:, :k]
+                distance = np.take_along_axis(distance, nearest, axis=1)
+                neighbour_prices = candidate_prices[nearest]
+            else:
+                neighbour_prices = np.broadcast_to(candidate_prices, distance.shape)
+
+            within = np.isfinite(distance)
+            block_counts = within.sum(axis=1)
+            # mediana wierszami bez pętli: ceny spoza okolicy jako +inf lądują na końcu posortowanego
+            # wiersza, więc mediana to średnia elementów (c - 1) // 2 i c // 2 dla c sąsiadów
+            ordered = np.sort(np.where(within, neighbour_prices, np.inf), axis=1)
+            rows = np.arange(len(block))
+            lower = ordered[rows, np.maximum(block_counts - 1, 0) // 2]
+            upper = ordered[rows, block_counts // 2]
+            block_medians = (lower + upper) / 2
+            block_medians[block_counts < max(min_neighbours, 1)] = np.nan
+            medians[block] = block_medians
+            counts[block] = block_counts
+
+    return medians, counts
+
+
+def score_deals(data_set: pd.DataFrame, radius = 1000.0, k = None, min_neighbours = 5) -> pd.DataFrame:
+    """
+    Dodaje do kopii data_set kolumny 'mediana w okolicy', 'liczba sąsiadów' i 'wynik okazji'.
+
+    Args:
+        data_set (pd.DataFrame): Wynik clean_offers (kolumny lat, lon, 'cena za metr', 'Liczba pokoi', 'Rynek').
+        radius (float): Promień okolicy w metrach.
+        k (int): Jeśli podane - mediana tylko z k najbliższych sąsiadów w promieniu.
+        min_neighbours (int): Minimalna liczba sąsiadów; przy mniejszej wynik to NaN.
+    """
+    result = data_set.copy()
+    lat = result['lat'].to_numpy(dtype=np.float64)
+    lon = result['lon'].to_numpy(dtype=np.float64)
+    prices = result['cena za metr'].to_numpy(dtype=np.float64)
+    x, y = _project(lat, lon)
+
+    medians = np.full(len(result), np.nan)
+    counts = np.zeros(len(result), dtype=np.int64)
+    usable = np.isfinite(x) & np.isfinite(y) & np.isfinite(prices)
+
+    # pozycje wierszy w każdej warstwie (braki pokoi/rynku tworzą osobne warstwy)
+    strata = result.reset_index(drop=True).loc[usable, STRATA]
+    for positions in strata.groupby(STRATA, observed=True, dropna=False).indices.values():
+        rows = strata.index.to_numpy()[positions]
+        medians[rows], counts[rows] = _neighbour_medians(x[rows], y[rows], prices[rows], radius, k, min_neighbours)
+
+    result['mediana w okolicy'] = medians.astype('float32')
+    result['liczba sąsiadów'] = counts
+    result['wynik okazji'] = (1 - prices / medians).astype('float32')
+    return result
+
+
+def rank_deals(data_set: pd.DataFrame, radius = 1000.0, k = None, min_neighbours = 5, top = None) -> pd.DataFrame:
+    """Oferty posortowane od największej okazji (bez ofert, których nie dało się ocenić)."""
+    scored = score_deals(data_set, radius, k, min_neighbours)
+    ranked = scored.dropna(subset=['wynik okazji']).sort_values('wynik okazji', ascending=False)
+    return ranked.head(top) if top else ranked
+
+
+if __name__ == "__main__":
+    from snapshot import read_snapshot
+
+    parser = argparse.ArgumentParser(description="Ranking okazji na podstawie ceny za metr w okolicy")
+    parser.add_argument("path", help="plik z danymi (CSV, .parquet albo .csv.zst)")
+    parser.add_argument("--radius", type=float, default=1000.0, help="promień okolicy w metrach")
+    parser.add_argument("--k", type=int, default=None, help="liczba najbliższych sąsiadów")
+    parser.add_argument("--min-neighbours", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.path) if args.path.endswith(".csv") else read_snapshot(args.path)
+    ranking = rank_deals(data, args.radius, args.k, args.min_neighbours, args.top)
+    print(ranking[['link', 'cena za metr', 'mediana w okolicy', 'liczba sąsiadów', 'wynik okazji']]
+          .to_string(index=False))
@@ -0,0 +1,204 @@
+"""
+Wykrywanie tego samego mieszkania wystawionego kilka razy (np. przez różne biura) pod różnymi linkami.
+
+1. Sygnatury MinHash trójek słów z tytułu i opisu (słowa jak w text_index.tokenize).
+2. Kandydaci na duplikaty:
+   - LSH: oferty z identycznym fragmentem sygnatury (pasmem) w którymkolwiek paśmie,
+   - blokowanie: ta sama komórka ~150 m, zaokrąglona powierzchnia i piętro.
+   W każdym kubełku oferty są uporządkowane według piętra i powierzchni i porównywane tylko
+   z sąsiadem w tym porządku, więc liczba porównań rośnie liniowo, a nie kwadratowo, a oferty
+   o tym samym piętrze i zbliżonej powierzchni są porównywane ze sobą, nawet gdy w kubełku
+   są też inne mieszkania.
+3. Para jest duplikatem, gdy podobieństwo tekstu (odsetek zgodnych pozycji sygnatur) przekracza
+   próg, a powierzchnia, piętro i położenie się nie wykluczają - deweloperzy używają jednego opisu
+   dla wielu różnych mieszkań w budynku.
+4. Union-find łączy pary w grupy; identyfikatorem kanonicznym grupy jest najmniejszy link.
+
+    python dedup.py dane_2025_01_01.parquet
+"""
+import argparse
+import itertools
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from text_index import tokenize
+
+NUM_PERM = 32
+BANDS = 8  # 8 pasm po 4 wiersze: próg LSH około (1/8) ** (1/4) = 0.59
+SHINGLE = 3
+# opisy bywają bardzo długie - pierwsze słowa wystarczają do rozpoznania kopii;
+# tekst jest przycinany już przed podziałem na słowa (tokenizacja to główny koszt)
+MAX_TOKENS = 250
+MAX_CHARS = MAX_TOKENS * 12
+TEXT_THRESHOLD = 0.6
+# w tym samym bloku (miejsce, powierzchnia, piętro) wystarcza mniejsze podobieństwo tekstu
+BLOCK_TEXT_THRESHOLD = 0.25
+MAX_DISTANCE = 300.0  # metry
+AREA_TOLERANCE = 0.02
+BLOCK_CELL = 150.0  # metry
+
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+
+
+def _token_hashes(texts):
+    """
+    Słowa każdego tekstu jako tablica crc32 (stałe między uruchomieniami, w przeciwieństwie do hash()).
+    crc32 liczone jest tylko dla unikalnych słów, a przypisanie słów do nich robi pd.factorize.
+    """
+    token_lists = [tokenize(text[:MAX_CHARS])[:MAX_TOKENS] for text in texts]
+    lengths = np.fromiter(map(len, token_lists), dtype=np.int64, count=len(token_lists))
+    codes, uniques = pd.factorize(np.fromiter(
+        itertools.chain.from_iterable(token_lists), dtype=object, count=int(lengths.sum())))
+    unique_hashes = np.fromiter((zlib.crc32(token.encode()) for token in uniques), dtype=np.uint32,
+                                count=len(uniques))
+    return unique_hashes[codes], lengths
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=1) -> np.ndarray:
+    """Sygnatury MinHash (liczba tekstów x num_perm, uint32) zbiorów trójek słów."""
+    tokens, lengths = _token_hashes(texts)
+
+    # trójki słów: hash łączony z kolejnych słów, tylko w obrębie jednego tekstu
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(lengths) else np.zeros(0, dtype=np.int64)
+    shingle_counts = np.maximum(lengths - SHINGLE + 1, np.minimum(lengths, 1))
+    doc_of_shingle = np.repeat(np.arange(len(lengths)), shingle_counts)
+    offsets = np.arange(shingle_counts.sum()) - np.repeat(np.cumsum(shingle_counts) - shingle_counts, shingle_counts)
+    positions = starts[doc_of_shingle] + offsets
+    shingles = np.zeros(len(positions), dtype=np.uint32)
+    for k in range(SHINGLE):
+        # krótkie teksty (mniej słów niż SHINGLE) mają jedną krótszą trójkę
+        valid = offsets + k < lengths[doc_of_shingle]
+        index = np.where(valid, positions + k, 0)
+        word = np.where(valid, tokens[index] if len(tokens) else 0, 0).astype(np.uint32)
+        shingles = (shingles * np.uint32(0x01000193)) ^ word
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 32, size=num_perm, dtype=np.uint64).astype(np.uint32) | np.uint32(1)
+    b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint64).astype(np.uint32)
+    signatures = np.full((len(lengths), num_perm), _MAX_HASH, dtype=np.uint32)
+    has_shingles = shingle_counts > 0
+    segment_starts = (np.cumsum(shingle_counts) - shingle_counts)[has_shingles]
+    for p in range(num_perm):
+        # mnożenie i dodawanie modulo 2^32 (przepełnienie uint32) - tania rodzina funkcji mieszających
+        permuted = shingles * a[p] + b[p]
+        if len(permuted):
+            signatures[has_shingles, p] = np.minimum.reduceat(permuted, segment_starts)
+    return signatures
+
+
+def _bucket_pairs(keys, floor, area):
+    """
+    Pary (oferta, poprzednia oferta kubełka) dla ofert o tym samym kluczu, w kubełku uporządkowanych
+    według piętra i powierzchni. Sąsiedzi mają najbliższą powierzchnię, więc oferty w granicach
+    AREA_TOLERANCE są połączone łańcuchem par, nawet gdy pierwsza oferta kubełka do nich nie pasuje.
+    """
+    # lexsort: ostatni klucz jest najważniejszy; NaN trafia na koniec
+    order = np.lexsort((area, floor, keys))
+    sorted_keys = keys[order]
+    same_bucket = sorted_keys[1:] == sorted_keys[:-1]
+    return order[1:][same_bucket], order[:-1][same_bucket]
+
+
+def _band_keys(signatures, bands):
+    rows = signatures.shape[1] // bands
+    for band in range(bands):
+        chunk = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        key = np.zeros(len(signatures), dtype=np.uint64)
+        for column in range(rows):
+            key = key * np.uint64(0x100000001B3) ^ chunk[:, column]
+        yield key
+
+
+def _connected_components(n, first, second):
+    """Union-find na tablicach: etykieta = najmniejszy indeks w grupie."""
+    labels = np.arange(n)
+    while True:
+        smaller = np.minimum(labels[first], labels[second])
+        updated = labels.copy()
+        np.minimum.at(updated, first, smaller)
+        np.minimum.at(updated, second, smaller)
+        # skrócenie ścieżek
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def find_duplicates(data_set: pd.DataFrame, num_perm=NUM_PERM, bands=BANDS, threshold=TEXT_THRESHOLD,
+                    block_threshold=BLOCK_TEXT_THRESHOLD) -> pd.DataFrame:
+    """
+    Zwraca kopię data_set z kolumnami 'grupa duplikatów' (numer grupy) i 'id kanoniczne'
+    (najmniejszy link w grupie; dla ofert bez duplikatów - ich własny link).
+    """
+    result = data_set.reset_index(drop=True).copy()
+    n = len(result)
+    texts = (result['Tytuł oferty'].astype(object).fillna("") + " " + result['Opis'].astype(object).fillna(""))
+    signatures = minhash_signatures(texts.tolist(), num_perm)
+
+    lat = result['lat'].to_numpy(dtype=np.float64)
+    lon = result['lon'].to_numpy(dtype=np.float64)
+    area = result['Powierzchnia'].to_numpy(dtype=np.float64)
+    floor = result['Piętro'].to_numpy(dtype=np.float64)
+    y = lat * 111_320.0
+    x = lon * 111_320.0 * np.cos(np.radians(np.nanmean(lat) if np.isfinite(lat).any() else 52.2))
+
+    candidates = [_bucket_pairs(key, floor, area) + (threshold,) for key in _band_keys(signatures, bands)]
+    # blok: komórka ~150 m, powierzchnia zaokrąglona do 1 m², piętro; tylko oferty z kompletem danych
+    complete = np.isfinite(x) & np.isfinite(y) & np.isfinite(area) & np.isfinite(floor)
+    if complete.any():
+        block = pd.DataFrame({
+            "x": np.floor(x[complete] / BLOCK_CELL), "y": np.floor(y[complete] / BLOCK_CELL),
+            "area": np.round(area[complete]), "floor": floor[complete],
+        })
+        block_keys = pd.util.hash_pandas_object(block, index=False).to_numpy()
+        first, second = _bucket_pairs(block_keys, floor[complete], area[complete])
+        indices = np.flatnonzero(complete)
+        candidates.append((indices[first], indices[second], block_threshold))
+
+    first_all, second_all = [], []
+    for first, second, pair_threshold in candidates:
+        if not len(first):
+            continue
+        similarity = (signatures[first] == signatures[second]).mean(axis=1)
+        # brak danych nie wyklucza duplikatu; różne wartości - tak
+        distance = np.hypot(x[first] - x[second], y[first] - y[second])
+        near = ~(distance > MAX_DISTANCE)
+        same_area = ~(np.abs(area[first] - area[second]) > AREA_TOLERANCE * np.fmax(area[first], area[second]))
+        same_floor = ~(floor[first] != floor[second]) | np.isnan(floor[first]) | np.isnan(floor[second])
+        accepted = (similarity >= pair_threshold) & near & same_area & same_floor
+        first_all.append(first[accepted])
+        second_all.append(second[accepted])
+
+    first = np.concatenate(first_all) if first_all else np.zeros(0, dtype=np.int64)
+    second = np.concatenate(second_all) if second_all else np.zeros(0, dtype=np.int64)
+    labels = _connected_components(n, first, second)
+
+    # najmniejszy link w grupie: numery linków w porządku alfabetycznym, minimum w każdej grupie
+    link_codes, links = pd.factorize(result['link'].astype(object).to_numpy(), sort=True)
+    smallest = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(smallest, labels, link_codes)
+    result['grupa duplikatów'] = pd.factorize(labels)[0]
+    result['id kanoniczne'] = np.asarray(links, dtype=object)[smallest[labels]]
+    return result
+
+
+def deduplicate(data_set: pd.DataFrame, **kwargs) -> pd.DataFrame:
+    """Zostawia jedną ofertę (kanoniczną) z każdej grupy duplikatów."""
+    marked = find_duplicates(data_set, **kwargs)
+    return marked[marked['link'] == marked['id kanoniczne']].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from snapshot import read_snapshot
+
+    parser = argparse.ArgumentParser(description="Wykrywanie duplikatów ofert (MinHash + LSH)")
+    parser.add_argument("path", help="plik z danymi (CSV, .parquet albo .csv.zst)")
+    parser.add_argument("--threshold", type=float, default=TEXT_THRESHOLD)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.path) if args.path.endswith(".csv") else read_snapshot(args.path)
+    marked = find_duplicates(data, threshold=args.threshold)
+    sizes = marked['grupa duplikatów'].value_counts()
+    print(f"Ofert: {len(marked)}, unikalnych mieszkań: {len(sizes)}, grup z duplikatami: {(sizes > 1).sum()}")
@@ -0,0 +1,130 @@
+"""
+Przypisanie ofert do dzielnic (i osiedli) Warszawy na podstawie lat/lon, bez dostępu do sieci.
+
+Granice pochodzą z lokalnego pliku GeoJSON (Polygon / MultiPolygon, nazwa obszaru we właściwości
+name_property). Dla każdego obszaru najpierw prostokąt ograniczający odsiewa punkty, a pozostałe
+są testowane metodą promienia (ray casting) naraz dla wielu punktów i krawędzi.
+
+    python districts.py dane_2025_01_01.parquet --geojson dzielnice.geojson
+"""
+import argparse
+import functools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+DISTRICTS_PATH = os.environ.get("FLAT_FINDER_DISTRICTS", "warszawa_dzielnice.geojson")
+# właściwości GeoJSON sprawdzane po kolei, gdy name_property nie jest podane
+NAME_PROPERTIES = ("name", "nazwa", "NAZWA", "nazwa_dzielnicy")
+# liczba punktów testowanych naraz ze wszystkimi krawędziami obszaru
+BLOCK_POINTS = 4096
+
+
+class DistrictIndex:
+    """
+    Obszary z pliku GeoJSON: nazwy, prostokąty ograniczające i krawędzie wszystkich pierścieni
+    (zewnętrznych i otworów) jako tablice numpy.
+    """
+
+    def __init__(self, names, edges):
+        self.names = list(names)
+        self.edges = edges  # lista tablic (liczba krawędzi, 4): x1, y1, x2, y2 (lon, lat)
+        self.bounds = np.array([
+            [min(e[:, 0].min(), e[:, 2].min()), min(e[:, 1].min(), e[:, 3].min()),
+             max(e[:, 0].max(), e[:, 2].max()), max(e[:, 1].max(), e[:, 3].max())]
+            for e in edges
+        ]).reshape(-1, 4)
+
+    @classmethod
+    def from_geojson(cls, path, name_property=None):
+        with open(path, encoding="utf-8") as f:
+            collection = json.load(f)
+
+        names, edges = [], []
+        for feature in collection.get("features", []):
+            geometry = feature.get("geometry") or {}
+            if geometry.get("type") == "Polygon":
+                polygons = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiPolygon":
+                polygons = geometry["coordinates"]
+            else:
+                continue
+            rings = [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon]
+            # krawędź = (punkt i, punkt i+1); pierścień domykamy, gdyby plik tego nie robił
+            ring_edges = [np.hstack([ring, np.roll(ring, -1, axis=0)]) for ring in rings if len(ring) >= 3]
+            if not ring_edges:
+                continue
+            properties = feature.get("properties") or {}
+            keys = [name_property] if name_property else NAME_PROPERTIES
+            name = next((properties[key] for key in keys if properties.get(key)), f"obszar {len(names) + 1}")
+            names.append(str(name))
+            edges.append(np.vstack(ring_edges))
+        return cls(names, edges)
+
+    def _contains(self, area, lon, lat):
+        """Ray casting: punkt jest w środku, gdy półprosta w prawo przecina nieparzystą liczbę krawędzi."""
+        x1, y1, x2, y2 = (self.edges[area][:, i] for i in range(4))
+        inside = np.zeros(len(lon), dtype=bool)
+        for start in range(0, len(lon), BLOCK_POINTS):
+            px = lon[start:start + BLOCK_POINTS, None]
+            py = lat[start:start + BLOCK_POINTS, None]
+            straddles = (y1 > py) != (y2 > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crossing_x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            crossings = straddles & (px < crossing_x)
+            inside[start:start + BLOCK_POINTS] = crossings.sum(axis=1) % 2 == 1
+        return inside
+
+    def lookup(self, lat, lon) -> np.ndarray:
+        """Indeks obszaru dla każdego punktu (-1 - poza wszystkimi obszarami albo brak współrzędnych)."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        codes = np.full(len(lat), -1, dtype=np.int32)
+        for area, (min_lon, min_lat, max_lon, max_lat) in enumerate(self.bounds):
+            # prostokąt ograniczający (NaN odpada przy porównaniach); przy nakładających się
+            # obszarach wygrywa pierwszy z pliku
+            candidates = np.flatnonzero((codes == -1) & (lon >= min_lon) & (lon <= max_lon)
+                                        & (lat >= min_lat) & (lat <= max_lat))
+            if len(candidates):
+                codes[candidates[self._contains(area, lon[candidates], lat[candidates])]] = area
+        return codes
+
+
+@functools.lru_cache(maxsize=None)
+def load_index(path=DISTRICTS_PATH, name_property=None) -> DistrictIndex:
+    """Wczytuje GeoJSON raz na proces."""
+    return DistrictIndex.from_geojson(path, name_property)
+
+
+def assign_districts(data_set: pd.DataFrame, path=DISTRICTS_PATH, column='dzielnica',
+                     name_property=None) -> pd.DataFrame:
+    """
+    Zwraca kopię data_set z kategorią column (nazwa obszaru z pliku path, NaN poza obszarami).
+    Dla osiedli wystarczy drugi plik i inna kolumna, np. column='osiedle'.
+    """
+    index = load_index(path, name_property)
+    codes = index.lookup(data_set['lat'].to_numpy(dtype=np.float64), data_set['lon'].to_numpy(dtype=np.float64))
+    result = data_set.copy()
+    # unikalne nazwy jako kategorie - kilka obiektów GeoJSON może mieć tę samą nazwę
+    categories = list(dict.fromkeys(index.names))
+    position = {name: i for i, name in enumerate(categories)}
+    name_codes = np.array([position[name] for name in index.names] + [-1], dtype=np.int32)
+    result[column] = pd.Categorical.from_codes(name_codes[codes], categories=categories)
+    return result
+
+
+if __name__ == "__main__":
+    from snapshot import read_snapshot
+
+    parser = argparse.ArgumentParser(description="Przypisanie ofert do dzielnic z lokalnego GeoJSON")
+    parser.add_argument("path", help="plik z danymi (CSV, .parquet albo .csv.zst)")
+    parser.add_argument("--geojson", default=DISTRICTS_PATH)
+    parser.add_argument("--column", default="dzielnica")
+    parser.add_argument("--name-property", default=None)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.path) if args.path.endswith(".csv") else read_snapshot(args.path)
+    data = assign_districts(data, args.geojson, args.column, args.name_property)
+    print(data[args.column].value_counts(dropna=False).to_string())
@@ -0,0 +1,170 @@
+"""
+Lokalny zastępnik otodom.pl do benchmarków i testów ręcznych.
+
+Strony wyników są generowane (po offers_per_page linków na stronę, z cenami w __NEXT_DATA__),
+a strony ofert pochodzą z nagranego korpusu (katalog detail/ z benchmark_parsers.py --record);
+nieznana oferta dostaje stronę z korpusu wybraną po skrócie ścieżki. Bez korpusu serwowana jest
+prosta strona z osadzonym JSON-em. Opóźnienie, rozrzut i odsetek błędów 503 są konfigurowalne.
+
+    python fake_otodom.py --corpus corpus --port 8000 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SYNTHETIC_DETAIL = """<html><head><title>{title}</title></head><body>
+<script id="__NEXT_DATA__" type="application/json">{next_data}</script></body></html>"""
+
+
+def synthetic_detail(slug):
+    seed = int(hashlib.md5(slug.encode()).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    area = round(rng.uniform(20, 150), 1)
+    ad = {
+        "title": f"Mieszkanie {slug}",
+        "description": "<p>Przestronne mieszkanie z balkonem.</p>" * rng.randint(3, 30),
+        "characteristics": [
+            {"label": "Rynek", "localizedValue": rng.choice(["pierwotny", "wtórny"])},
+            {"label": "Piętro", "localizedValue": f"{rng.randint(0, 10)}/{rng.randint(10, 20)}"},
+            {"label": "Czynsz", "localizedValue": f"{rng.randint(300, 1500)} zł"},
+        ],
+        "target": {"Price": int(area * rng.uniform(9000, 30000)), "Area": str(area),
+                   "Rooms_num": [str(rng.randint(1, 6))]},
+        "location": {"coordinates": {"latitude": rng.uniform(52.1, 52.35), "longitude": rng.uniform(20.85, 21.25)}},
+    }
+    next_data = json.dumps({"props": {"pageProps": {"ad": ad}}}, ensure_ascii=False)
+    return SYNTHETIC_DETAIL.format(title=ad["title"], next_data=next_data).encode("utf-8")
+
+
+def listing_page(page, offers_per_page):
+    slugs = [f"mieszkanie-benchmark-{page}-{i}-ID{page:04d}{i:03d}" for i in range(offers_per_page)]
+    items = [{"slug": slug, "totalPrice": {"value": 500000 + i * 1000, "currency": "PLN"}} for i, slug in enumerate(slugs)]
+    next_data = json.dumps({"props": {"pageProps": {"data": {"searchAds": {"items": items}}}}})
+    links = "".join(f'<li><a href="/pl/oferta/{slug}">{slug}</a></li>' for slug in slugs)
+    return (f'<html><head><title>Wyniki {page}</title></head><body><ul>{links}</ul>'
+            f'<script id="__NEXT_DATA__" type="application/json">{next_data}</script></body></html>').encode("utf-8")
+
+
+class FakeOtodom:
+    """
+    Serwer HTTP w osobnym wątku.
+
+    Args:
+        corpus_dir (str): Katalog korpusu z podkatalogiem detail/ (opcjonalny).
+        pages (int): Liczba stron wyników; dalsze strony zwracają 404.
+        offers_per_page (int): Liczba ofert na stronie wyników.
+        latency (float), jitter (float): Opóźnienie odpowiedzi w sekundach i jego losowy rozrzut.
+        error_rate (float): Odsetek odpowiedzi 503.
+    """
+
+    def __init__(self, corpus_dir=None, pages=10, offers_per_page=36, latency=0.0, jitter=0.0, error_rate=0.0,
+                 host="127.0.0.1", port=0):
+        self.pages = pages
+        self.offers_per_page = offers_per_page
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.details = self._load_details(corpus_dir)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @staticmethod
+    def _load_details(corpus_dir):
+        details = {}
+        directory = os.path.join(corpus_dir, "detail") if corpus_dir else None
+        if directory and os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                with open(os.path.join(directory, name), "rb") as f:
+                    details[os.path.splitext(name)[0]] = f.read()
+        return details
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def detail_page(self, slug):
+        if slug in self.details:
+            return self.details[slug]
+        if self.details:
+            names = sorted(self.details)
+            return self.details[names[int(hashlib.md5(slug.encode()).hexdigest(), 16) % len(names)]]
+        return synthetic_detail(slug)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                delay = fake.latency + random.uniform(-fake.jitter, fake.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                if fake.error_rate and random.random() < fake.error_rate:
+                    return self._send(503, b"")
+
+                url = urlparse(self.path)
+                if url.path.startswith("/pl/oferta/"):
+                    return self._send(200, fake.detail_page(url.path.rstrip("/").split("/")[-1]))
+                if url.path.startswith("/pl/wyniki/"):
+                    page = int(parse_qs(url.query).get("page", ["1"])[0])
+                    if page > fake.pages:
+                        return self._send(404, b"")
+                    return self._send(200, listing_page(page, fake.offers_per_page))
+                return self._send(404, b"")
+
+            def _send(self, status, body):
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokalny zastępnik otodom.pl")
+    parser.add_argument("--corpus", default=None)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--offers-per-page", type=int, default=36)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeOtodom(args.corpus, args.pages, args.offers_per_page, args.latency, args.jitter, args.error_rate,
+                      port=args.port)
+    print(f"Serwer: {fake.base_url} (OTODOM_BASE_URL={fake.base_url})")
+    fake.server.serve_forever()
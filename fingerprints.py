@@ -0,0 +1,134 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from instrumentation import tracer
+from records import COLUMNS, OfferRecord
+
+# Odciski treści stron ofert: skrót fragmentu strony, z którego powstaje rekord, i sam rekord.
+# Gdy odcisk pobranej strony jest taki sam jak zapisany dla tego linku, rekord jest odtwarzany
+# z bazy bez dekodowania JSON-a, parsowania HTML i wyciągania pól (parse_offer z fingerprints).
+#
+# Odcisk liczony jest z surowych bajtów, przed json.loads - inaczej sprawdzenie kosztowałoby tyle,
+# ile szybka ścieżka JSON, którą ma zastąpić:
+#     - strony z __NEXT_DATA__: treść skryptu bez buildId (zmienia się przy każdym wdrożeniu serwisu),
+#     - strony bez JSON-a: cała strona bez skryptów (poza skryptem ze współrzędnymi, czytanym przez
+#       parse_offer_dom) i atrybutów nonce, które zmieniają się przy każdym pobraniu.
+# Usuwane są tylko fragmenty, z których nie powstaje żadne pole rekordu.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    link TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    record TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+BUILD_ID_PATTERN = re.compile(rb'"buildId":"[^"]*"')
+VOLATILE_HTML_PATTERN = re.compile(rb'<script\b[^>]*>.*?</script>|\snonce="[^"]*"', re.DOTALL | re.IGNORECASE)
+# zapisane odciski są zatwierdzane w bazie co tyle wpisów (i przy flush/close), nie po każdej stronie
+COMMIT_EVERY = 200
+
+
+def _drop_volatile_html(match):
+    # skrypt ze współrzędnymi zostaje - parse_offer_dom czyta z niego szerokość i długość geograficzną
+    return match.group(0) if b'"__typename":"Coordinates"' in match.group(0) else b""
+
+
+def page_fingerprint(content, next_data=None) -> str:
+    """
+    Skrót treści strony oferty (opis na początku modułu).
+
+    Args:
+        content (bytes | str): Pobrana strona.
+        next_data (bytes): Surowa treść __NEXT_DATA__ z offer_json.next_data_bytes, jeśli strona ją zawiera.
+    """
+    if next_data is not None:
+        data = BUILD_ID_PATTERN.sub(b"", next_data)
+    else:
+        content = content.encode("utf-8") if isinstance(content, str) else content
+        data = VOLATILE_HTML_PATTERN.sub(_drop_volatile_html, content)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class FingerprintStore:
+    """
+    Odciski i rekordy ofert w SQLite, bezpieczne dla wątków.
+    Liczniki hits/misses dotyczą bieżącego uruchomienia. Nowe odciski są zatwierdzane
+    co COMMIT_EVERY wpisów - po pracy należy wywołać flush() albo close().
+    """
+
+    def __init__(self, path="fingerprints.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self._uncommitted = 0
+
+    def lookup(self, link, fingerprint):
+        """Zwraca zapisany OfferRecord, gdy odcisk się nie zmienił, w przeciwnym razie None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, record FROM fingerprints WHERE link = ?", (link,)
+            ).fetchone()
+            hit = row is not None and row[0] == fingerprint
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        tracer.count("flat_finder_fingerprint_total", result="hit" if hit else "miss")
+        if not hit:
+            return None
+
+        record = OfferRecord(link)
+        for column, value in zip(COLUMNS, json.loads(row[1])):
+            record[column] = value
+        record["link"] = link
+        return record
+
+    def store(self, link, fingerprint, record):
+        """Zapisuje odcisk i rekord sparsowanej strony."""
+        values = json.dumps([record[column] for column in COLUMNS], ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (link, fingerprint, record, updated) VALUES (?, ?, ?, ?)",
+                (link, fingerprint, values, time.time()),
+            )
+            self._uncommitted += 1
+            if self._uncommitted >= COMMIT_EVERY:
+                self._conn.commit()
+                self._uncommitted = 0
+
+    def flush(self):
+        """Zatwierdza zapisane odciski."""
+        with self._lock:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def skip_rate(self) -> float:
+        """Odsetek stron w tym uruchomieniu, których nie trzeba było parsować."""
+        with self._lock:
+            total = self.hits + self.misses
+            return self.hits / total if total else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {"pominięte": hits, "parsowane": misses, "odsetek pominiętych": round(hits / total, 3) if total else 0.0}
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
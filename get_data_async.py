@@ -0,0 +1,153 @@
+import asyncio
+import concurrent.futures
+
+import aiohttp
+import pandas as pd
+from tqdm import tqdm
+
+import http_client
+from cleanup import clean_offers
+from get_data_mulithreaded import parse_offer
+from instrumentation import tracer
+from rate_control import RETRY_STATUSES, backoff_delay, parse_retry_after
+
+
+async def _get_with_retries_async(session, url, acquire):
+    """
+    Asynchroniczny odpowiednik http_client._get_with_retries: to samo tempo (http_client.controller)
+    i ta sama polityka ponowień po 429/5xx i błędach połączenia (Retry-After albo opóźnienie z jitterem).
+    Zwraca (ostatnia odpowiedź, jej treść) albo rzuca ostatni wyjątek.
+    """
+    controller = http_client.controller
+    for attempt in range(http_client.MAX_RETRIES + 1):
+        # acquire blokuje wątek (Condition, token bucket) - wykonywany w osobnej puli
+        await acquire()
+        try:
+            with tracer.span("download", "http", url=url, attempt=attempt) as span:
+                async with session.get(url) as r:
+                    content = await r.read()
+                span.update(status=r.status, bytes=len(content))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            controller.release(success=False)
+            tracer.count("flat_finder_http_errors_total", error=type(e).__name__)
+            if attempt == http_client.MAX_RETRIES:
+                http_client.stats.failed()
+                raise
+            http_client.stats.retried()
+            tracer.count("flat_finder_http_retries_total")
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+
+        tracer.count("flat_finder_http_responses_total", status=r.status)
+        if r.status not in RETRY_STATUSES:
+            controller.release(success=True)
+            return r, content
+
+        retry_after = parse_retry_after(r.headers.get("Retry-After"))
+        controller.release(success=False, retry_after=retry_after)
+        if attempt == http_client.MAX_RETRIES:
+            http_client.stats.failed()
+            return r, content
+        http_client.stats.retried()
+        tracer.count("flat_finder_http_retries_total")
+        await asyncio.sleep(retry_after if retry_after is not None else backoff_delay(attempt))
+    return r, content
+
+
+async def fetch_and_parse_offer_async(session, oferta_path, base_url=None, acquire=None):
+    """
+    Asynchroniczny odpowiednik fetch_and_parse_offer.
+    Pobieranie odbywa się w pętli zdarzeń, parsowanie w domyślnym executorze,
+    żeby html5lib nie blokował pozostałych zapytań.
+
+    Tak jak fetch_and_parse_offer rzuca wyjątek, gdy strony nie udało się pobrać mimo ponowień,
+    zamiast zwracać wiersz "brak danych".
+    """
+    url = (base_url or http_client.BASE_URL) + str(oferta_path)
+    loop = asyncio.get_running_loop()
+    if acquire is None:
+        async def acquire():
+            await loop.run_in_executor(None, http_client.controller.acquire)
+
+    # cache odpowiedzi z http_client (bez rewalidacji - nieaktualny wpis jest pobierany na nowo)
+    cache = http_client.get_cache()
+    entry = cache.lookup(url) if cache is not None else None
+    if entry is not None and (http_client.OFFLINE or cache.is_fresh(entry)):
+        http_client.stats.cache_hit()
+        content = entry["content"]
+    elif http_client.OFFLINE:
+        raise LookupError(f"brak strony w cache (tryb offline): {url}")
+    else:
+        try:
+            r, content = await _get_with_retries_async(session, url, acquire)
+            r.raise_for_status()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Błąd połączenia dla {url}: {e}")
+            raise
+        if cache is not None:
+            cache.store(url, r.status, r.headers, content)
+
+    return await loop.run_in_executor(None, parse_offer, url, content)
+
+
+async def _gather_offers(lista_ofert, max_in_flight, max_per_host, timeout, base_url):
+    # limit - maksymalna liczba otwartych połączeń łącznie,
+    # limit_per_host - maksymalna liczba połączeń do jednego hosta
+    connector = aiohttp.TCPConnector(limit=max_in_flight, limit_per_host=max_per_host)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    # semafor ogranicza też zadania czekające na parsowanie, nie tylko na połączenie
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    # czekanie na controller.acquire zajmuje wątek - osobna pula, żeby nie blokować parsowania
+    acquire_pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight)
+    loop = asyncio.get_running_loop()
+
+    async def acquire():
+        await loop.run_in_executor(acquire_pool, http_client.controller.acquire)
+
+    try:
+        async with aiohttp.ClientSession(connector=connector, headers=http_client.HEADERS,
+                                         timeout=client_timeout) as session:
+
+            async def bounded(oferta):
+                async with semaphore:
+                    return await fetch_and_parse_offer_async(session, oferta, base_url, acquire)
+
+            tasks = {asyncio.ensure_future(bounded(oferta)): oferta for oferta in lista_ofert}
+            for future in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="getting data for offers"):
+                try:
+                    await future
+                except Exception:
+                    pass  # wyjątki zadań są zbierane niżej
+    finally:
+        acquire_pool.shutdown()
+
+    results, failed = [], []
+    for task, oferta in tasks.items():
+        if task.exception() is None:
+            results.append(task.result())
+        else:
+            failed.append(oferta)
+            print(f'{oferta} wygenerowało wyjątek: {task.exception()}')
+    if failed:
+        print(f"Nie udało się pobrać {len(failed)} ofert (pominięte w wyniku)")
+    return results
+
+
+def get_data_async(lista_ofert: list, max_in_flight = 64, max_per_host = 16, timeout = 10,
+                   base_url = None) -> pd.DataFrame:
+    """
+    Pobiera dane z listy ofert przy użyciu asyncio i zwraca DataFrame
+    w tym samym formacie co get_data_multithreaded.
+
+    Args:
+        lista_ofert (list): Ścieżki ofert zaczynające się od "/pl/oferta/".
+        max_in_flight (int): Maksymalna łączna liczba zapytań w toku.
+        max_per_host (int): Maksymalna liczba zapytań w toku do jednego hosta.
+        timeout (int): Limit czasu pojedynczego zapytania w sekundach.
+        base_url (str): Adres serwisu, np. lokalnego serwera z zapisanymi stronami.
+                        Domyślnie http_client.BASE_URL.
+    """
+    results = asyncio.run(_gather_offers(lista_ofert, max_in_flight, max_per_host, timeout, base_url))
+    return clean_offers(results)
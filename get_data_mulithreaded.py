@@ -1,118 +1,99 @@
 
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
 from tqdm import tqdm
-import numpy as np
 import concurrent.futures
-import threading # Potrzebne do obsługi tqdm w wątkach
 import os as os
 
+import http_client
+from instrumentation import tracer
+from cleanup import clean_offers
+from fingerprints import page_fingerprint
+from offer_json import extract_ad, next_data_bytes, parse_ad
+from output_sink import Checkpoint, open_sink
+from parsers import parse_html
+from records import ColumnarAccumulator, OfferRecord
+
 # Zmienna globalna do przechowywania wyników, chroniona blokadą
 # W tym przypadku nie jest to konieczne, jeśli zbieramy wyniki z Future,
 # ale dobrze jest pamiętać o synchronizacji przy modyfikacji wspólnych zasobów.
 # all_data_lock = threading.Lock() # Możesz tego użyć, jeśli dodajesz do globalnego słownika wewnątrz wątku
 
-def fetch_and_parse_offer(oferta_path):
+def empty_offer(url):
+    """Zwraca rekord oferty (OfferRecord) wypełniony wartościami "brak danych"."""
+    return OfferRecord(url)
+
+
+def parse_offer_dom(url, content, backend=None):
     """
-    Pobiera dane dla pojedynczej oferty i zwraca słownik z danymi.
-    Ta funkcja będzie wykonywana w osobnym wątku.
+    Parsuje stronę oferty przez drzewo DOM wybranego backendu (patrz parsers.py).
+    Używane, gdy strona nie zawiera osadzonego JSON-a.
     """
-    url = "https://www.otodom.pl" + str(oferta_path)
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/"
-    }
+    item_data = empty_offer(url)
+    with tracer.span("parse_html", "parse", backend=backend):
+        page = parse_html(content, backend)
+    with tracer.span("extract_fields", "parse", source="dom"):
+        return _extract_dom_fields(item_data, page)
 
-    item_data = {
-        "Tytuł oferty": "brak danych",
-        "link": url,
-        "Cena": "brak danych",
-        "Powierzchnia": "brak danych",
-        "Cena za m²": "brak danych",
-        "Liczba pokoi": "brak danych",
-        "Rynek": "brak danych",
-        "Certyfikat energetyczny": "brak danych",
-        "Numer mieszkania": "brak danych",
-        "Rzut mieszkania": "brak danych",
-        "Typ ogłoszeniodawcy": "brak danych",
-        "Opis": "brak danych",
-        "Rodzaj zabudowy": "brak danych",
-        "Piętro": "brak danych",
-        "Materiał budynku": "brak danych",
-        "Okna": "brak danych",
-        "Ogrzewanie": "brak danych",
-        "Rok budowy": "brak danych",
-        "Stan wykończenia": "brak danych",
-        "Czynsz": "brak danych",
-        "Forma własności": "brak danych",
-        "Dostępne od": "brak danych",
-        "Szerokość geograficzna": "brak danych",
-        "Długość geograficzna": "brak danych",
-    }
 
-    try:
-        r = requests.get(url=url, headers=headers, timeout=10) # Dodano timeout
-        r.raise_for_status() # Wyrzuca wyjątek dla kodów statusu 4xx/5xx
-        soup = BeautifulSoup(r.content, 'html5lib')
+def _extract_dom_fields(item_data, page):
+    """Wypełnia rekord polami odczytanymi ze sparsowanej strony (parse_offer_dom)."""
 
+    with tracer.span("title_price", "parse"):
         # Extract title
-        title_tag = soup.find("title")
-        item_data["Tytuł oferty"] = title_tag.text.strip() if title_tag else "brak danych"
+        item_data["Tytuł oferty"] = page.title() or "brak danych"
 
         # Extract price
-        price_tag = soup.find("meta", {"property": "og:description"})
-        if price_tag:
+        price_content = page.meta("property", "og:description")
+        if price_content:
             try:
                 price_text = (
-                    price_tag["content"].split("za cenę")[1].split(" zł")[0].strip()
+                    price_content.split("za cenę")[1].split(" zł")[0].strip()
                 )
                 item_data["Cena"] = price_text
             except IndexError:
                 pass # Pozostaw "brak danych"
 
+    with tracer.span("description", "parse"):
         # Extract description
-        description_meta = soup.find("meta", {"name": "description"})
-        item_data["Opis"] = description_meta["content"] if description_meta else "brak danych"
-
-
-        details_dict = {
-            "Rynek": "Rynek",
-            "Certyfikat energetyczny": "Certyfikat energetyczny",
-            "Numer mieszkania": "Numer mieszkania",
-            "Rzut mieszkania": "Rzut mieszkania",
-            "Typ ogłoszeniodawcy": "Typ ogłoszeniodawcy",
-            "Rodzaj zabudowy": "Rodzaj zabudowy",
-            "Piętro": "Piętro",
-            "Materiał budynku": "Materiał budynku",
-            "Okna": "Okna",
-            "Ogrzewanie": "Ogrzewanie",
-            "Rok budowy": "Rok budowy",
-            "Stan wykończenia": "Stan wykończenia",
-            "Czynsz": "Czynsz",
-            "Forma własności": "Forma własności",
-            "Dostępne od": "Dostępne od",
-        }
+        description = page.meta("name", "description")
+        item_data["Opis"] = description if description else "brak danych"
+
 
+    details_dict = {
+        "Rynek": "Rynek",
+        "Certyfikat energetyczny": "Certyfikat energetyczny",
+        "Numer mieszkania": "Numer mieszkania",
+        "Rzut mieszkania": "Rzut mieszkania",
+        "Typ ogłoszeniodawcy": "Typ ogłoszeniodawcy",
+        "Rodzaj zabudowy": "Rodzaj zabudowy",
+        "Piętro": "Piętro",
+        "Materiał budynku": "Materiał budynku",
+        "Okna": "Okna",
+        "Ogrzewanie": "Ogrzewanie",
+        "Rok budowy": "Rok budowy",
+        "Stan wykończenia": "Stan wykończenia",
+        "Czynsz": "Czynsz",
+        "Forma własności": "Forma własności",
+        "Dostępne od": "Dostępne od",
+    }
+
+    with tracer.span("details", "parse"):
         #extracting values from table
         for key, label in details_dict.items():
-            selector = f"p:-soup-contains('{label}')"
             try:
-                element = soup.select_one(selector)
-                if element:
-                    value_element = element.find_next("p")
-                    if value_element:
-                        item_data[key] = value_element.text.strip()
+                value = page.label_value(label)
+                if value is not None:
+                    item_data[key] = value
             except Exception as e:
                 # print(f"Error extracting {key} for {url}: {e}") # Ostrożnie z printami w wątkach
                 pass
 
 
+    with tracer.span("coordinates", "parse"):
         # Extract latitude and longitude
-        coordinates_script = soup.find(
-            "script", string=lambda text: text and '"__typename":"Coordinates"' in text
-        )
-        if coordinates_script:
-            script_content = coordinates_script.string
+        script_content = page.script_containing('"__typename":"Coordinates"')
+        if script_content:
             try:
                 lat = (
                     script_content.split('"latitude":')[1].split(",")[0].strip()
@@ -124,10 +105,10 @@ def fetch_and_parse_offer(oferta_path):
                 item_data["Długość geograficzna"] = lon
             except IndexError:
                 pass
-        
+
+    with tracer.span("area_rooms", "parse"):
         # Extract area and price per square meter
-        if description_meta:
-            description = description_meta["content"]
+        if description:
 
             # Extract area
             try:
@@ -155,18 +136,73 @@ def fetch_and_parse_offer(oferta_path):
             except (ValueError, TypeError, KeyError):
                 pass
 
-    except requests.exceptions.RequestException as e:
-        print(f"Błąd połączenia dla {url}: {e}")
-    except Exception as e:
-        print(f"Niespodziewany błąd dla {url}: {e}")
+    return item_data
+
+
+def parse_offer(url, content, backend=None, fingerprints=None):
+    """
+    Parsuje pobraną stronę oferty i zwraca rekord OfferRecord.
+    Nie wykonuje żadnych zapytań, więc może być użyta przez dowolny silnik pobierania.
+
+    Z fingerprints (FingerprintStore) strona, której odcisk nie zmienił się od ostatniego
+    parsowania, nie jest parsowana - zwracany jest zapisany rekord.
+    """
+    with tracer.span("next_data", "parse"):
+        next_data = next_data_bytes(content)
+
+    if fingerprints is not None:
+        # odcisk z surowych bajtów - przy trafieniu JSON nie jest w ogóle dekodowany
+        with tracer.span("fingerprint", "parse"):
+            fingerprint = page_fingerprint(content, next_data)
+            item_data = fingerprints.lookup(url, fingerprint)
+        if item_data is not None:
+            return item_data
+
+    with tracer.span("decode_json", "parse"):
+        ad = extract_ad(content, next_data) if next_data is not None else None
+
+    # szybka ścieżka - osadzony JSON, DOM tylko gdy go brakuje
+    if ad is not None:
+        with tracer.span("extract_fields", "parse", source="json"):
+            item_data = parse_ad(ad, empty_offer(url))
+    else:
+        item_data = parse_offer_dom(url, content, backend)
 
+    # odcisk __NEXT_DATA__ nie obejmuje pól z DOM - strona z JSON-em bez ogłoszenia nie jest zapisywana
+    if fingerprints is not None and (ad is not None or next_data is None):
+        fingerprints.store(url, fingerprint, item_data)
     return item_data
 
 
-def get_data_multithreaded(lista_ofert: list, max_threads = 16) -> pd.DataFrame:
+def fetch_and_parse_offer(oferta_path, fingerprints=None):
+    """
+    Pobiera dane dla pojedynczej oferty i zwraca rekord OfferRecord.
+    Ta funkcja będzie wykonywana w osobnym wątku.
+    fingerprints (FingerprintStore) pozwala pominąć parsowanie niezmienionych stron (parse_offer).
+
+    Gdy strony nie udało się pobrać mimo ponowień (http_client), rzuca wyjątek zamiast
+    zwracać wiersz "brak danych" - wywołujący pomija ofertę, a tryby delta i strumieniowy
+    pobiorą ją przy następnym uruchomieniu.
+    """
+    url = http_client.offer_url(oferta_path)
+
+    with tracer.profile(url), tracer.span("offer", url=url):
+        try:
+            r = http_client.get(url) # wspólna sesja z pulą połączeń, timeoutem i ponowieniami
+            r.raise_for_status() # Wyrzuca wyjątek dla kodów statusu 4xx/5xx
+        except requests.exceptions.RequestException as e:
+            print(f"Błąd połączenia dla {url}: {e}")
+            raise
+
+        return parse_offer(url, r.content, fingerprints=fingerprints)
+
+
+def get_data_multithreaded(lista_ofert: list, max_threads = 16, fingerprints = None) -> pd.DataFrame:
     """Pobiera dane z listy ofert wielowątkowo i zwraca DataFrame."""
 
-    results = []
+    # wiersze trafiają od razu do list kolumn, bez trzymania słownika na każdą ofertę
+    results = ColumnarAccumulator()
+    failed = []
     # Dobierz liczbę wątków - zazwyczaj 5-10 jest dobrym punktem wyjścia dla scraping
     # Zbyt duża liczba wątków może przeciążyć serwer docelowy lub Twoje łącze.
     # Optymalna liczba zależy od szybkości sieci, opóźnień serwera i limitów.
@@ -178,7 +214,7 @@ def get_data_multithreaded(lista_ofert: list, max_threads = 16) -> pd.DataFrame:
         # tqdm tutaj współpracuje z executor.map, aby pokazać postęp.
         # Pamiętaj, że tqdm może nie pokazywać postępu liniowo,
         # ponieważ zadania kończą się w różnej kolejności.
-        futures = {executor.submit(fetch_and_parse_offer, oferta): oferta for oferta in lista_ofert}
+        futures = {executor.submit(fetch_and_parse_offer, oferta, fingerprints): oferta for oferta in lista_ofert}
 
         for future in tqdm(concurrent.futures.as_completed(futures), total=len(lista_ofert), desc="getting data for offers"):
             offer_url_path = futures[future] # Odzyskaj oryginalną ścieżkę oferty
@@ -186,46 +222,69 @@ def get_data_multithreaded(lista_ofert: list, max_threads = 16) -> pd.DataFrame:
                 data_for_item = future.result()
                 results.append(data_for_item)
             except Exception as exc:
+                failed.append(offer_url_path)
                 print(f'{offer_url_path} wygenerowało wyjątek: {exc}')
 
-    # Inicjalizacja DataFrame na podstawie listy słowników
-    data_set = pd.DataFrame(results)
-
-    # --- Data Clean-up (przeniesione tutaj, po zebraniu wszystkich danych) ---
-    # To jest CPU-bound i może pozostać w głównym wątku,
-    # chyba że DataFrame jest bardzo duży i wymaga dalszej równoległości
-    # (wtedy ProcessPoolExecutor dla tej części).
-
-    data_set['Cena'] = data_set['Cena'].astype(str).str.replace(',', '.')
-    data_set['Cena'] = pd.to_numeric(data_set['Cena'].str.replace(' ', ''), errors='coerce')
-    data_set['Powierzchnia'] = data_set['Powierzchnia'].str.replace(',', '.')
-    
-    # Obsługa Piętro, która może nie mieć "/", zabezpieczenie przed błędem
-    # Użycie .str.split().str[0] i .str.split().str[1]
-    data_set['Piętro_temp'] = data_set['Piętro'].apply(lambda x: x.split('/')[0] if isinstance(x, str) and '/' in x else x)
-    data_set['liczba pięter w budynku'] = data_set['Piętro'].apply(lambda x: x.split('/')[1] if isinstance(x, str) and '/' in x else np.nan)
-    data_set['Piętro'] = data_set['Piętro_temp']
-    data_set = data_set.drop(columns=['Piętro_temp'])
-
-
-    data_set['Piętro'] = data_set['Piętro'].replace('parter', 0)
-    data_set['Piętro'] = data_set['Piętro'].replace('> 10', 11) #wszystkie piętra wyżej niż 10 oznaczymy jako 11
-    data_set['Czynsz'] = data_set['Czynsz'].str.replace(',', '.')
-    data_set['Czynsz'] = data_set['Czynsz'].str.replace('zł', '')
-    data_set = data_set.replace('brak danych', np.nan)
-    data_set = data_set.replace('brak informacji', np.nan)
-    data_set['Czynsz'] = data_set['Czynsz'].str.replace(' ', '')
-    data_set['Cena za m²'] = pd.to_numeric(data_set['Cena za m²'], errors='coerce')
-
-    # dropping not populated columns
-    data_set = data_set.drop(['Rzut mieszkania', 'Numer mieszkania'], axis=1)
-    kolejnosc = ['link','Tytuł oferty', 'Cena','Powierzchnia','Cena za m²', 'Liczba pokoi', 'Rynek', 'Piętro', 'liczba pięter w budynku', 'Rodzaj zabudowy','Rok budowy','Typ ogłoszeniodawcy', 'Certyfikat energetyczny','Rodzaj zabudowy','Materiał budynku','Okna','Ogrzewanie','Stan wykończenia', 'Czynsz', 'Forma własności', 'Dostępne od', 'Opis', 'Szerokość geograficzna', 'Długość geograficzna']
-    data_set = data_set[kolejnosc]
-    data_set = data_set.rename(columns={'Cena za m²': 'cena za metr', 'Szerokość geograficzna':'lat', 'Długość geograficzna':'lon'})
-    data_set['Powierzchnia'] = pd.to_numeric(data_set['Powierzchnia'], errors='coerce')
-    data_set['Rok budowy'] = pd.to_numeric(data_set['Rok budowy'], errors='coerce')
-    data_set['Czynsz'] = pd.to_numeric(data_set['Czynsz'], errors='coerce')
-    data_set['Piętro'] = pd.to_numeric(data_set['Piętro'], errors='coerce')
-    data_set.drop_duplicates(subset='link', inplace=True) # dodano inplace=True
-
-    return data_set
\ No newline at end of file
+    if failed:
+        print(f"Nie udało się pobrać {len(failed)} ofert (pominięte w wyniku)")
+    return clean_offers(results)
+
+
+def stream_data_multithreaded(lista_ofert: list, output_path: str, max_threads = 16, chunk_size = 500,
+                              checkpoint_path = None, fingerprints = None) -> int:
+    """
+    Pobiera dane z listy ofert wielowątkowo i zapisuje oczyszczone wiersze porcjami do output_path
+    (CSV albo katalog Parquet dla ścieżki kończącej się na .parquet), zamiast trzymać wszystko w pamięci.
+
+    Po każdej zapisanej porcji ścieżki ofert trafiają do pliku checkpoint (domyślnie output_path + '.done'),
+    więc ponowne uruchomienie pomija oferty już zapisane. W toku jest najwyżej max_threads * 2 zadań,
+    a w pamięci najwyżej chunk_size wierszy, niezależnie od długości listy.
+
+    Returns:
+        int: Liczba zapisanych ofert w tym uruchomieniu.
+    """
+    sink = open_sink(output_path)
+    checkpoint = Checkpoint(checkpoint_path or output_path + '.done')
+    done = checkpoint.load()
+    todo = [oferta for oferta in dict.fromkeys(lista_ofert) if oferta not in done]
+    if done:
+        print(f"Wznowienie: {len(done)} ofert już zapisanych, pozostało {len(todo)}")
+
+    chunk, chunk_paths = ColumnarAccumulator(), []
+    written = 0
+
+    def flush():
+        nonlocal chunk_paths, written
+        if chunk_paths:
+            sink.write(clean_offers(chunk.drain()))
+            checkpoint.add(chunk_paths)
+            written += len(chunk_paths)
+        chunk_paths = []
+
+    oferty = iter(todo)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor, \
+            tqdm(total=len(todo), desc="getting data for offers") as progress:
+        futures = {}
+        while True:
+            # dokładamy zadania tylko do limitu, żeby nie trzymać w pamięci Future dla całej listy
+            for oferta in oferty:
+                futures[executor.submit(fetch_and_parse_offer, oferta, fingerprints)] = oferta
+                if len(futures) >= max_threads * 2:
+                    break
+            if not futures:
+                break
+
+            completed, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in completed:
+                offer_url_path = futures.pop(future)
+                progress.update(1)
+                try:
+                    chunk.append(future.result())
+                    chunk_paths.append(offer_url_path)
+                except Exception as exc:
+                    print(f'{offer_url_path} wygenerowało wyjątek: {exc}')
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+
+    return written
@@ -0,0 +1,161 @@
+import concurrent.futures
+import multiprocessing
+import os
+import time
+
+import pandas as pd
+import requests
+from tqdm import tqdm
+
+import http_client
+from cleanup import clean_offers
+from get_data_mulithreaded import parse_offer
+from records import ColumnarAccumulator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Dwuetapowe pobieranie ofert: wątki tylko pobierają strony (I/O, GIL zwalniany na gniazdach),
+# a parsowanie i wyciąganie pól - główny koszt CPU - odbywa się w puli procesów,
+# więc skaluje się z liczbą rdzeni zamiast czekać na GIL w wątkach pobierających.
+# Strony trafiają do procesów paczkami, żeby koszt przesyłania (pickle) rozłożył się na wiele ofert.
+
+
+def fetch_offer_content(oferta_path):
+    """Pobiera stronę oferty i zwraca (url, treść); rzuca wyjątek, gdy pobranie się nie udało."""
+    url = http_client.offer_url(oferta_path)
+    try:
+        r = http_client.get(url)
+        r.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Błąd połączenia dla {url}: {e}")
+        raise
+    return url, r.content
+
+
+def parse_batch(pages, backend=None):
+    """
+    Parsuje paczkę stron [(ścieżka, url, treść)] w procesie roboczym.
+    Zwraca ([(ścieżka, OfferRecord albo None, opis błędu albo None)], czas CPU parsowania w sekundach,
+    szczytowe RSS procesu roboczego w KiB albo None).
+    """
+    start = time.process_time()
+    results = []
+    for oferta_path, url, content in pages:
+        try:
+            results.append((oferta_path, parse_offer(url, content, backend), None))
+        except Exception as exc:
+            results.append((oferta_path, None, repr(exc)))
+    # ru_maxrss jest w KiB na Linuksie
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None
+    return results, time.process_time() - start, peak_rss_kb
+
+
+def _process_context():
+    # forkserver: procesy robocze nie dziedziczą wątków pobierających ani ich blokad (bezpieczne
+    # przy działających wątkach, w przeciwieństwie do fork); na Windows/macOS dostępny jest spawn
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def get_data_multiprocess(lista_ofert: list, io_threads = 32, processes = None, batch_size = 32,
+                          backend = None, worker_stats = None) -> pd.DataFrame:
+    """
+    Pobiera dane z listy ofert: wątki pobierają strony, procesy je parsują. Zwraca DataFrame
+    w tym samym formacie co get_data_multithreaded.
+
+    W toku jest najwyżej io_threads * 2 pobrań i processes * 2 paczek do parsowania,
+    więc w pamięci nie ma nigdy więcej niż kilkaset nieprzetworzonych stron.
+
+    Args:
+        lista_ofert (list): Ścieżki ofert zaczynające się od "/pl/oferta/".
+        io_threads (int): Liczba wątków pobierających.
+        processes (int): Liczba procesów parsujących; domyślnie liczba rdzeni.
+        batch_size (int): Liczba stron w paczce przekazywanej do procesu.
+        backend (str): Parser HTML dla stron bez osadzonego JSON-a (parsers.py).
+        worker_stats (dict): Uzupełniany pomiarami z procesów roboczych: 'cpu_parse_s' - łączny
+                             czas CPU parsowania, 'peak_rss_kb' - największe szczytowe RSS procesu.
+                             Procesy uruchamiane przez forkserver nie są dziećmi tego procesu,
+                             więc nie widać ich w getrusage(RUSAGE_CHILDREN).
+    """
+    processes = processes or os.cpu_count() or 1
+    if worker_stats is not None:
+        worker_stats.setdefault("cpu_parse_s", 0.0)
+        worker_stats.setdefault("peak_rss_kb", None)
+    results = ColumnarAccumulator()
+    failed = []
+    batch = []
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, mp_context=_process_context()) as parse_pool, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=io_threads) as fetch_pool, \
+            tqdm(total=len(lista_ofert), desc="getting data for offers") as progress:
+        downloads = {}
+        parsing = {}  # Future paczki -> ścieżki ofert w paczce
+
+        def collect(done):
+            for future in done:
+                paths = parsing.pop(future)
+                try:
+                    parsed, cpu_s, peak_rss_kb = future.result()
+                except Exception as exc:
+                    # np. zabity proces roboczy - cała paczka przepada
+                    failed.extend(paths)
+                    progress.update(len(paths))
+                    print(f"Paczka {len(paths)} ofert wygenerowała wyjątek: {exc}")
+                    continue
+                if worker_stats is not None:
+                    worker_stats["cpu_parse_s"] += cpu_s
+                    if peak_rss_kb is not None:
+                        worker_stats["peak_rss_kb"] = max(worker_stats["peak_rss_kb"] or 0, peak_rss_kb)
+                for oferta_path, item_data, error in parsed:
+                    progress.update(1)
+                    if error is None:
+                        results.append(item_data)
+                    else:
+                        failed.append(oferta_path)
+                        print(f'{oferta_path} wygenerowało wyjątek: {error}')
+
+        def submit_batch():
+            nonlocal batch
+            if not batch:
+                return
+            # backpressure: nie więcej niż processes * 2 paczek czekających na procesy
+            while len(parsing) >= processes * 2:
+                done, _ = concurrent.futures.wait(parsing, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(done)
+            parsing[parse_pool.submit(parse_batch, batch, backend)] = [oferta for oferta, _, _ in batch]
+            batch = []
+
+        oferty = iter(lista_ofert)
+        while True:
+            for oferta in oferty:
+                downloads[fetch_pool.submit(fetch_offer_content, oferta)] = oferta
+                if len(downloads) >= io_threads * 2:
+                    break
+            if not downloads:
+                break
+
+            completed, _ = concurrent.futures.wait(downloads, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in completed:
+                oferta = downloads.pop(future)
+                try:
+                    url, content = future.result()
+                except Exception as exc:
+                    failed.append(oferta)
+                    progress.update(1)
+                    print(f'{oferta} wygenerowało wyjątek: {exc}')
+                    continue
+                batch.append((oferta, url, content))
+                if len(batch) >= batch_size:
+                    submit_batch()
+            # odbieramy gotowe paczki na bieżąco, żeby wyniki nie czekały do końca pobierania
+            collect([future for future in parsing if future.done()])
+        submit_batch()
+        collect(concurrent.futures.wait(parsing).done)
+
+    if failed:
+        print(f"Nie udało się pobrać {len(failed)} ofert (pominięte w wyniku)")
+    return clean_offers(results)
+
@@ -1,51 +1,102 @@
-from urllib import request
-from bs4 import BeautifulSoup
-import requests, re, os
 from tqdm import tqdm
-from IPython.display import clear_output
 
+import http_client
+from instrumentation import tracer
+from offer_json import extract_next_data
+from parsers import parse_html
 
-def get_offers(pages = 50) -> list:
+
+def extract_offer_links(content, backend=None) -> list:
+    """Zwraca unikalne ścieżki ofert ("/pl/oferta/...") ze strony wyników."""
+    page = parse_html(content, backend)
+    # Filter the URLs that start with "/pl/oferta/"
+    filtered_urls = [url for url in page.links() if url.startswith('/pl/oferta/')]
+    return list(set(filtered_urls))
+
+
+def extract_listing_prices(content) -> dict:
+    """
+    Zwraca {ścieżka oferty: cena} z osadzonego JSON-a strony wyników.
+    Pusty słownik, gdy strona nie zawiera JSON-a albo ma inną strukturę.
+    """
+    next_data = extract_next_data(content)
+    try:
+        items = next_data["props"]["pageProps"]["data"]["searchAds"]["items"]
+    except (KeyError, TypeError):
+        return {}
+    prices = {}
+    for item in items or []:
+        slug = item.get("slug")
+        if not slug:
+            continue
+        total_price = item.get("totalPrice") or {}
+        prices[f"/pl/oferta/{slug}"] = total_price.get("value")
+    return prices
+
+# Wyszukiwania: nazwa -> ścieżka wyników otodom.pl (transakcja/typ nieruchomości/lokalizacja).
+# Zamiast nazwy można też podać samą ścieżkę, np. "wynajem/mieszkanie/pomorskie/gdansk/gdansk/gdansk".
+SEARCH_TARGETS = {
+    "warszawa-sprzedaz-mieszkanie": "sprzedaz/mieszkanie/mazowieckie/warszawa/warszawa/warszawa",
+    "warszawa-wynajem-mieszkanie": "wynajem/mieszkanie/mazowieckie/warszawa/warszawa/warszawa",
+    "warszawa-sprzedaz-dom": "sprzedaz/dom/mazowieckie/warszawa/warszawa/warszawa",
+    "krakow-sprzedaz-mieszkanie": "sprzedaz/mieszkanie/malopolskie/krakow/krakow/krakow",
+}
+DEFAULT_TARGET = "warszawa-sprzedaz-mieszkanie"
+
+
+def listing_url(page, target = DEFAULT_TARGET) -> str:
+    """Adres strony wyników (numeracja stron od 1) dla wyszukiwania target (patrz SEARCH_TARGETS)."""
+    search_path = SEARCH_TARGETS.get(target, target)
+    return f"{http_client.BASE_URL}/pl/wyniki/{search_path}?viewType=listing&page={page}"
+
+
+@tracer.traced("listing_page")
+def fetch_listing_page(page, target = DEFAULT_TARGET):
+    """
+    Pobiera jedną stronę wyników i zwraca {ścieżka oferty: cena z listy wyników albo None}
+    lub None, gdy strony nie udało się pobrać.
+    """
+    r = http_client.get(listing_url(page, target))
+
+    if r.status_code == 200:
+        # jedno parsowanie strony - wcześniej html5lib, a potem jeszcze html.parser na str(soup)
+        prices = extract_listing_prices(r.content)
+        return {path: prices.get(path) for path in extract_offer_links(r.content)}
+    print(f"Failed to retrieve the webpage. Status code: {r.status_code}")
+    return None
+
+
+def get_offers(pages = 50, seen_store = None, stop_after_known_pages = 3, target = DEFAULT_TARGET) -> list:
     """
     function to get you offers from x amount of pages of results
+
+    W trybie delta (seen_store - obiekt SeenOffers) zwraca tylko oferty nowe
+    i te, których cena na liście wyników się zmieniła, a przeglądanie kończy się
+    po stop_after_known_pages kolejnych stronach zawierających wyłącznie znane oferty.
+    Po pobraniu oferty należy wywołać seen_store.mark_scraped(ścieżka).
     """
     
     # Tworzenie listy linków do ofert dla ofert z pierwszych 50 stron
 
 
     lista_ofert = []
+    known_pages = 0
     for page in tqdm(range(pages), desc='finding offers '):
-        url = f"https://www.otodom.pl/pl/wyniki/sprzedaz/mieszkanie/mazowieckie/warszawa/warszawa/warszawa?viewType=listing&page={page+1}"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/"
-        }
-        r = requests.get(url, headers=headers)
-
-        if r.status_code == 200:
-            soup = BeautifulSoup(r.content, 'html5lib')
-            html_string = str(soup)
-            #print("Success")
-        else:
-            print(f"Failed to retrieve the webpage. Status code: {r.status_code}")
+        unique_urls = fetch_listing_page(page + 1, target)
+        if unique_urls is None:
             break
-            
-        content = html_string
-
-        # Parse the HTML content using BeautifulSoup
-        soup = BeautifulSoup(content, 'html.parser')
-
-        # Find all 'a' tags
-        links = soup.find_all('a', href=True)
 
-        # Extract the URLs
-        urls = [link['href'] for link in links]
+        if seen_store is not None:
+            all_known, unique_urls = seen_store.observe(unique_urls)
+            known_pages = known_pages + 1 if all_known else 0
 
-        # Filter the URLs that start with "/pl/oferta/"
-        filtered_urls = [url for url in urls if url.startswith('/pl/oferta/')]
-        unique_urls = list(set(filtered_urls))
         for element in unique_urls:
             lista_ofert.append(element)
 
+        if seen_store is not None and known_pages >= stop_after_known_pages:
+            print(f"{known_pages} kolejne strony bez nowych ofert - koniec przeglądania")
+            break
+
     print(f"Liczba ofert: {len(lista_ofert)}")
     return lista_ofert
 
@@ -1,47 +1,131 @@
 # function to update prices from calready collected data
 
-import requests
 import re
+import concurrent.futures
 import pandas as pd
-from bs4 import BeautifulSoup
-from get_data import get_data
+from tqdm import tqdm
 from IPython.display import clear_output
+import http_client
+from get_data_mulithreaded import get_data_multithreaded
+from offer_json import extract_ad
+from parsers import parse_html
+
+
+def extract_price(content, backend=None):
+    """
+    Zwraca cenę oferty albo None: target.Price z osadzonego JSON-a (offer_json),
+    a gdy go brak - cenę z nagłówka strony.
+    """
+    ad = extract_ad(content)
+    if ad is not None:
+        try:
+            return float((ad.get("target") or {})["Price"])
+        except (KeyError, TypeError, ValueError):
+            pass
+    page = parse_html(content, backend)
+    price_text = page.text('strong', {'data-cy': 'adPageHeaderPrice'})
+    if price_text is None:
+        return None
+    price_text = price_text.replace("zł", "").replace(" ", "")
+    try:
+        return float(price_text)
+    except ValueError:
+        return None
 
 
 def get_price(link):
-    url = link
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/"
-    }
-    r = requests.get(url = url, headers=headers)
+    return fetch_price(link)[1]
+
+
+def fetch_price(link):
+    """
+    Zwraca (kod HTTP, cena albo None) - pozwala odróżnić ofertę usuniętą (404/410)
+    od chwilowego błędu (refresh_scheduler.py).
+    """
+    r = http_client.get(link)
     if r.status_code == 200:
-        soup = BeautifulSoup(r.content, 'html5lib')
-        price_element = soup.find('strong', {'data-cy': 'adPageHeaderPrice'})
-        if price_element:
-            price_text = price_element.text
-            price_text = price_text.replace("zł", "").replace(" ", "")
-            try:
-                price = float(price_text)
-                return price
-            except ValueError:
-                return None
-        else: return None
-    else:
-        return None
+        return r.status_code, extract_price(r.content)
+    return r.status_code, None
 
 
 
 
 
-def get_price_update(lista_ofert: list, df: pd.DataFrame, last_update: str) -> pd.DataFrame:
-    """aktualizuje df o nowe oferty i dodaje informację o aktualnej cenie"""
+def get_prices(links, max_threads = 16, on_result = None, fetch = get_price) -> dict:
+    """
+    Pobiera aktualne ceny dla wielu ofert równolegle i zwraca {link: cena albo None}.
+    on_result(link, cena) jest wywoływane po każdej pobranej cenie - np. do zapisu częściowych wyników.
+    fetch=fetch_price zwraca zamiast ceny pary (kod HTTP, cena); wyjątek daje None.
+    """
+    prices = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+        futures = {executor.submit(fetch, link): link for link in links}
+        for future in tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="updating prices"):
+            link = futures[future]
+            try:
+                price = future.result()
+            except Exception as exc:
+                print(f'{link} wygenerowało wyjątek: {exc}')
+                price = None
+            prices[link] = price
+            if on_result is not None:
+                on_result(link, price)
+    return prices
+
+
+def get_price_update(lista_ofert: list, df: pd.DataFrame, last_update: str, max_threads = 16,
+                     on_result = None, history = None, scheduler = None, budget = None) -> pd.DataFrame:
+    """
+    aktualizuje df o nowe oferty i dodaje informację o aktualnej cenie
+
+    Z history (obiekt PriceHistory) poprzednie i nowe ceny trafiają do historii w formacie długim
+    zamiast do nowej kolumny nazwanej last_update.
+
+    Ze scheduler (RefreshScheduler, refresh_scheduler.py) sprawdzane są tylko oferty, którym minął
+    termin sprawdzenia, najwyżej budget (domyślnie dzienny limit schedulera); pozostałe zachowują
+    dotychczasową cenę, a oferty usunięte (404/410) dostają pustą cenę. Nowe ceny zapisuje wtedy
+    scheduler do swojej historii - powinna to być ta sama PriceHistory; do history trafiają
+    wcześniej poprzednie ceny tylko ofert wybranych do sprawdzenia.
+    """
     
-    df['recent_price'] = df['Cena']
-    df = df.rename(columns={'recent_price': last_update})
-    df['Cena'] = df['link'].apply(get_price)
-    nowe_unikalne_oferty = pd.Series([x for x in lista_ofert if x not in df['link'].values])
-    nowe_oferty = get_data(lista_ofert=nowe_unikalne_oferty)
-    df = pd.concat([df, nowe_oferty], ignore_index=True)
+    if history is None:
+        df['recent_price'] = df['Cena']
+        df = df.rename(columns={'recent_price': last_update})
+    elif scheduler is None:
+        history.record_frame(df, last_update)
+
+    if scheduler is None:
+        prices = get_prices(df['link'].unique(), max_threads=max_threads, on_result=on_result)
+        df['Cena'] = df['link'].map(prices)
+        if history is not None:
+            history.record(prices)
+    else:
+        scheduler.add(df['link'].unique())
+        scheduler.mark_seen(http_client.offer_url(x) for x in lista_ofert)
+        due = scheduler.due(budget) if budget else scheduler.due()
+        if history is not None:
+            # poprzednie ceny tylko ofert do sprawdzenia (pozostałe wiersze df mogą mieć ceny
+            # z wcześniejszych dni niż last_update) - przed refresh, żeby change_stats() w
+            # record_results porównało nowe ceny z poprzednimi
+            history.record_frame(df[df['link'].isin(due)], last_update)
+        checked = scheduler.refresh(budget, max_threads=max_threads, on_result=on_result, links=due)
+        prices = {link: price for link, (status, price) in checked.items() if price is not None}
+        gone = df['link'].isin([link for link, (status, _) in checked.items() if status in (404, 410)])
+        updated = df['link'].isin(prices.keys())
+        df.loc[updated, 'Cena'] = df.loc[updated, 'link'].map(prices)
+        df.loc[gone, 'Cena'] = None
+
+    # df['link'] zawiera pełne adresy, a lista_ofert ścieżki "/pl/oferta/..." - porównujemy po zbiorze
+    znane_linki = set(df['link'])
+    nowe_unikalne_oferty = [
+        x for x in dict.fromkeys(lista_ofert)
+        if x not in znane_linki and http_client.offer_url(x) not in znane_linki
+    ]
+    if nowe_unikalne_oferty:
+        nowe_oferty = get_data_multithreaded(lista_ofert=nowe_unikalne_oferty, max_threads=max_threads)
+        if history is not None:
+            history.record_frame(nowe_oferty)
+        df = pd.concat([df, nowe_oferty], ignore_index=True)
 
     return df
 
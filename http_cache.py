@@ -0,0 +1,146 @@
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Trwały cache odpowiedzi HTTP w jednym pliku SQLite.
+# Treść stron jest kompresowana zlib, kluczem jest URL, a rozmiar cache
+# jest ograniczony - przy przekroczeniu usuwane są najdawniej używane wpisy (LRU).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+"""
+
+
+class ResponseCache:
+    """
+    Cache odpowiedzi z TTL, rewalidacją przez ETag/Last-Modified i limitem rozmiaru.
+
+    Args:
+        path (str): Plik bazy SQLite.
+        ttl (int): Po ilu sekundach wpis wymaga rewalidacji.
+        max_bytes (int): Maksymalny łączny rozmiar skompresowanych stron.
+    """
+
+    def __init__(self, path="http_cache.sqlite", ttl=6 * 3600, max_bytes=2 * 1024 ** 3):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def lookup(self, url):
+        """Zwraca wpis (słownik) dla URL albo None; oznacza wpis jako ostatnio użyty."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, body, content_type, etag, last_modified, fetched_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        status, body, content_type, etag, last_modified, fetched_at = row
+        return {
+            "url": url,
+            "status": status,
+            "content": zlib.decompress(body),
+            "content_type": content_type,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+        }
+
+    def is_fresh(self, entry) -> bool:
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry) -> dict:
+        """Nagłówki zapytania warunkowego dla nieaktualnego wpisu."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, status, headers, content):
+        """Zapisuje odpowiedź i w razie potrzeby usuwa najdawniej używane wpisy."""
+        body = zlib.compress(content, 6)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, status, body, headers.get("Content-Type"), headers.get("ETag"),
+                 headers.get("Last-Modified"), now, now, len(body)),
+            )
+            self._total_bytes += len(body) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def revalidated(self, url):
+        """Serwer odpowiedział 304 - wpis jest znów aktualny."""
+        with self._lock:
+            now = time.time()
+            self._conn.execute("UPDATE responses SET fetched_at = ?, last_access = ? WHERE url = ?", (now, now, url))
+            self._conn.commit()
+
+    def _evict(self):
+        # usuwamy do 90% limitu, żeby nie sprzątać przy każdym kolejnym zapisie
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT url, size FROM responses ORDER BY last_access").fetchall()
+        to_delete = []
+        for url, size in rows:
+            if self._total_bytes <= target:
+                break
+            to_delete.append((url,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE url = ?", to_delete)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def build_response(entry) -> requests.Response:
+    """Tworzy requests.Response z wpisu cache, żeby wywołujący nie musieli rozróżniać źródła."""
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response.url = entry["url"]
+    response._content = entry["content"]
+    response.headers = CaseInsensitiveDict({"Content-Type": entry["content_type"] or "text/html"})
+    if entry.get("etag"):
+        response.headers["ETag"] = entry["etag"]
+    if entry.get("last_modified"):
+        response.headers["Last-Modified"] = entry["last_modified"]
+    response.encoding = "utf-8"
+    return response
+
+
+def offline_miss(url) -> requests.Response:
+    """Odpowiedź dla strony, której nie ma w cache w trybie offline (jak 'only-if-cached')."""
+    response = requests.Response()
+    response.status_code = 504
+    response.url = url
+    response.reason = "Not in cache (offline mode)"
+    response._content = b""
+    return response
@@ -0,0 +1,279 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from http_cache import ResponseCache, build_response, offline_miss
+from instrumentation import tracer
+from rate_control import RETRY_STATUSES, ConcurrencyController, backoff_delay, parse_retry_after
+
+# Wspólna warstwa HTTP dla wszystkich pobierań z otodom.pl.
+# Jedna sesja z pulą połączeń (keep-alive) zamiast osobnego requests.get
+# dla każdej strony, czyli bez nowego handshake TCP+TLS przy każdym zapytaniu.
+
+BASE_URL = os.environ.get("OTODOM_BASE_URL", "https://www.otodom.pl")
+DEFAULT_TIMEOUT = 10
+POOL_SIZE = 32
+
+# Cache odpowiedzi (http_cache.py) włącza się przez FLAT_FINDER_CACHE=ścieżka_do_pliku
+# albo configure(cache_path=...). W trybie offline strony są brane wyłącznie z cache,
+# np. żeby po zmianie parsera przeliczyć wczorajszy crawl bez dostępu do sieci.
+CACHE_PATH = os.environ.get("FLAT_FINDER_CACHE")
+CACHE_TTL = int(os.environ.get("FLAT_FINDER_CACHE_TTL", 6 * 3600))
+CACHE_MAX_BYTES = int(os.environ.get("FLAT_FINDER_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+OFFLINE = os.environ.get("FLAT_FINDER_OFFLINE") == "1"
+
+# ile razy ponawiać zapytanie po 429/5xx albo błędzie połączenia
+MAX_RETRIES = 4
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/",
+    # br działa, gdy zainstalowany jest pakiet brotli (requirements.txt)
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+}
+
+
+class HttpStats:
+    """Liczniki zapytań, nowych połączeń i przesłanych bajtów (bezpieczne dla wątków)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.handshakes = 0
+            self.bytes_wire = 0
+            self.bytes_decoded = 0
+            self.cache_hits = 0
+            self.cache_revalidated = 0
+            self.retries = 0
+            self.failures = 0
+
+    def connection_opened(self):
+        with self._lock:
+            self.handshakes += 1
+
+    def cache_hit(self, revalidated=False):
+        with self._lock:
+            if revalidated:
+                self.cache_revalidated += 1
+            else:
+                self.cache_hits += 1
+
+    def retried(self):
+        with self._lock:
+            self.retries += 1
+
+    def failed(self):
+        with self._lock:
+            self.failures += 1
+
+    def response_received(self, response):
+        # raw.tell() to liczba bajtów odczytanych z gniazda, czyli przed dekompresją
+        wire = response.raw.tell() if response.raw is not None else len(response.content)
+        with self._lock:
+            self.requests += 1
+            self.bytes_wire += wire
+            self.bytes_decoded += len(response.content)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "handshakes": self.handshakes,
+                "reused_connections": max(self.requests - self.handshakes, 0),
+                "bytes_wire": self.bytes_wire,
+                "bytes_decoded": self.bytes_decoded,
+                "cache_hits": self.cache_hits,
+                "cache_revalidated": self.cache_revalidated,
+                "retries": self.retries,
+                "failures": self.failures,
+            }
+
+
+stats = HttpStats()
+
+# wspólny dla wszystkich wątków (strony wyników i oferty) limit zapytań w toku i zapytań na sekundę
+controller = ConcurrencyController()
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        stats.connection_opened()
+        # DNS + TCP (+ TLS) nowego połączenia
+        with tracer.span("connect", "http", host=self.host):
+            super().connect()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        stats.connection_opened()
+        # DNS + TCP (+ TLS) nowego połączenia
+        with tracer.span("connect", "http", host=self.host):
+            super().connect()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter, którego pule połączeń liczą nowe połączenia w http_client.stats."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+
+
+def configure(pool_size=None, timeout=None, base_url=None, cache_path=None, cache_ttl=None,
+              cache_max_bytes=None, offline=None, max_retries=None, rate_controller=None):
+    """Zmienia ustawienia warstwy HTTP. Sesja i cache zostaną utworzone na nowo przy następnym zapytaniu."""
+    global POOL_SIZE, DEFAULT_TIMEOUT, BASE_URL, CACHE_PATH, CACHE_TTL, CACHE_MAX_BYTES, OFFLINE, MAX_RETRIES
+    global controller, _session, _cache
+    with _session_lock:
+        if max_retries is not None:
+            MAX_RETRIES = max_retries
+        if rate_controller is not None:
+            controller = rate_controller
+        if pool_size is not None:
+            POOL_SIZE = pool_size
+        if timeout is not None:
+            DEFAULT_TIMEOUT = timeout
+        if base_url is not None:
+            BASE_URL = base_url
+        if cache_path is not None:
+            CACHE_PATH = cache_path
+        if cache_ttl is not None:
+            CACHE_TTL = cache_ttl
+        if cache_max_bytes is not None:
+            CACHE_MAX_BYTES = cache_max_bytes
+        if offline is not None:
+            OFFLINE = offline
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+
+
+def get_session() -> requests.Session:
+    """
+    Zwraca wspólną sesję. Pula połączeń urllib3 jest bezpieczna dla wątków,
+    a pool_block=True sprawia, że przy większej liczbie wątków niż POOL_SIZE
+    wątki czekają na wolne połączenie zamiast otwierać nowe.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = PooledAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(HEADERS)
+            _session = session
+        return _session
+
+
+def get_cache():
+    """Zwraca wspólny ResponseCache albo None, gdy cache jest wyłączony."""
+    global _cache
+    with _session_lock:
+        if _cache is None and CACHE_PATH:
+            _cache = ResponseCache(CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES)
+        return _cache
+
+
+def offer_url(oferta_path) -> str:
+    """Pełny adres oferty na podstawie ścieżki "/pl/oferta/..."."""
+    return BASE_URL + str(oferta_path)
+
+
+def _get_with_retries(url, **kwargs) -> requests.Response:
+    session = get_session()
+    for attempt in range(MAX_RETRIES + 1):
+        controller.acquire()
+        try:
+            with tracer.span("download", "http", url=url, attempt=attempt) as span:
+                r = session.get(url, **kwargs)
+                span.update(status=r.status_code, bytes=len(r.content))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            controller.release(success=False)
+            tracer.count("flat_finder_http_errors_total", error=type(e).__name__)
+            if attempt == MAX_RETRIES:
+                stats.failed()
+                raise
+            stats.retried()
+            tracer.count("flat_finder_http_retries_total")
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        stats.response_received(r)
+        tracer.count("flat_finder_http_responses_total", status=r.status_code)
+        tracer.count("flat_finder_http_bytes_total", len(r.content))
+        if r.status_code not in RETRY_STATUSES:
+            controller.release(success=True)
+            return r
+
+        retry_after = parse_retry_after(r.headers.get("Retry-After"))
+        controller.release(success=False, retry_after=retry_after)
+        if attempt == MAX_RETRIES:
+            stats.failed()
+            return r
+        stats.retried()
+        tracer.count("flat_finder_http_retries_total")
+        time.sleep(retry_after if retry_after is not None else backoff_delay(attempt))
+    return r
+
+
+def get(url, timeout=None, **kwargs) -> requests.Response:
+    """
+    GET przez wspólną sesję z domyślnym timeoutem; aktualizuje liczniki w stats.
+    Przy włączonym cache aktualne wpisy są zwracane bez zapytania, a nieaktualne
+    są rewalidowane zapytaniem warunkowym (304 = wpis z cache).
+
+    Tempo zapytań ustala controller (rate_control.py). Po 429/5xx i błędach połączenia
+    zapytanie jest ponawiane do MAX_RETRIES razy (Retry-After albo opóźnienie z jitterem).
+    Po wyczerpaniu prób zwracana jest ostatnia odpowiedź albo rzucany ostatni wyjątek.
+    """
+    cache = get_cache()
+    entry = cache.lookup(url) if cache is not None else None
+    if entry is not None and (OFFLINE or cache.is_fresh(entry)):
+        stats.cache_hit()
+        tracer.count("flat_finder_cache_hits_total")
+        return build_response(entry)
+    if OFFLINE:
+        return offline_miss(url)
+
+    headers = kwargs.pop("headers", None) or {}
+    if entry is not None:
+        headers = {**headers, **cache.conditional_headers(entry)}
+    r = _get_with_retries(url, timeout=timeout or DEFAULT_TIMEOUT, headers=headers, **kwargs)
+
+    if cache is not None:
+        if r.status_code == 304 and entry is not None:
+            cache.revalidated(url)
+            stats.cache_hit(revalidated=True)
+            return build_response(entry)
+        if r.status_code == 200:
+            cache.store(url, r.status_code, r.headers, r.content)
+    return r
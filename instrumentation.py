@@ -0,0 +1,194 @@
+import contextlib
+import cProfile
+import functools
+import heapq
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+
+# Pomiary etapów przebiegu: spany (eksport do Chrome trace - chrome://tracing albo Perfetto),
+# liczniki i sumy czasów (eksport w formacie tekstowym Prometheusa) oraz opcjonalne
+# profilowanie cProfile najwolniejszych stron ofert.
+# Domyślnie wyłączone; włącza się przez FLAT_FINDER_TRACE=1 albo enable().
+
+
+class Tracer:
+    """
+    Zbiera spany i metryki z wielu wątków.
+
+    Args:
+        enabled (bool): Czy zbierać pomiary; wyłączony tracer kosztuje jedno sprawdzenie flagi.
+        profile_slowest (int): Ile najwolniejszych ofert zachować z profilem cProfile (0 - bez profilowania).
+    """
+
+    def __init__(self, enabled=False, profile_slowest=0):
+        self.enabled = enabled
+        self.profile_slowest = profile_slowest
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.events = []
+            self.counters = defaultdict(float)
+            self.durations = defaultdict(lambda: [0, 0.0])
+            self.slowest = []
+
+    def _labels(self, labels):
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @contextlib.contextmanager
+    def span(self, name, category="flat_finder", **args):
+        """Mierzy blok kodu; args trafiają do Chrome trace i mogą być uzupełniane wewnątrz bloku."""
+        if not self.enabled:
+            yield args
+            return
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            event = {
+                "name": name, "cat": category, "ph": "X",
+                "ts": round((start - self._origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+                "pid": os.getpid(), "tid": threading.get_ident(),
+                "args": {key: value if isinstance(value, (int, float, bool)) else str(value)
+                         for key, value in args.items()},
+            }
+            with self._lock:
+                self.events.append(event)
+                duration = self.durations[("flat_finder_stage_seconds", self._labels({"stage": name}))]
+                duration[0] += 1
+                duration[1] += end - start
+
+    def traced(self, name, category="flat_finder"):
+        """Dekorator: każde wywołanie funkcji jest mierzone jako span name."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.span(name, category):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[(name, self._labels(labels))] += value
+
+    def observe(self, name, seconds, **labels):
+        """Dopisuje czas do sumy i licznika (metryka typu summary)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            duration = self.durations[(name, self._labels(labels))]
+            duration[0] += 1
+            duration[1] += seconds
+
+    @contextlib.contextmanager
+    def profile(self, key):
+        """
+        Profiluje blok cProfile i zachowuje profil, jeśli blok jest wśród profile_slowest najwolniejszych.
+
+        Od Pythona 3.12 aktywny może być tylko jeden profiler naraz (sys.monitoring), więc profilowany
+        jest jeden blok w danej chwili; bloki wykonywane w tym czasie w innych wątkach oraz przy
+        innym aktywnym narzędziu (np. debuggerze) działają bez profilu.
+        """
+        if not self.enabled or not self.profile_slowest or not self._profile_lock.acquire(blocking=False):
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            self._profile_lock.release()
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._profile_lock.release()
+            duration = time.perf_counter() - start
+            with self._lock:
+                # kopiec z najmniejszym czasem na górze - wypada najszybsza z zachowanych stron
+                # id(profiler) rozstrzyga remisy, bo obiektów Profile nie da się porównywać
+                item = (duration, key, id(profiler), profiler)
+                if len(self.slowest) < self.profile_slowest:
+                    heapq.heappush(self.slowest, item)
+                elif duration > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, item)
+
+    def export_chrome_trace(self, path):
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export_prometheus(self, path):
+        lines = []
+        with self._lock:
+            counters = dict(self.counters)
+            durations = {key: list(value) for key, value in self.durations.items()}
+
+        def format_labels(labels):
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{format_labels(labels)} {value:g}")
+        for name in sorted({name for name, _ in durations}):
+            lines.append(f"# TYPE {name} summary")
+            for (metric, labels), (count, total) in sorted(durations.items()):
+                if metric == name:
+                    lines.append(f"{name}_count{format_labels(labels)} {count}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {total:.6f}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def export_profiles(self, directory, top=30):
+        """Zapisuje profile najwolniejszych stron jako pliki tekstowe (od najwolniejszej)."""
+        with self._lock:
+            slowest = sorted(self.slowest, reverse=True, key=lambda item: item[0])
+        os.makedirs(directory, exist_ok=True)
+        for rank, (duration, key, _, profiler) in enumerate(slowest, start=1):
+            stream = io.StringIO()
+            stream.write(f"{key}\n{duration * 1000:.1f} ms\n\n")
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+            with open(os.path.join(directory, f"slowest_{rank:02d}.txt"), "w", encoding="utf-8") as f:
+                f.write(stream.getvalue())
+
+    def export(self, prefix="flat_finder"):
+        """Zapisuje prefix_trace.json, prefix_metrics.prom i (przy profilowaniu) katalog prefix_profiles."""
+        if not self.enabled:
+            return
+        self.export_chrome_trace(f"{prefix}_trace.json")
+        self.export_prometheus(f"{prefix}_metrics.prom")
+        if self.profile_slowest:
+            self.export_profiles(f"{prefix}_profiles")
+
+
+tracer = Tracer(
+    enabled=os.environ.get("FLAT_FINDER_TRACE") == "1",
+    profile_slowest=int(os.environ.get("FLAT_FINDER_PROFILE_SLOWEST", 0)),
+)
+
+
+def enable(profile_slowest=0):
+    """Włącza pomiary (i opcjonalnie profilowanie profile_slowest najwolniejszych ofert)."""
+    tracer.enabled = True
+    tracer.profile_slowest = profile_slowest
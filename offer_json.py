@@ -0,0 +1,169 @@
+import html
+import json
+import re
+
+# otodom jest aplikacją Next.js - cały stan strony oferty jest osadzony
+# w skrypcie __NEXT_DATA__, więc nie trzeba budować drzewa DOM.
+# Koniec skryptu szuka bytes.find - leniwe (.*?)</script> w wyrażeniu regularnym
+# sprawdza każdy znak kilkusetkilobajtowego JSON-a osobno.
+NEXT_DATA_START_PATTERN = re.compile(rb'<script[^>]*id="__NEXT_DATA__"[^>]*>')
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+# etykiety z tabeli szczegółów, takie same jak w details_dict w parse_offer
+DETAIL_LABELS = (
+    "Rynek",
+    "Certyfikat energetyczny",
+    "Numer mieszkania",
+    "Rzut mieszkania",
+    "Typ ogłoszeniodawcy",
+    "Rodzaj zabudowy",
+    "Piętro",
+    "Materiał budynku",
+    "Okna",
+    "Ogrzewanie",
+    "Rok budowy",
+    "Stan wykończenia",
+    "Czynsz",
+    "Forma własności",
+    "Dostępne od",
+)
+
+# wartości target.Floor_no w formacie używanym w tabeli na stronie
+FLOOR_NAMES = {"ground_floor": "parter", "cellar": "suterena", "garret": "poddasze", "floor_higher_10": "> 10"}
+
+
+def next_data_bytes(content):
+    """Zwraca surową, niezdekodowaną treść skryptu __NEXT_DATA__ albo None, jeśli go nie ma."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    match = NEXT_DATA_START_PATTERN.search(content)
+    if not match:
+        return None
+    # JSON w skrypcie nie zawiera "</script>" - Next.js zapisuje "<" jako \u003c
+    end = content.find(b"</script>", match.end())
+    return content[match.end():end] if end != -1 else None
+
+
+def extract_next_data(content, raw=None):
+    """
+    Zwraca zdekodowany JSON ze skryptu __NEXT_DATA__ albo None, jeśli go nie ma.
+    raw - treść skryptu z next_data_bytes, jeśli została już wycięta.
+    """
+    if raw is None:
+        raw = next_data_bytes(content)
+        if raw is None:
+            return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+def extract_ad(content, raw=None):
+    """Zwraca obiekt ogłoszenia (props.pageProps.ad) albo None; raw jak w extract_next_data."""
+    next_data = extract_next_data(content, raw)
+    if not next_data:
+        return None
+    ad = next_data.get("props", {}).get("pageProps", {}).get("ad")
+    return ad if isinstance(ad, dict) else None
+
+
+def _format_number(value):
+    """Zapisuje liczbę tak jak na stronie - bez zbędnego '.0'."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _floor_from_target(target):
+    floor = target.get("Floor_no")
+    if isinstance(floor, list):
+        floor = floor[0] if floor else None
+    if not floor:
+        return None
+    if floor in FLOOR_NAMES:
+        return FLOOR_NAMES[floor]
+    return floor.replace("floor_", "")
+
+
+def parse_offer_json(content, item_data):
+    """
+    Szybka ścieżka parsowania: wyciąga dane oferty z osadzonego JSON-a w jednym przejściu
+    i uzupełnia nimi item_data (słownik z empty_offer).
+    Zwraca item_data albo None, gdy strona nie zawiera JSON-a
+    (wtedy należy użyć parsowania DOM).
+    """
+    ad = extract_ad(content)
+    if ad is None:
+        return None
+    return parse_ad(ad, item_data)
+
+
+def parse_ad(ad, item_data):
+    """
+    Uzupełnia item_data polami obiektu ogłoszenia (extract_ad) i zwraca item_data.
+
+    Dwa pola mają inne źródło niż w parsowaniu DOM (parse_offer_dom), więc ich format zależy
+    od ścieżki, którą przeszła strona:
+        - 'Tytuł oferty' to ad.title, a nie tekst <title> strony,
+        - 'Opis' to pełny opis ogłoszenia bez znaczników HTML, a nie skrócony
+          <meta name="description"> - ten mają strony bez JSON-a i zbiory sprzed szybkiej ścieżki.
+    Pozostałe pola powinny być takie same; zgodność pól obu ścieżek na nagranym korpusie
+    pokazuje benchmark_parsers.py.
+    """
+    target = ad.get("target") or {}
+
+    if ad.get("title"):
+        item_data["Tytuł oferty"] = ad["title"].strip()
+
+    description = ad.get("description")
+    if description:
+        item_data["Opis"] = html.unescape(TAG_PATTERN.sub(" ", description)).strip()
+
+    # tabela szczegółów - characteristics ma te same etykiety co strona
+    characteristics = {}
+    for characteristic in ad.get("characteristics") or []:
+        label = characteristic.get("label")
+        value = characteristic.get("localizedValue") or characteristic.get("value")
+        if label and value:
+            characteristics[label] = str(value).strip()
+    for label in DETAIL_LABELS:
+        if label in characteristics:
+            item_data[label] = characteristics[label]
+
+    # uzupełnienia z target, gdy tabela czegoś nie zawiera
+    if item_data["Piętro"] == "brak danych":
+        floor = _floor_from_target(target)
+        if floor:
+            item_data["Piętro"] = floor
+    if "/" not in item_data["Piętro"] and item_data["Piętro"] != "brak danych":
+        building_floors = characteristics.get("Liczba pięter") or target.get("Building_floors_num")
+        if building_floors:
+            item_data["Piętro"] = f"{item_data['Piętro']}/{building_floors}"
+    if item_data["Czynsz"] == "brak danych" and target.get("Rent"):
+        item_data["Czynsz"] = _format_number(target["Rent"])
+    if item_data["Rok budowy"] == "brak danych" and target.get("Build_year"):
+        item_data["Rok budowy"] = _format_number(target["Build_year"])
+
+    if target.get("Price"):
+        item_data["Cena"] = _format_number(target["Price"])
+    if target.get("Area"):
+        item_data["Powierzchnia"] = _format_number(target["Area"])
+    if target.get("Rooms_num"):
+        rooms = target["Rooms_num"]
+        item_data["Liczba pokoi"] = rooms[0] if isinstance(rooms, list) else _format_number(rooms)
+
+    coordinates = (ad.get("location") or {}).get("coordinates") or {}
+    if coordinates.get("latitude") is not None and coordinates.get("longitude") is not None:
+        item_data["Szerokość geograficzna"] = str(coordinates["latitude"])
+        item_data["Długość geograficzna"] = str(coordinates["longitude"])
+
+    # Calculate price per square meter
+    try:
+        price = float(item_data["Cena"].replace(" ", "").replace(",", "."))
+        area = float(item_data["Powierzchnia"].replace(",", "."))
+        item_data["Cena za m²"] = round(price / area, 2)
+    except (ValueError, ZeroDivisionError):
+        pass
+
+    return item_data
@@ -0,0 +1,67 @@
+import os
+
+import pandas as pd
+
+# Zapis oczyszczonych ofert porcjami (CSV albo Parquet) i lista ofert już zapisanych,
+# dzięki której przerwany crawl można wznowić od miejsca, w którym się zatrzymał.
+
+
+class CsvSink:
+    """Dopisuje porcje do jednego pliku CSV; nagłówek tylko przy pierwszym zapisie."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, chunk: pd.DataFrame):
+        write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        chunk.to_csv(self.path, mode="a", header=write_header, index=False)
+
+
+class ParquetSink:
+    """
+    Zapisuje każdą porcję jako osobny plik part-NNNNN.parquet w katalogu path
+    (czytelny przez pd.read_parquet(path)). Kolumny liczbowe mają typ float64, pozostałe string,
+    żeby schemat był taki sam we wszystkich częściach.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._part = len([name for name in os.listdir(path) if name.endswith(".parquet")])
+
+    def write(self, chunk: pd.DataFrame):
+        chunk = chunk.copy()
+        for column in chunk.columns:
+            if pd.api.types.is_numeric_dtype(chunk[column]):
+                chunk[column] = chunk[column].astype("float64")
+            else:
+                chunk[column] = chunk[column].astype("string")
+        chunk.to_parquet(os.path.join(self.path, f"part-{self._part:05d}.parquet"), index=False)
+        self._part += 1
+
+
+def open_sink(path):
+    """Wybiera format na podstawie rozszerzenia: .parquet - katalog plików Parquet, w pozostałych przypadkach CSV."""
+    if path.endswith(".parquet"):
+        return ParquetSink(path)
+    return CsvSink(path)
+
+
+class Checkpoint:
+    """Plik tekstowy ze ścieżkami ofert, których wiersze zostały już zapisane (jedna na linię)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self) -> set:
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    def add(self, paths):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for path in paths:
+                f.write(f"{path}\n")
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,114 @@
+import os
+
+from bs4 import BeautifulSoup
+
+# Backend parsowania HTML można zmienić zmienną środowiskową FLAT_FINDER_PARSER.
+# html5lib jest najwolniejszy, ale najbliższy przeglądarce - przed zmianą domyślnego
+# backendu warto sprawdzić zgodność pól w benchmark_parsers.py
+DEFAULT_BACKEND = os.environ.get("FLAT_FINDER_PARSER", "html5lib")
+
+SOUP_BACKENDS = ("html5lib", "lxml", "html.parser")
+BACKENDS = SOUP_BACKENDS + ("selectolax",)
+
+
+class SoupPage:
+    """Strona sparsowana przez BeautifulSoup (html5lib, lxml albo html.parser)."""
+
+    def __init__(self, content, backend):
+        self.soup = BeautifulSoup(content, backend)
+
+    def title(self):
+        title_tag = self.soup.find("title")
+        return title_tag.text.strip() if title_tag else None
+
+    def meta(self, attr, value):
+        meta_tag = self.soup.find("meta", {attr: value})
+        return meta_tag.get("content") if meta_tag else None
+
+    def label_value(self, label):
+        """Tekst pierwszego <p> po <p> zawierającym etykietę (tabela szczegółów oferty)."""
+        element = self.soup.select_one(f"p:-soup-contains('{label}')")
+        if element:
+            value_element = element.find_next("p")
+            if value_element:
+                return value_element.text.strip()
+        return None
+
+    def script_containing(self, text):
+        script = self.soup.find("script", string=lambda s: s and text in s)
+        return script.string if script else None
+
+    def links(self):
+        return [link["href"] for link in self.soup.find_all("a", href=True)]
+
+    def text(self, tag, attrs):
+        element = self.soup.find(tag, attrs)
+        return element.text if element else None
+
+
+class SelectolaxPage:
+    """Strona sparsowana przez selectolax (parser Lexbor napisany w C)."""
+
+    def __init__(self, content, backend="selectolax"):
+        from selectolax.lexbor import LexborHTMLParser
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", errors="replace")
+        self.tree = LexborHTMLParser(content)
+        self._paragraphs = None
+
+    def title(self):
+        node = self.tree.css_first("title")
+        return node.text().strip() if node else None
+
+    def meta(self, attr, value):
+        node = self.tree.css_first(f'meta[{attr}="{value}"]')
+        return node.attributes.get("content") if node else None
+
+    def label_value(self, label):
+        # odpowiednik select_one("p:-soup-contains(...)").find_next("p"):
+        # <p> nie mogą się zagnieżdżać, więc następny <p> w dokumencie to następny element listy
+        if self._paragraphs is None:
+            self._paragraphs = [node.text() for node in self.tree.css("p")]
+        for i, text in enumerate(self._paragraphs):
+            if label in text:
+                if i + 1 < len(self._paragraphs):
+                    return self._paragraphs[i + 1].strip()
+                return None
+        return None
+
+    def script_containing(self, text):
+        for node in self.tree.css("script"):
+            script = node.text()
+            if text in script:
+                return script
+        return None
+
+    def links(self):
+        return [node.attributes["href"] for node in self.tree.css("a[href]") if node.attributes.get("href")]
+
+    def text(self, tag, attrs):
+        selector = tag + "".join(f'[{key}="{value}"]' for key, value in attrs.items())
+        node = self.tree.css_first(selector)
+        return node.text() if node else None
+
+
+def available_backends():
+    """Zwraca backendy, których biblioteki są zainstalowane."""
+    available = ["html.parser"]
+    for backend, module in (("html5lib", "html5lib"), ("lxml", "lxml"), ("selectolax", "selectolax")):
+        try:
+            __import__(module)
+            available.append(backend)
+        except ImportError:
+            pass
+    return available
+
+
+def parse_html(content, backend=None):
+    """Parsuje stronę wybranym backendem i zwraca obiekt z metodami ekstrakcji."""
+    backend = backend or DEFAULT_BACKEND
+    if backend == "selectolax":
+        return SelectolaxPage(content)
+    if backend in SOUP_BACKENDS:
+        return SoupPage(content, backend)
+    raise ValueError(f"Nieznany backend parsowania: {backend}. Dostępne: {', '.join(BACKENDS)}")
@@ -0,0 +1,242 @@
+import collections
+import concurrent.futures
+import queue
+import threading
+
+from tqdm import tqdm
+
+from cleanup import clean_offers
+from get_data_mulithreaded import fetch_and_parse_offer
+from get_offers import DEFAULT_TARGET, fetch_listing_page
+from output_sink import Checkpoint, open_sink
+from records import ColumnarAccumulator
+
+# znacznik końca pracy dla wątków pobierających oferty
+_KONIEC = object()
+
+
+def _produce_offers(pages, listing_threads, offers_queue, seen, seen_lock, listing_progress,
+                    seen_store=None, stop_after_known_pages=3, target=DEFAULT_TARGET, stop=None):
+    """
+    Pobiera strony wyników równolegle i od razu wrzuca nowe ścieżki ofert do kolejki.
+    Wyniki są przetwarzane w kolejności stron (okno listing_threads * 2 stron w toku),
+    żeby w trybie delta można było zatrzymać się po serii stron z samymi znanymi ofertami.
+    Ustawione zdarzenie stop kończy przeglądanie (np. po błędzie zapisu wyników).
+    """
+    known_pages = 0
+    next_page = 1
+    pending = collections.deque()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=listing_threads) as executor:
+        while True:
+            while next_page <= pages and len(pending) < listing_threads * 2:
+                pending.append(executor.submit(fetch_listing_page, next_page, target))
+                next_page += 1
+            if not pending:
+                break
+            if stop is not None and stop.is_set():
+                for future in pending:
+                    future.cancel()
+                break
+
+            future = pending.popleft()
+            listing_progress.update(1)
+            try:
+                listing = future.result()
+            except Exception as exc:
+                print(f"Strona wyników wygenerowała wyjątek: {exc}")
+                continue
+            if listing is None:
+                continue
+
+            paths = listing
+            if seen_store is not None:
+                all_known, paths = seen_store.observe(listing)
+                known_pages = known_pages + 1 if all_known else 0
+
+            for path in paths:
+                with seen_lock:
+                    if path in seen:
+                        continue
+                    seen.add(path)
+                # put blokuje przy pełnej kolejce - backpressure dla stron wyników
+                offers_queue.put(path)
+
+            if seen_store is not None and known_pages >= stop_after_known_pages:
+                print(f"{known_pages} kolejne strony bez nowych ofert - koniec przeglądania")
+                for future in pending:
+                    future.cancel()
+                break
+
+
+class _StreamingResults:
+    """
+    Bufor wyników zapisywany porcjami do sink, ze ścieżkami zapisanych ofert w checkpoint.
+    Oferty trafiają do seen_store jako pobrane dopiero po zapisaniu porcji - po przerwaniu
+    w trakcie porcji tryb delta pobierze je ponownie.
+
+    Błąd zapisu porcji (sink, text_index, checkpoint) jest zapamiętywany w error i ustawia
+    zdarzenie failed - crawl_pipeline przerywa wtedy przebieg i zgłasza ten błąd.
+    """
+
+    def __init__(self, sink, checkpoint, chunk_size, text_index=None, seen_store=None):
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.chunk_size = chunk_size
+        self.text_index = text_index
+        self.seen_store = seen_store
+        self.written = 0
+        self.error = None
+        self.failed = threading.Event()
+        self._chunk, self._paths = [], []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def add(self, path, item_data):
+        with self._lock:
+            self._chunk.append(item_data)
+            self._paths.append(path)
+            if len(self._chunk) < self.chunk_size:
+                return
+            chunk, paths = self._chunk, self._paths
+            self._chunk, self._paths = [], []
+        self._write(chunk, paths)
+
+    def flush(self):
+        with self._lock:
+            chunk, paths = self._chunk, self._paths
+            self._chunk, self._paths = [], []
+        if chunk:
+            self._write(chunk, paths)
+
+    def _write(self, chunk, paths):
+        cleaned = clean_offers(chunk)
+        with self._write_lock:
+            self.sink.write(cleaned)
+            if self.text_index is not None:
+                self.text_index.add_offers(cleaned)
+            self.checkpoint.add(paths)
+            self.written += len(chunk)
+        if self.seen_store is not None:
+            _mark_scraped(self.seen_store, zip(paths, chunk))
+
+    def fail(self, exc):
+        """Zapamiętuje pierwszy błąd zapisu i zatrzymuje dalsze pobieranie."""
+        with self._lock:
+            if self.error is None:
+                self.error = exc
+        self.failed.set()
+
+
+def _mark_scraped(seen_store, offers):
+    """Zapisuje w seen_store oferty ((ścieżka, rekord)) zapisane w wyniku."""
+    for path, item_data in offers:
+        # każda poprawnie sparsowana strona ma tytuł; bez niego oferta zostanie pobrana w kolejnym przebiegu
+        if item_data["Tytuł oferty"] != "brak danych":
+            seen_store.mark_scraped(path)
+
+
+def _consume_offers(offers_queue, results, detail_progress, result_paths, streaming=None, fingerprints=None):
+    """
+    Pobiera oferty z kolejki aż do znacznika końca. Po błędzie zapisu wyników (streaming.failed)
+    tylko opróżnia kolejkę, żeby producent nie zablokował się na pełnej kolejce.
+    """
+    while True:
+        path = offers_queue.get()
+        if path is _KONIEC:
+            break
+        if streaming is not None and streaming.failed.is_set():
+            continue
+        try:
+            item_data = fetch_and_parse_offer(path, fingerprints)
+        except Exception as exc:
+            print(f'{path} wygenerowało wyjątek: {exc}')
+            detail_progress.update(1)
+            continue
+        if streaming is not None:
+            # błąd zapisu dotyczy całej porcji, nie tej oferty - przerywa przebieg
+            try:
+                streaming.add(path, item_data)
+            except Exception as exc:
+                streaming.fail(exc)
+        else:
+            results.append(item_data)
+            result_paths.append((path, item_data))
+        detail_progress.update(1)
+
+
+def crawl_pipeline(pages = 120, listing_threads = 4, max_threads = 16, queue_size = 256,
+                   seen_store = None, stop_after_known_pages = 3, output_path = None, chunk_size = 500,
+                   text_index = None, target = DEFAULT_TARGET, fingerprints = None):
+    """
+    Pobiera strony wyników i oferty jednocześnie (producent/konsument) i zwraca DataFrame
+    w tym samym formacie co get_data_multithreaded.
+
+    Z output_path wiersze są zapisywane porcjami po chunk_size (jak w stream_data_multithreaded),
+    oferty zapisane we wcześniejszym, przerwanym uruchomieniu są pomijane, a funkcja zwraca
+    liczbę zapisanych ofert zamiast DataFrame. Błąd zapisu porcji przerywa przebieg i jest
+    zgłaszany dalej - oferty z niezapisanych porcji nie trafiają do checkpointu, więc kolejne
+    uruchomienie pobierze je ponownie.
+
+    Args:
+        pages (int): Liczba stron wyników do przejrzenia.
+        listing_threads (int): Liczba wątków pobierających strony wyników.
+        max_threads (int): Liczba wątków pobierających oferty.
+        queue_size (int): Pojemność kolejki ofert czekających na pobranie.
+        seen_store (SeenOffers): Włącza tryb delta - pobierane są tylko nowe oferty
+                                 i oferty ze zmienioną ceną na liście wyników.
+        stop_after_known_pages (int): W trybie delta liczba kolejnych stron z samymi
+                                      znanymi ofertami, po której przeglądanie się kończy.
+        text_index (TextIndex): Indeks tytułów i opisów (text_index.py) aktualizowany
+                                razem z zapisem wyników.
+        target (str): Wyszukiwanie - nazwa z get_offers.SEARCH_TARGETS albo ścieżka wyników.
+        fingerprints (FingerprintStore): Odciski stron ofert (fingerprints.py) - niezmienione
+                                         strony nie są ponownie parsowane.
+    """
+    offers_queue = queue.Queue(maxsize=queue_size)
+    seen = set()
+    seen_lock = threading.Lock()
+    results = ColumnarAccumulator()
+    result_paths = []  # (ścieżka, rekord) ofert w results - do seen_store po zbudowaniu wyniku
+
+    streaming = None
+    if output_path is not None:
+        checkpoint = Checkpoint(output_path + '.done')
+        # oferty zapisane przed przerwaniem traktujemy jak już widziane
+        seen.update(checkpoint.load())
+        streaming = _StreamingResults(open_sink(output_path), checkpoint, chunk_size, text_index, seen_store)
+
+    listing_progress = tqdm(total=pages, desc='finding offers ')
+    detail_progress = tqdm(desc='getting data for offers')
+
+    consumers = [
+        threading.Thread(target=_consume_offers, args=(offers_queue, results, detail_progress, result_paths, streaming, fingerprints), daemon=True)
+        for _ in range(max_threads)
+    ]
+    for consumer in consumers:
+        consumer.start()
+
+    try:
+        _produce_offers(pages, listing_threads, offers_queue, seen, seen_lock, listing_progress,
+                        seen_store, stop_after_known_pages, target,
+                        streaming.failed if streaming is not None else None)
+    finally:
+        for _ in consumers:
+            offers_queue.put(_KONIEC)
+        for consumer in consumers:
+            consumer.join()
+        if streaming is not None and not streaming.failed.is_set():
+            streaming.flush()
+        listing_progress.close()
+        detail_progress.close()
+
+    print(f"Liczba ofert: {len(seen)}")
+    if streaming is not None:
+        if streaming.error is not None:
+            raise streaming.error
+        return streaming.written
+    data_set = clean_offers(results)
+    if text_index is not None:
+        text_index.add_offers(data_set)
+    if seen_store is not None:
+        _mark_scraped(seen_store, result_paths)
+    return data_set
@@ -0,0 +1,119 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+# Historia cen w formacie długim: jeden wiersz na (oferta, moment pomiaru, cena).
+# Zastępuje dopisywanie do DataFrame nowej kolumny po każdej aktualizacji cen.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    link TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    price REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS prices_link_ts ON prices (link, ts);
+CREATE INDEX IF NOT EXISTS prices_ts ON prices (ts);
+"""
+
+# najnowszy wpis dla każdego linku sprzed podanej chwili (bez niej) - korzysta z indeksu (link, ts)
+LATEST_QUERY = """
+SELECT p.link, p.ts, p.price
+FROM prices p
+JOIN (SELECT link, MAX(ts) AS ts FROM prices WHERE ts < ? GROUP BY link) m
+  ON p.link = m.link AND p.ts = m.ts
+"""
+
+# liczba pomiarów i zmian ceny każdej oferty (zmiana = inna cena niż w poprzednim pomiarze)
+CHANGES_QUERY = """
+SELECT link, MIN(ts) AS first_ts, MAX(ts) AS last_ts, COUNT(*) AS measurements,
+       COALESCE(SUM(changed), 0) AS changes
+FROM (SELECT link, ts, price != LAG(price) OVER (PARTITION BY link ORDER BY ts) AS changed FROM prices)
+GROUP BY link
+"""
+
+
+
+def _timestamp(ts) -> str:
+    """Zamienia datę (str, datetime, pd.Timestamp) na tekst ISO, który sortuje się chronologicznie."""
+    if isinstance(ts, str):
+        return pd.Timestamp(ts.replace("_", "-")).isoformat()
+    return pd.Timestamp(ts).isoformat()
+
+
+class PriceHistory:
+    """Indeksowany, dopisywany magazyn historii cen w SQLite."""
+
+    def __init__(self, path="price_history.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def record(self, prices, ts=None) -> int:
+        """
+        Dopisuje ceny ({link: cena} albo pd.Series indeksowana linkami) z chwili ts.
+        Brakujące ceny są pomijane, a ponowny zapis tej samej pary (link, ts) nic nie zmienia.
+        Zwraca liczbę dopisanych wierszy.
+        """
+        ts = _timestamp(ts if ts is not None else datetime.now())
+        if isinstance(prices, dict):
+            prices = pd.Series(prices, dtype="float64")
+        prices = pd.to_numeric(prices, errors="coerce").dropna()
+        rows = [(link, ts, float(price)) for link, price in prices.items()]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO prices VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def record_frame(self, df: pd.DataFrame, ts=None, price_column="Cena") -> int:
+        """Dopisuje ceny z DataFrame z kolumnami 'link' i price_column."""
+        return self.record(df.set_index("link")[price_column], ts)
+
+    def import_wide(self, df: pd.DataFrame, date_columns) -> int:
+        """Przenosi stare kolumny cen (nazwane datą aktualizacji) do historii."""
+        added = 0
+        for column in date_columns:
+            added += self.record(df.set_index("link")[column], column)
+        return added
+
+    def _query(self, sql, params=()) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def latest_prices(self) -> pd.DataFrame:
+        """Ostatnia znana cena każdej oferty (kolumny link, ts, price)."""
+        return self._query(LATEST_QUERY, ("9999",))
+
+    def price_at(self, date) -> pd.DataFrame:
+        """Cena każdej oferty obowiązująca w danym dniu (ostatni pomiar do końca dnia date włącznie)."""
+        day_end = pd.Timestamp(_timestamp(date)).normalize() + pd.Timedelta(days=1)
+        return self._query(LATEST_QUERY, (day_end.isoformat(),))
+
+    def price_drops_since(self, date) -> pd.DataFrame:
+        """Oferty, których ostatnia cena jest niższa niż cena obowiązująca w dniu date."""
+        then = self.price_at(date).rename(columns={"ts": "ts_then", "price": "price_then"})
+        now = self.latest_prices().rename(columns={"ts": "ts_now", "price": "price_now"})
+        merged = then.merge(now, on="link")
+        merged["change"] = merged["price_now"] - merged["price_then"]
+        merged["change_pct"] = merged["change"] / merged["price_then"]
+        return merged[merged["change"] < 0].sort_values("change_pct").reset_index(drop=True)
+
+    def history(self, link) -> pd.DataFrame:
+        """Wszystkie pomiary ceny jednej oferty w kolejności czasu."""
+        return self._query("SELECT ts, price FROM prices WHERE link = ? ORDER BY ts", (link,))
+
+    def change_stats(self) -> pd.DataFrame:
+        """Dla każdej oferty: pierwszy i ostatni pomiar, liczba pomiarów i liczba zmian ceny."""
+        return self._query(CHANGES_QUERY)
+
+    def wide_view(self) -> pd.DataFrame:
+        """Dawny format szeroki: wiersz na ofertę, kolumna na moment pomiaru."""
+        long = self._query("SELECT link, ts, price FROM prices")
+        return long.pivot(index="link", columns="ts", values="price")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,120 @@
+import email.utils
+import random
+import threading
+import time
+
+# Sterowanie tempem zapytań na podstawie odpowiedzi serwera, wspólne dla stron wyników i ofert:
+# - AIMD na liczbie zapytań w toku: +1 po serii udanych odpowiedzi, połowa po 429/5xx,
+# - token bucket ograniczający liczbę zapytań na sekundę (też AIMD),
+# - Retry-After z odpowiedzi serwera wstrzymuje wszystkie wątki,
+# - ponawianie z wykładniczym opóźnieniem i losowym rozrzutem (full jitter).
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Token bucket: średnio rate zapytań/s, chwilowo do burst zapytań."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ConcurrencyController:
+    """
+    Adaptacyjny limit zapytań w toku i zapytań na sekundę.
+
+    Args:
+        initial (int): Początkowy limit zapytań w toku.
+        minimum (int), maximum (int): Granice limitu zapytań w toku.
+        rate (float): Początkowy limit zapytań na sekundę.
+        min_rate (float), max_rate (float): Granice limitu zapytań na sekundę.
+        increase_every (int): Po ilu kolejnych sukcesach limity rosną.
+    """
+
+    def __init__(self, initial=8, minimum=1, maximum=64, rate=10.0, min_rate=0.5, max_rate=100.0,
+                 increase_every=20):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_every = increase_every
+        self.bucket = TokenBucket(rate)
+        self._in_flight = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+        self.throttled = 0
+
+    def acquire(self):
+        """Czeka na wolne miejsce w limicie, koniec ewentualnej pauzy (Retry-After) i token."""
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                    continue
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    break
+                self._condition.wait()
+        self.bucket.acquire()
+
+    def release(self, success, retry_after=None):
+        """Zwalnia miejsce i dostosowuje limity: sukces - wzrost addytywny, dławienie - spadek o połowę."""
+        with self._condition:
+            self._in_flight -= 1
+            if success:
+                self._successes += 1
+                if self._successes >= self.increase_every:
+                    self._successes = 0
+                    self.limit = min(self.maximum, self.limit + 1)
+                    self.bucket.rate = min(self.max_rate, self.bucket.rate + 1)
+            else:
+                self.throttled += 1
+                self._successes = 0
+                self.limit = max(self.minimum, self.limit // 2)
+                self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+                if retry_after:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._condition.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._condition:
+            return {"limit": self.limit, "rate": round(self.bucket.rate, 2), "in_flight": self._in_flight,
+                    "throttled": self.throttled}
+
+
+def parse_retry_after(value):
+    """Retry-After w sekundach (liczba albo data HTTP) albo None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Opóźnienie przed ponowieniem: losowe z przedziału [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,132 @@
+import threading
+
+import pandas as pd
+
+# Stały schemat rekordu oferty: (atrybut, nazwa kolumny w DataFrame).
+# Kolejność kolumn jest taka sama jak w dawnych słownikach item_data.
+FIELDS = (
+    ("tytul", "Tytuł oferty"),
+    ("link", "link"),
+    ("cena", "Cena"),
+    ("powierzchnia", "Powierzchnia"),
+    ("cena_za_m2", "Cena za m²"),
+    ("liczba_pokoi", "Liczba pokoi"),
+    ("rynek", "Rynek"),
+    ("certyfikat_energetyczny", "Certyfikat energetyczny"),
+    ("numer_mieszkania", "Numer mieszkania"),
+    ("rzut_mieszkania", "Rzut mieszkania"),
+    ("typ_ogloszeniodawcy", "Typ ogłoszeniodawcy"),
+    ("opis", "Opis"),
+    ("rodzaj_zabudowy", "Rodzaj zabudowy"),
+    ("pietro", "Piętro"),
+    ("material_budynku", "Materiał budynku"),
+    ("okna", "Okna"),
+    ("ogrzewanie", "Ogrzewanie"),
+    ("rok_budowy", "Rok budowy"),
+    ("stan_wykonczenia", "Stan wykończenia"),
+    ("czynsz", "Czynsz"),
+    ("forma_wlasnosci", "Forma własności"),
+    ("dostepne_od", "Dostępne od"),
+    ("lat", "Szerokość geograficzna"),
+    ("lon", "Długość geograficzna"),
+)
+
+COLUMNS = [column for _, column in FIELDS]
+_ATTRIBUTE = {column: attribute for attribute, column in FIELDS}
+
+BRAK_DANYCH = "brak danych"
+
+
+class OfferRecord:
+    """
+    Rekord jednej oferty z __slots__ zamiast 24-kluczowego słownika.
+    Pola są dostępne jako atrybuty (record.cena) albo po nazwie kolumny (record["Cena"]),
+    więc kod parsujący może dalej używać nazw kolumn.
+    """
+
+    __slots__ = tuple(attribute for attribute, _ in FIELDS)
+
+    def __init__(self, link=None):
+        for attribute, _ in FIELDS:
+            setattr(self, attribute, BRAK_DANYCH)
+        self.link = link
+
+    def __getitem__(self, column):
+        return getattr(self, _ATTRIBUTE[column])
+
+    def __setitem__(self, column, value):
+        setattr(self, _ATTRIBUTE[column], value)
+
+    def __contains__(self, column):
+        return column in _ATTRIBUTE
+
+    def __iter__(self):
+        return iter(COLUMNS)
+
+    def __eq__(self, other):
+        if not isinstance(other, OfferRecord):
+            return NotImplemented
+        return all(getattr(self, attribute) == getattr(other, attribute) for attribute in self.__slots__)
+
+    def __repr__(self):
+        return f"OfferRecord(link={self.link!r}, cena={self.cena!r})"
+
+    def keys(self):
+        return list(COLUMNS)
+
+    def items(self):
+        return [(column, getattr(self, attribute)) for attribute, column in FIELDS]
+
+    def get(self, column, default=None):
+        return self[column] if column in _ATTRIBUTE else default
+
+    def update(self, values):
+        for column, value in dict(values).items():
+            self[column] = value
+
+    def to_dict(self) -> dict:
+        return {column: getattr(self, attribute) for attribute, column in FIELDS}
+
+
+class ColumnarAccumulator:
+    """
+    Zbiera rekordy ofert bezpośrednio w listach kolumn (bezpieczne dla wątków).
+    DataFrame powstaje z gotowych kolumn bez ponownego ustalania schematu z każdego rekordu.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = {column: [] for column in COLUMNS}
+
+    def append(self, record):
+        """Dodaje OfferRecord (albo słownik z tymi samymi kluczami)."""
+        if isinstance(record, OfferRecord):
+            values = [getattr(record, attribute) for attribute, _ in FIELDS]
+        else:
+            values = [record.get(column, BRAK_DANYCH) for column in COLUMNS]
+        with self._lock:
+            for column, value in zip(COLUMNS, values):
+                self._columns[column].append(value)
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._columns["link"])
+
+    def links(self) -> list:
+        with self._lock:
+            return list(self._columns["link"])
+
+    def to_frame(self) -> pd.DataFrame:
+        with self._lock:
+            return pd.DataFrame(self._columns, columns=COLUMNS, copy=False)
+
+    def drain(self) -> pd.DataFrame:
+        """Zwraca zebrane wiersze jako DataFrame i czyści bufor (zapis porcjami)."""
+        with self._lock:
+            columns = self._columns
+            self._columns = {column: [] for column in COLUMNS}
+        return pd.DataFrame(columns, columns=COLUMNS, copy=False)
@@ -0,0 +1,253 @@
+"""
+Harmonogram odświeżania cen: każda oferta ma własny termin następnego sprawdzenia zamiast
+pobierania wszystkich linków przy każdej aktualizacji.
+
+Odstęp między sprawdzeniami wynika z historii cen (price_history.PriceHistory):
+    - oczekiwany czas między zmianami ceny = (dni obserwacji + PRIOR_DAYS) / (liczba zmian + 1);
+      PRIOR_DAYS wygładza ocenę ofert z krótką historią,
+    - oferta jest sprawdzana po CHECK_FRACTION tego czasu, w granicach MIN/MAX_INTERVAL_DAYS,
+    - nowe oferty (młodsze niż NEW_OFFER_DAYS) zmieniają cenę częściej - odstęp jest mniejszy,
+    - oferta, której nie było na liście wyników od ostatniego sprawdzenia, jest sprawdzana
+      najszybciej, jak się da - zwykle oznacza to, że zniknęła.
+Dzienny przebieg sprawdza najwyżej budget ofert, zaczynając od najdłużej zaległych; reszta
+czeka do następnego dnia. Oferty z odpowiedzią 404/410 (albo po MAX_FAILURES kolejnych
+nieudanych sprawdzeniach) są wycofywane i nie są już pobierane. Strona pobrana poprawnie, ale bez
+ceny (np. "Zapytaj o cenę") nie jest błędem - oferta czeka dotychczasowy odstęp.
+
+    python refresh_scheduler.py --add dane_2025_01_01.parquet
+    python refresh_scheduler.py --budget 2000
+    python refresh_scheduler.py --status
+"""
+import argparse
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from get_price_update import fetch_price, get_prices
+from price_history import PriceHistory
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedule (
+    link TEXT PRIMARY KEY,
+    first_seen REAL NOT NULL,
+    last_seen REAL,
+    last_checked REAL,
+    next_check REAL NOT NULL,
+    interval_days REAL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    retired REAL
+);
+CREATE INDEX IF NOT EXISTS schedule_next_check ON schedule (next_check) WHERE retired IS NULL;
+"""
+
+DAY = 86400.0
+DAILY_BUDGET = 2000
+MIN_INTERVAL_DAYS = 1.0
+MAX_INTERVAL_DAYS = 30.0
+PRIOR_DAYS = 14.0
+CHECK_FRACTION = 0.5
+NEW_OFFER_DAYS = 14.0
+NEW_OFFER_FACTOR = 0.5
+MAX_FAILURES = 5
+GONE_STATUSES = (404, 410)
+# limit parametrów w jednym zapytaniu SQL
+SQL_BATCH = 500
+
+
+def refresh_intervals(changes, observed_days, age_days, listed) -> np.ndarray:
+    """
+    Odstęp do następnego sprawdzenia w dniach (wzór w opisie modułu); argumenty to tablice
+    tej samej długości.
+    """
+    changes = np.asarray(changes, dtype=np.float64)
+    expected = (np.asarray(observed_days, dtype=np.float64) + PRIOR_DAYS) / (changes + 1)
+    interval = CHECK_FRACTION * expected
+    interval = np.where(np.asarray(age_days) < NEW_OFFER_DAYS, interval * NEW_OFFER_FACTOR, interval)
+    interval = np.where(np.asarray(listed, dtype=bool), interval, MIN_INTERVAL_DAYS)
+    return np.clip(interval, MIN_INTERVAL_DAYS, MAX_INTERVAL_DAYS)
+
+
+class RefreshScheduler:
+    """
+    Terminy sprawdzeń ofert w SQLite, bezpieczne dla wątków.
+
+    Args:
+        path (str): Plik bazy harmonogramu.
+        history (PriceHistory): Historia cen - źródło zmienności i miejsce zapisu nowych cen.
+    """
+
+    def __init__(self, path="refresh_schedule.sqlite", history=None):
+        self.path = path
+        self.history = history if history is not None else PriceHistory()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def add(self, links, now=None) -> int:
+        """Dodaje nowe oferty (do sprawdzenia od razu). Zwraca liczbę dodanych."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO schedule (link, first_seen, next_check) VALUES (?, ?, ?)",
+                ((link, now, now) for link in links),
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def mark_seen(self, links, now=None):
+        """
+        Oferty widoczne na liście wyników: aktualizuje last_seen (i dodaje nieznane).
+        Bez wywołań mark_seen obecność na liście wyników nie wpływa na terminy.
+        """
+        now = now if now is not None else time.time()
+        links = list(links)
+        self.add(links, now)
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE schedule SET last_seen = ? WHERE link = ? AND retired IS NULL",
+                ((now, link) for link in links),
+            )
+            self._conn.commit()
+
+    def due(self, budget=DAILY_BUDGET, now=None) -> list:
+        """Najwyżej budget ofert z minionym terminem sprawdzenia, od najdłużej zaległych."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT link FROM schedule WHERE retired IS NULL AND next_check <= ? ORDER BY next_check LIMIT ?",
+                (now, budget),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def record_results(self, results, now=None) -> dict:
+        """
+        Zapisuje wyniki sprawdzeń ({link: (kod HTTP, cena)} z get_prices(..., fetch=fetch_price);
+        None - wyjątek), dopisuje ceny do historii i wyznacza kolejne terminy.
+
+        Returns:
+            dict: Liczba sprawdzonych, wycofanych, pobranych bez ceny i nieudanych ofert.
+        """
+        now = now if now is not None else time.time()
+        prices = {link: result[1] for link, result in results.items() if result is not None and result[1] is not None}
+        gone = [link for link, result in results.items() if result is not None and result[0] in GONE_STATUSES]
+        # strona pobrana, ale bez ceny - oferta istnieje, więc to nie jest nieudane sprawdzenie
+        no_price = [link for link, result in results.items()
+                    if link not in prices and result is not None and result[0] == 200]
+        failed = [link for link in results if link not in prices and link not in gone and link not in no_price]
+        if prices:
+            self.history.record(prices, datetime.fromtimestamp(now))
+
+        stats = self.history.change_stats().set_index("link").reindex(list(prices))
+        with self._lock:
+            rows = {}
+            checked = list(prices)
+            for start in range(0, len(checked), SQL_BATCH):
+                batch = checked[start:start + SQL_BATCH]
+                rows.update((row[0], row[1:]) for row in self._conn.execute(
+                    f"SELECT link, first_seen, last_seen, last_checked FROM schedule "
+                    f"WHERE link IN ({','.join('?' * len(batch))})", batch))
+            checked = [link for link in checked if link in rows]
+            if checked:
+                link_stats = stats.loc[checked]
+                # znaczniki czasu historii są lokalne (datetime.now()), jak fromisoformat().timestamp()
+                first_ts = np.array([datetime.fromisoformat(ts).timestamp() for ts in link_stats["first_ts"]])
+                last_ts = np.array([datetime.fromisoformat(ts).timestamp() for ts in link_stats["last_ts"]])
+                first_seen = np.fmin(np.array([rows[link][0] for link in checked], dtype=np.float64), first_ts)
+                last_seen = np.array([rows[link][1] if rows[link][1] is not None else np.nan for link in checked],
+                                     dtype=np.float64)
+                last_checked = np.array([rows[link][2] or 0.0 for link in checked], dtype=np.float64)
+                interval = refresh_intervals(
+                    link_stats["changes"].to_numpy(),
+                    (last_ts - first_ts) / DAY,
+                    (now - first_seen) / DAY,
+                    # brak na liście wyników od poprzedniego sprawdzenia - oferta pewnie zniknęła
+                    np.isnan(last_seen) | (last_seen >= last_checked),
+                )
+                self._conn.executemany(
+                    "UPDATE schedule SET last_checked = ?, next_check = ?, interval_days = ?, failures = 0 "
+                    "WHERE link = ?",
+                    ((now, now + days * DAY, float(days), link) for link, days in zip(checked, interval)),
+                )
+            self._conn.executemany(
+                "UPDATE schedule SET last_checked = ?, retired = ? WHERE link = ?",
+                ((now, now, link) for link in gone),
+            )
+            # bez ceny: kolejne sprawdzenie po dotychczasowym odstępie, bez liczenia jako błąd
+            self._conn.executemany(
+                "UPDATE schedule SET last_checked = ?, next_check = ? + COALESCE(interval_days, ?) * ?, "
+                "failures = 0 WHERE link = ?",
+                ((now, now, MIN_INTERVAL_DAYS, DAY, link) for link in no_price),
+            )
+            # chwilowy błąd: ponowienie następnego dnia, po MAX_FAILURES - wycofanie
+            self._conn.executemany(
+                "UPDATE schedule SET last_checked = ?, next_check = ?, failures = failures + 1, "
+                "retired = CASE WHEN failures + 1 >= ? THEN ? END WHERE link = ?",
+                ((now, now + MIN_INTERVAL_DAYS * DAY, MAX_FAILURES, now, link) for link in failed),
+            )
+            self._conn.commit()
+        return {"sprawdzone": len(results), "wycofane": len(gone), "bez ceny": len(no_price),
+                "nieudane": len(failed)}
+
+    def refresh(self, budget=None, max_threads=16, on_result=None, now=None, links=None) -> dict:
+        """
+        Sprawdza oferty z minionym terminem (najwyżej budget, domyślnie DAILY_BUDGET).
+
+        Args:
+            links: Oferty do sprawdzenia wybrane wcześniej przez due(); domyślnie due(budget).
+
+        Returns:
+            dict: {link: (kod HTTP, cena)}; (None, None) - wyjątek przy pobieraniu.
+        """
+        if links is None:
+            links = self.due(budget or DAILY_BUDGET, now)
+        results = get_prices(links, max_threads=max_threads, fetch=fetch_price)
+        results = {link: result if result is not None else (None, None) for link, result in results.items()}
+        summary = self.record_results(results, now)
+        if on_result is not None:
+            for link, (status, price) in results.items():
+                on_result(link, price)
+        print(f"Odświeżanie cen: {summary}")
+        return results
+
+    def counts(self, now=None) -> dict:
+        """Liczba ofert aktywnych, do sprawdzenia teraz i wycofanych."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            active, due, retired = self._conn.execute(
+                "SELECT SUM(retired IS NULL), SUM(retired IS NULL AND next_check <= ?), SUM(retired IS NOT NULL) "
+                "FROM schedule", (now,),
+            ).fetchone()
+        return {"aktywne": active or 0, "do sprawdzenia": due or 0, "wycofane": retired or 0}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dzienne odświeżanie cen w ramach limitu zapytań")
+    parser.add_argument("--schedule", default="refresh_schedule.sqlite")
+    parser.add_argument("--history", default="price_history.sqlite")
+    parser.add_argument("--add", default=None, metavar="PATH",
+                        help="dodaj linki z pliku danych (CSV, .parquet albo .csv.zst) i zakończ")
+    parser.add_argument("--budget", type=int, default=DAILY_BUDGET, help="najwyżej tyle zapytań w przebiegu")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--status", action="store_true", help="pokaż stan harmonogramu i zakończ")
+    args = parser.parse_args()
+
+    scheduler = RefreshScheduler(args.schedule, PriceHistory(args.history))
+    if args.add:
+        from snapshot import read_snapshot
+
+        data = pd.read_csv(args.add) if args.add.endswith(".csv") else read_snapshot(args.add)
+        print(f"Dodano ofert: {scheduler.add(data['link'].dropna().unique())}")
+    elif args.status:
+        print(scheduler.counts())
+    else:
+        scheduler.refresh(args.budget, max_threads=args.threads)
+        print(scheduler.counts())
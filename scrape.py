@@ -1,22 +1,62 @@
+import argparse
 from datetime import datetime
 
-from get_data_mulithreaded import get_data_multithreaded
-from get_offers import get_offers
+import http_client
+import instrumentation
+from fingerprints import FingerprintStore
+from get_offers import DEFAULT_TARGET
+from pipeline import crawl_pipeline
+from seen_offers import SeenOffers
+from snapshot import write_snapshot
+from text_index import TextIndex
 from upload_to_drive import upload_file
 
 if __name__ == "__main__":
-    #gets offers
-    lista_ofert = get_offers(pages=120)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--target", default=DEFAULT_TARGET,
+                        help="wyszukiwanie: nazwa z get_offers.SEARCH_TARGETS albo ścieżka wyników otodom.pl")
+    parser.add_argument("--delta", action="store_true", help="pobierz tylko nowe oferty i oferty ze zmienioną ceną")
+    parser.add_argument("--skip-unchanged", action="store_true",
+                        help="nie parsuj stron ofert niezmienionych od ostatniego pobrania (fingerprints.sqlite)")
+    parser.add_argument("--index", action="store_true",
+                        help="aktualizuj indeks tytułów i opisów (text_index.sqlite) w trakcie crawla")
+    parser.add_argument("--trace", action="store_true",
+                        help="zapisz pomiary etapów (flat_finder_trace.json, flat_finder_metrics.prom)")
+    parser.add_argument("--profile-slowest", type=int, default=0, metavar="N",
+                        help="zapisz profile cProfile N najwolniejszych ofert (wymaga --trace)")
+    parser.add_argument("--snapshot-format", choices=["parquet", "csv.zst", "csv"], default="parquet",
+                        help="format pliku wysyłanego na Dysk (csv - bez kompresji)")
+    parser.add_argument("--upload-chunk-mb", type=int, default=16, help="rozmiar porcji wysyłania na Dysk w MiB")
+    args = parser.parse_args()
+    if args.trace:
+        instrumentation.enable(profile_slowest=args.profile_slowest)
 
-
-    #gets data for the offers
-    data = get_data_multithreaded(lista_ofert=lista_ofert)
-
-
-    #saves the data
     timestamp = datetime.now().strftime('%Y_%m_%d')
     nazwa_pliku = f'dane_{timestamp}.csv'
-    data.to_csv(nazwa_pliku, index= False)
 
-    #uploads to drive
-    upload_file(nazwa_pliku)
\ No newline at end of file
+    try:
+        #gets offers and data for the offers at the same time, saving rows in chunks
+        #(a restarted run resumes from nazwa_pliku + '.done')
+        seen_store = SeenOffers("seen_offers.sqlite") if args.delta else None
+        text_index = TextIndex("text_index.sqlite") if args.index else None
+        fingerprints = FingerprintStore("fingerprints.sqlite") if args.skip_unchanged else None
+        zapisane = crawl_pipeline(pages=args.pages, seen_store=seen_store, output_path=nazwa_pliku,
+                                  text_index=text_index, target=args.target, fingerprints=fingerprints)
+        print(f"Zapisano ofert: {zapisane}")
+        print(f"HTTP: {http_client.stats.snapshot()}")
+        print(f"Tempo: {http_client.controller.snapshot()}")
+        if fingerprints is not None:
+            print(f"Odciski stron: {fingerprints.snapshot()}")
+            fingerprints.close()
+
+        #compressed snapshot with a fixed schema instead of the raw CSV
+        if args.snapshot_format != "csv":
+            nazwa_pliku = write_snapshot(nazwa_pliku, snapshot_format=args.snapshot_format)
+            print(f"Migawka: {nazwa_pliku}")
+
+        #uploads to drive
+        upload_file(nazwa_pliku, chunk_size=args.upload_chunk_mb * 1024 * 1024)
+    finally:
+        # pomiary także z przerwanego crawla albo nieudanego wysyłania
+        instrumentation.tracer.export()
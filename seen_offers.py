@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+import time
+
+# Trwała lista ofert widzianych w poprzednich przebiegach (tryb delta).
+# listing_price to cena ze strony wyników przy ostatnim przeglądzie,
+# scraped_price to cena z chwili ostatniego udanego pobrania strony oferty.
+# Oferta wymaga pobrania, gdy nie była jeszcze pobrana albo te ceny się różnią.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen_offers (
+    path TEXT PRIMARY KEY,
+    listing_price REAL,
+    scraped_price REAL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_scraped REAL
+);
+"""
+
+
+class SeenOffers:
+    """Magazyn widzianych ofert w SQLite, bezpieczny dla wątków."""
+
+    def __init__(self, path="seen_offers.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def observe(self, listing: dict):
+        """
+        Zapisuje oferty ze strony wyników ({ścieżka: cena albo None}).
+
+        Returns:
+            tuple: (all_known, to_fetch) - czy wszystkie oferty były już znane
+                   oraz lista ścieżek do pobrania (nowe albo ze zmienioną ceną).
+        """
+        now = time.time()
+        to_fetch = []
+        all_known = True
+        with self._lock:
+            for path, price in listing.items():
+                row = self._conn.execute(
+                    "SELECT scraped_price, last_scraped FROM seen_offers WHERE path = ?", (path,)
+                ).fetchone()
+                if row is None:
+                    all_known = False
+                    self._conn.execute(
+                        "INSERT INTO seen_offers (path, listing_price, first_seen, last_seen) VALUES (?, ?, ?, ?)",
+                        (path, price, now, now),
+                    )
+                    to_fetch.append(path)
+                    continue
+
+                scraped_price, last_scraped = row
+                self._conn.execute(
+                    "UPDATE seen_offers SET listing_price = COALESCE(?, listing_price), last_seen = ? WHERE path = ?",
+                    (price, now, path),
+                )
+                if last_scraped is None or (price is not None and price != scraped_price):
+                    to_fetch.append(path)
+            self._conn.commit()
+        return all_known, to_fetch
+
+    def mark_scraped(self, path):
+        """Strona oferty została pobrana - bieżąca cena z listy wyników staje się ceną odniesienia."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE seen_offers SET scraped_price = listing_price, last_scraped = ? WHERE path = ?",
+                (time.time(), path),
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM seen_offers").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
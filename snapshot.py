@@ -0,0 +1,92 @@
+import io
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import zstandard
+
+from cleanup import CATEGORY_COLUMNS, RENAMED_COLUMNS, TEXT_COLUMNS, kolejnosc
+
+# Skompresowana migawka dziennego crawla do wysłania na Dysk.
+# Crawl zapisuje wiersze porcjami do zwykłego CSV (output_sink.py), bo tylko taki plik da się
+# bezpiecznie dopisywać i wznawiać; po zakończeniu jest on przepisywany do Parquet (zstd)
+# albo CSV skompresowanego zstd, ze stałym schematem zamiast typów zgadywanych przy odczycie.
+
+ROW_GROUP_SIZE = 50_000
+ZSTD_LEVEL = 9
+
+
+def _output_name(column):
+    return RENAMED_COLUMNS.get(column, column)
+
+
+def _arrow_type(column):
+    if column in CATEGORY_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    if column in TEXT_COLUMNS:
+        return pa.string()
+    # kolumny liczbowe oraz Piętro i liczba pięter w budynku
+    return pa.float32()
+
+
+SNAPSHOT_SCHEMA = pa.schema([pa.field(_output_name(column), _arrow_type(column)) for column in kolejnosc])
+
+# te same typy po stronie pandas - do odczytu CSV bez zgadywania typów
+PANDAS_DTYPES = {
+    _output_name(column): "category" if column in CATEGORY_COLUMNS
+    else "string" if column in TEXT_COLUMNS
+    else "float32"
+    for column in kolejnosc
+}
+
+
+def _read_chunks(source, chunk_size):
+    """Czyta plik CSV z crawla porcjami, od razu z typami z PANDAS_DTYPES."""
+    return pd.read_csv(source, dtype=PANDAS_DTYPES, chunksize=chunk_size)
+
+
+def snapshot_path(source, snapshot_format="parquet"):
+    """dane_2025_01_01.csv -> dane_2025_01_01.parquet albo dane_2025_01_01.csv.zst"""
+    base = source[:-len(".csv")] if source.endswith(".csv") else source
+    return f"{base}.{snapshot_format}"
+
+
+def write_snapshot(source, path=None, snapshot_format="parquet", chunk_size=ROW_GROUP_SIZE) -> str:
+    """
+    Przepisuje CSV z crawla do skompresowanej migawki ze schematem SNAPSHOT_SCHEMA.
+
+    Args:
+        source (str): Plik CSV zapisany przez crawl_pipeline / stream_data_multithreaded.
+        path (str): Plik wynikowy; domyślnie nazwa source z rozszerzeniem snapshot_format.
+        snapshot_format (str): "parquet" (kompresja zstd) albo "csv.zst".
+        chunk_size (int): Liczba wierszy czytanych naraz (grupa wierszy w Parquet).
+
+    Returns:
+        str: Ścieżka zapisanej migawki.
+    """
+    path = path or snapshot_path(source, snapshot_format)
+    tmp_path = path + ".tmp"
+    # zapis do pliku tymczasowego - przerwany zapis nie zostawia uszkodzonej migawki do wysłania
+    if snapshot_format == "parquet":
+        with pq.ParquetWriter(tmp_path, SNAPSHOT_SCHEMA, compression="zstd") as writer:
+            for chunk in _read_chunks(source, chunk_size):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=SNAPSHOT_SCHEMA, preserve_index=False))
+    elif snapshot_format == "csv.zst":
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+        with open(tmp_path, "wb") as f, compressor.stream_writer(f) as compressed, \
+                io.TextIOWrapper(compressed, encoding="utf-8", newline="") as text:
+            for i, chunk in enumerate(_read_chunks(source, chunk_size)):
+                chunk.to_csv(text, header=i == 0, index=False)
+    else:
+        raise ValueError(f"Nieznany format migawki: {snapshot_format}")
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot(path) -> pd.DataFrame:
+    """Wczytuje migawkę (Parquet albo CSV zstd) z typami kolumn ze schematu."""
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    with open(path, "rb") as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+        return pd.read_csv(io.TextIOWrapper(reader, encoding="utf-8"), dtype=PANDAS_DTYPES)
@@ -0,0 +1,72 @@
+"""
+Silniki pobierania (wątki, asyncio) na lokalnym zastępniku otodom.pl (fake_otodom.py):
+ten sam wynik dla tych samych ofert, także gdy serwer losowo odpowiada 503.
+
+    python -m pytest test_engines.py
+"""
+import pandas as pd
+import pytest
+
+import http_client
+from fake_otodom import FakeOtodom, listing_page
+from get_data_async import get_data_async
+from get_data_mulithreaded import get_data_multithreaded
+from get_offers import extract_offer_links
+from rate_control import ConcurrencyController
+
+PAGES = 2
+OFFERS_PER_PAGE = 20
+
+
+@pytest.fixture
+def otodom(request):
+    """Serwer z odsetkiem błędów 503 z parametru testu; http_client kierowany na serwer."""
+    fake = FakeOtodom(pages=PAGES, offers_per_page=OFFERS_PER_PAGE, error_rate=getattr(request, "param", 0.0))
+    fake.start()
+    original_base_url, original_retries = http_client.BASE_URL, http_client.MAX_RETRIES
+    original_controller = http_client.controller
+    # więcej ponowień niż domyślnie - przy 30% błędów oferta nie może przepaść przez pecha
+    http_client.configure(base_url=fake.base_url, max_retries=10,
+                          rate_controller=ConcurrencyController(initial=16, rate=200, min_rate=50))
+    yield fake
+    http_client.configure(base_url=original_base_url, max_retries=original_retries,
+                          rate_controller=original_controller)
+    fake.stop()
+
+
+def offer_paths():
+    return [path for page in range(1, PAGES + 1)
+            for path in extract_offer_links(listing_page(page, OFFERS_PER_PAGE), "html.parser")]
+
+
+def by_link(data_set):
+    return data_set.sort_values("link").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("otodom", [0.0, 0.3], indirect=True, ids=["bez błędów", "30% 503"])
+def test_engines_return_same_frame(otodom):
+    paths = offer_paths()
+
+    threaded = by_link(get_data_multithreaded(paths))
+    asynchronous = by_link(get_data_async(paths))
+
+    assert len(threaded) == len(paths)
+    assert not (threaded["Tytuł oferty"] == "brak danych").any()
+    pd.testing.assert_frame_equal(threaded, asynchronous)
+
+
+@pytest.mark.parametrize("otodom", [1.0], indirect=True, ids=["same 503"])
+def test_failed_offers_are_skipped_by_both_engines(otodom):
+    http_client.configure(max_retries=0)
+    paths = offer_paths()[:5]
+
+    threaded = get_data_multithreaded(paths)
+    asynchronous = get_data_async(paths)
+
+    # oferta, której nie udało się pobrać, nie daje wiersza "brak danych"
+    assert len(threaded) == 0
+    pd.testing.assert_frame_equal(threaded, asynchronous)
+
+
+def test_empty_offer_list(otodom):
+    pd.testing.assert_frame_equal(get_data_multithreaded([]), get_data_async([]))
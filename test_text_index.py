@@ -0,0 +1,39 @@
+"""
+Indeks tekstowy (text_index.py) na ramkach z clean_offers - kolumny tekstowe string[pyarrow],
+w których brakujące wartości to pd.NA.
+
+    python -m pytest test_text_index.py
+"""
+from cleanup import clean_offers
+from get_data_mulithreaded import empty_offer
+from text_index import TextIndex, tokenize
+
+
+def offer(path, title, description=None):
+    record = empty_offer(f"https://www.otodom.pl/pl/oferta/{path}")
+    record["Tytuł oferty"] = title
+    if description is not None:
+        record["Opis"] = description
+    return record
+
+
+def test_indexes_clean_offers_with_missing_description(tmp_path):
+    data_set = clean_offers([
+        offer("a", "Mieszkanie z balkonem"),
+        offer("b", "Kawalerka", "Garaż w cenie, <b>bez pośredników</b>"),
+    ])
+    assert data_set["Opis"].isna().iloc[0]
+    index = TextIndex(str(tmp_path / "text_index.sqlite"))
+
+    assert index.add_offers(data_set) == 2
+    assert index.search("balkonem") == ["https://www.otodom.pl/pl/oferta/a"]
+    assert index.search('"bez posrednikow" garaz') == ["https://www.otodom.pl/pl/oferta/b"]
+    # ten sam tekst - bez ponownego indeksowania
+    assert index.add_offers(data_set) == 0
+    index.close()
+
+
+def test_tokenize_skips_missing_values():
+    assert tokenize(None) == []
+    assert tokenize(float("nan")) == []
+    assert tokenize(clean_offers([offer("a", "Kawalerka")])["Opis"].iloc[0]) == []
@@ -0,0 +1,288 @@
+"""
+upload_to_drive.py against a fake Drive service (FakeDrive below) - folders, files
+and batch requests kept in memory, errors as googleapiclient.errors.HttpError.
+Resumable uploads go through the real client library and a scripted Drive endpoint
+(googleapiclient.http.HttpMockSequence).
+
+    python -m pytest test_upload_to_drive.py
+"""
+import itertools
+import json
+import re
+import threading
+import time
+
+import google_auth_httplib2
+import httplib2
+import pytest
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMockSequence
+
+import upload_to_drive
+
+FOLDER = "application/vnd.google-apps.folder"
+CHUNK = 256 * 1024
+SESSION = "https://upload.fake/session"
+NEW_SESSION = "https://upload.fake/new-session"
+UPLOADED = json.dumps({"id": "uploaded", "name": "dane.csv"})
+
+
+def http_error(status):
+    return HttpError(httplib2.Response({"status": status}), b'{"error": {"message": "fake"}}')
+
+
+class FakeRequest:
+    def __init__(self, run):
+        self._run = run
+
+    def execute(self, http=None):
+        return self._run()
+
+
+class FakeBatch:
+    def __init__(self, drive, callback):
+        self.drive = drive
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        with self.drive.lock:
+            self.drive.batch_calls.append((threading.get_ident(), http))
+            self.drive.in_flight += 1
+            self.drive.max_in_flight = max(self.drive.max_in_flight, self.drive.in_flight)
+        # czas na nałożenie się równoległych batchy
+        time.sleep(0.01)
+        for request_id, request in self.requests:
+            try:
+                response, exception = request.execute(), None
+            except HttpError as e:
+                response, exception = None, e
+            self.callback(request_id, response, exception)
+        with self.drive.lock:
+            self.drive.in_flight -= 1
+
+
+class FakeFiles:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q, spaces=None, fields=None, pageToken=None):
+        def run():
+            parent = re.search(r"'([^']+)' in parents", q).group(1)
+            if parent != "root" and parent not in self.drive.items:
+                raise http_error(404)
+            name = re.search(r"name='([^']+)'", q)
+            items = [
+                dict(item, id=item_id) for item_id, item in self.drive.items.items()
+                if parent in item["parents"]
+                and (name is None or item["name"] == name.group(1))
+                and ((item["mimeType"] == FOLDER) == ("mimeType='" + FOLDER in q))
+            ]
+            return {"files": items}
+        return FakeRequest(run)
+
+    def create(self, body, fields=None, media_body=None):
+        return FakeRequest(lambda: {"id": self.drive.add(body["name"], body["parents"][0], body.get("mimeType"))})
+
+    def update(self, fileId, addParents, removeParents, fields=None):
+        def run():
+            with self.drive.lock:
+                item = self.drive.items.get(fileId)
+                if item is None or addParents not in self.drive.items:
+                    raise http_error(404)
+                item["parents"] = [addParents if parent == removeParents else parent for parent in item["parents"]]
+                return {"id": fileId, "parents": item["parents"]}
+        return FakeRequest(run)
+
+
+class FakeDrive:
+    def __init__(self):
+        self.items = {}
+        self.lock = threading.Lock()
+        self.batch_calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._ids = itertools.count(1)
+
+    def add(self, name, parent, mime_type=None, md5=None):
+        item_id = f"id{next(self._ids)}"
+        self.items[item_id] = {"name": name, "parents": [parent], "mimeType": mime_type or "text/csv",
+                               "md5Checksum": md5}
+        return item_id
+
+    def children(self, parent):
+        return sorted(item["name"] for item in self.items.values() if parent in item["parents"])
+
+    def files(self):
+        return FakeFiles(self)
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+@pytest.fixture
+def drive(tmp_path, monkeypatch):
+    """FakeDrive podstawiony pod upload_file; pliki stanu (drive_folders.json) w tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    fake = FakeDrive()
+    monkeypatch.setattr(upload_to_drive, "load_credentials", lambda: Credentials(token="fake"))
+    monkeypatch.setattr(upload_to_drive, "build", lambda *args, **kwargs: fake)
+    return fake
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    """Wywołania upload_file_to_folder (folder docelowy) zamiast wysyłania pliku."""
+    calls = []
+
+    def fake_upload(service, file_path, folder_id, **kwargs):
+        calls.append(folder_id)
+        return {"id": "uploaded", "name": file_path}
+
+    monkeypatch.setattr(upload_to_drive, "upload_file_to_folder", fake_upload)
+    return calls
+
+
+def test_batches_use_one_connection_per_thread(drive):
+    source = drive.add("OtoDom", "root", FOLDER)
+    archive = drive.add("Archive", source, FOLDER)
+    for i in range(upload_to_drive.BATCH_SIZE * 6):
+        drive.add(f"dane_{i}.csv", source)
+
+    result = upload_to_drive.move_files_to_folder(drive, source, archive, Credentials(token="fake"))
+
+    assert result == {"moved": upload_to_drive.BATCH_SIZE * 6, "failed": {}, "not_found": []}
+    assert all(isinstance(http, google_auth_httplib2.AuthorizedHttp) for _, http in drive.batch_calls)
+    threads_by_http = {}
+    for thread, http in drive.batch_calls:
+        threads_by_http.setdefault(id(http), set()).add(thread)
+    assert all(len(threads) == 1 for threads in threads_by_http.values())
+    assert len(threads_by_http) == len({thread for thread, _ in drive.batch_calls}) > 1
+
+
+def test_batches_without_credentials_run_one_at_a_time(drive):
+    source = drive.add("OtoDom", "root", FOLDER)
+    archive = drive.add("Archive", source, FOLDER)
+    for i in range(upload_to_drive.BATCH_SIZE * 3):
+        drive.add(f"dane_{i}.csv", source)
+
+    result = upload_to_drive.move_files_to_folder(drive, source, archive)
+
+    assert result["moved"] == upload_to_drive.BATCH_SIZE * 3
+    assert drive.max_in_flight == 1
+    assert {http for _, http in drive.batch_calls} == {None}
+
+
+def test_upload_file_forgets_archive_deleted_on_drive(drive, uploads, tmp_path):
+    source = drive.add("OtoDom", "root", FOLDER)
+    drive.add("stare.csv", source)
+    # Archive z cache usunięty na Drive - listowanie OtoDom działa, 404 dopiero w batchu
+    (tmp_path / "drive_folders.json").write_text(
+        f'{{"root/OtoDom": "{source}", "{source}/Archive": "usuniety"}}')
+    (tmp_path / "nowe.csv").write_text("link\n")
+
+    upload_to_drive.upload_file("nowe.csv")
+
+    archive = next(item_id for item_id, item in drive.items.items() if item["name"] == "Archive")
+    assert drive.children(archive) == ["stare.csv"]
+    assert uploads == [source]
+    assert archive in (tmp_path / "drive_folders.json").read_text()
+
+
+def test_upload_file_forgets_folders_after_failed_upload(drive, monkeypatch, tmp_path):
+    drive.add("OtoDom", "root", FOLDER)
+    (tmp_path / "nowe.csv").write_text("link\n")
+    monkeypatch.setattr(upload_to_drive, "upload_file_to_folder", lambda *args, **kwargs: None)
+
+    upload_to_drive.upload_file("nowe.csv")
+
+    assert not (tmp_path / "drive_folders.json").exists()
+
+
+def test_upload_file_skips_unchanged_content(drive, uploads, tmp_path):
+    source = drive.add("OtoDom", "root", FOLDER)
+    (tmp_path / "dane.csv").write_text("link\n")
+    drive.add("wczoraj.csv", source, md5=upload_to_drive.file_md5("dane.csv"))
+    drive.add("starsze.csv", source, md5="inne")
+
+    upload_to_drive.upload_file("dane.csv")
+
+    assert uploads == []
+    assert drive.children(source) == ["Archive", "starsze.csv", "wczoraj.csv"]
+
+
+@pytest.fixture
+def data_file(tmp_path, monkeypatch):
+    """Plik na trzy porcje po CHUNK bajtów i stan przerwanego wysyłania (sesja SESSION)."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "dane.csv").write_bytes(bytes(range(256)) * (3 * CHUNK // 256))
+    md5 = upload_to_drive.file_md5("dane.csv")
+    (tmp_path / "dane.csv.upload.json").write_text(json.dumps({"md5": md5, "resumable_uri": SESSION}))
+    return "dane.csv"
+
+
+def upload(data_file, responses):
+    http = HttpMockSequence(responses)
+    file = upload_to_drive.upload_file_to_folder(build("drive", "v3", http=http), data_file, "folder",
+                                                 chunk_size=CHUNK)
+    # (metoda, adres, Content-Range) kolejnych zapytań
+    return file, [(method, uri.split("?")[0], (headers or {}).get("Content-Range"))
+                  for uri, method, body, headers in http.request_sequence]
+
+
+def test_upload_resumes_interrupted_session(data_file, tmp_path):
+    file, requests = upload(data_file, [
+        ({"status": "308", "range": "bytes=0-262143"}, ""),
+        ({"status": "308", "range": "bytes=0-524287"}, ""),
+        ({"status": "200"}, UPLOADED),
+    ])
+
+    assert file["id"] == "uploaded"
+    assert requests == [
+        ("PUT", SESSION, "bytes */786432"),
+        ("PUT", SESSION, "bytes 262144-524287/786432"),
+        ("PUT", SESSION, "bytes 524288-786431/786432"),
+    ]
+    assert not (tmp_path / "dane.csv.upload.json").exists()
+
+
+def test_upload_of_finished_session_is_not_repeated(data_file):
+    file, requests = upload(data_file, [({"status": "200"}, UPLOADED)])
+
+    assert file["id"] == "uploaded"
+    assert requests == [("PUT", SESSION, "bytes */786432")]
+
+
+@pytest.mark.parametrize("status", ["404", "410"])
+def test_upload_restarts_expired_session(data_file, status):
+    file, requests = upload(data_file, [
+        ({"status": "308", "range": "bytes=0-262143"}, ""),
+        ({"status": status}, ""),
+        ({"status": "200", "location": NEW_SESSION}, ""),
+        ({"status": "308", "range": "bytes=0-262143"}, ""),
+        ({"status": "308", "range": "bytes=0-524287"}, ""),
+        ({"status": "200"}, UPLOADED),
+    ])
+
+    assert file["id"] == "uploaded"
+    assert [request[0] for request in requests] == ["PUT", "PUT", "POST", "PUT", "PUT", "PUT"]
+    assert requests[3:] == [
+        ("PUT", NEW_SESSION, "bytes 0-262143/786432"),
+        ("PUT", NEW_SESSION, "bytes 262144-524287/786432"),
+        ("PUT", NEW_SESSION, "bytes 524288-786431/786432"),
+    ]
+
+
+def test_failed_upload_keeps_session_for_next_run(data_file, tmp_path):
+    file, _ = upload(data_file, [
+        ({"status": "308", "range": "bytes=0-262143"}, ""),
+        ({"status": "400"}, ""),
+    ])
+
+    assert file is None
+    assert SESSION in (tmp_path / "dane.csv.upload.json").read_text()
@@ -0,0 +1,282 @@
+"""
+Trwały indeks odwrócony tytułów i opisów ofert (SQLite), aktualizowany przyrostowo w trakcie crawla.
+
+Słowa są zapisywane małymi literami i bez polskich znaków (ą -> a, ł -> l, ...), więc "garaż",
+"GARAZ" i "garaz" to to samo słowo. Dla każdego słowa i oferty przechowywane są pozycje w tekście,
+co pozwala na wyszukiwanie fraz.
+
+Składnia zapytań:
+    balkon garaż            - oba słowa (AND)
+    balkon OR taras         - którekolwiek
+    -parter, NOT parter     - bez słowa
+    "bez pośredników"       - fraza (kolejne słowa w tytule albo w opisie)
+    balkon*                 - prefiks (balkon, balkonem, balkonu, ...)
+
+    python text_index.py '"bez pośredników" balkon* -parter'
+"""
+import argparse
+import array
+import hashlib
+import html
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from datetime import date
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id INTEGER PRIMARY KEY,
+    link TEXT NOT NULL UNIQUE,
+    text_hash TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    term_id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL,
+    field INTEGER NOT NULL,
+    positions BLOB NOT NULL,
+    PRIMARY KEY (term_id, doc_id, field)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+"""
+
+# pola indeksowane w kolejności numerów pól w tabeli postings
+FIELDS = ('Tytuł oferty', 'Opis')
+
+# polskie litery zamieniane od razu (ł nie rozkłada się w NFKD na l + znak diakrytyczny);
+# pozostałe znaki diakrytyczne usuwa wolniejsza ścieżka przez NFKD.
+# Kolejne str.replace są dla długich opisów kilkakrotnie szybsze niż str.translate ze słownikiem.
+_FOLD = (("ą", "a"), ("ć", "c"), ("ę", "e"), ("ł", "l"), ("ń", "n"), ("ó", "o"), ("ś", "s"), ("ź", "z"), ("ż", "z"))
+_TAG = re.compile(r"<[^>]+>")
+_TOKEN = re.compile(r"\w+")
+# dla tekstu ASCII: znaki spoza \w na spacje i str.split - ten sam wynik co _TOKEN.findall, ok. 2x szybciej
+_NON_WORD = str.maketrans({chr(code): " " for code in range(128) if not (chr(code).isalnum() or chr(code) == "_")})
+_QUERY = re.compile(r'-?"[^"]*"|\S+')
+# limit parametrów w jednym zapytaniu SQL (SQLite pozwala na co najmniej 999)
+SQL_BATCH = 500
+
+
+def fold(text) -> str:
+    """Małe litery bez znaków diakrytycznych: "Garaż Łódź" -> "garaz lodz"."""
+    text = str(text).lower()
+    for letter, folded in _FOLD:
+        text = text.replace(letter, folded)
+    if text.isascii():
+        return text
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text) -> list:
+    """Słowa tekstu (bez znaczników HTML z opisów) po fold()."""
+    if pd.isna(text):  # None, NaN albo pd.NA (kolumny string[pyarrow] z clean_offers)
+        return []
+    text = str(text)
+    if "&" in text:
+        text = html.unescape(text)
+    if "<" in text:
+        text = _TAG.sub(" ", text)
+    text = fold(text)
+    if text.isascii():
+        return text.translate(_NON_WORD).split()
+    return _TOKEN.findall(text)
+
+
+class TextIndex:
+    """Indeks odwrócony w SQLite, bezpieczny dla wątków."""
+
+    def __init__(self, path="text_index.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def _term_ids(self, terms):
+        ids = {}
+        for term in terms:
+            self._conn.execute("INSERT OR IGNORE INTO terms (term) VALUES (?)", (term,))
+        for term in terms:
+            ids[term] = self._conn.execute("SELECT term_id FROM terms WHERE term = ?", (term,)).fetchone()[0]
+        return ids
+
+    def add_offers(self, data_set, snapshot=None) -> int:
+        """
+        Dodaje albo aktualizuje oferty (DataFrame z kolumnami link, 'Tytuł oferty', 'Opis').
+        Oferty o niezmienionym tekście mają tylko przesuwaną datę last_seen.
+
+        Returns:
+            int: Liczba (prze)indeksowanych ofert.
+        """
+        snapshot = snapshot or date.today().isoformat()
+        now = time.time()
+        indexed = 0
+        rows = zip(data_set['link'], *(data_set[field] for field in FIELDS))
+        with self._lock:
+            for link, *texts in rows:
+                if pd.isna(link):
+                    continue
+                tokens = [tokenize(text) for text in texts]
+                text_hash = hashlib.blake2b("\x00".join(" ".join(t) for t in tokens).encode(), digest_size=16).hexdigest()
+                row = self._conn.execute("SELECT doc_id, text_hash FROM docs WHERE link = ?", (link,)).fetchone()
+                if row is not None and row[1] == text_hash:
+                    self._conn.execute("UPDATE docs SET last_seen = MAX(last_seen, ?) WHERE doc_id = ?",
+                                       (snapshot, row[0]))
+                    continue
+
+                if row is None:
+                    doc_id = self._conn.execute(
+                        "INSERT INTO docs (link, text_hash, first_seen, last_seen, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                        (link, text_hash, snapshot, snapshot, now),
+                    ).lastrowid
+                else:
+                    doc_id = row[0]
+                    self._conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+                    self._conn.execute(
+                        "UPDATE docs SET text_hash = ?, last_seen = MAX(last_seen, ?), indexed_at = ? WHERE doc_id = ?",
+                        (text_hash, snapshot, now, doc_id),
+                    )
+
+                term_ids = self._term_ids({term for field_tokens in tokens for term in field_tokens})
+                postings = []
+                for field, field_tokens in enumerate(tokens):
+                    positions = {}
+                    for position, term in enumerate(field_tokens):
+                        positions.setdefault(term, array.array("I")).append(position)
+                    postings.extend((term_ids[term], doc_id, field, p.tobytes()) for term, p in positions.items())
+                self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", postings)
+                indexed += 1
+            self._conn.commit()
+        return indexed
+
+    @staticmethod
+    def _term_condition(term):
+        """Warunek SQL na term_id dla słowa albo prefiksu ("balkon*") i jego parametry."""
+        if term.endswith("*"):
+            # zakres [prefix, prefix + znak większy od każdej litery) korzysta z indeksu UNIQUE
+            prefix = term[:-1]
+            return "term_id IN (SELECT term_id FROM terms WHERE term >= ? AND term < ?)", [prefix, prefix + "\uffff"]
+        return "term_id = (SELECT term_id FROM terms WHERE term = ?)", [term]
+
+    def _docs_with_term(self, term) -> set:
+        condition, params = self._term_condition(term)
+        return {row[0] for row in self._conn.execute(f"SELECT DISTINCT doc_id FROM postings WHERE {condition}", params)}
+
+    def _positions(self, term, doc_ids) -> dict:
+        """{(doc_id, pole): zbiór pozycji} słowa w podanych ofertach."""
+        result = {}
+        if not doc_ids:
+            return result
+        condition, params = self._term_condition(term)
+        sql = f"SELECT doc_id, field, positions FROM postings WHERE {condition}"
+        if len(doc_ids) <= SQL_BATCH:
+            # mało kandydatów - odczyt po kluczu (term_id, doc_id) zamiast wszystkich wystąpień słowa
+            sql += f" AND doc_id IN ({','.join('?' * len(doc_ids))})"
+            params = params + list(doc_ids)
+        for doc_id, field, blob in self._conn.execute(sql, params):
+            if doc_id in doc_ids:
+                result.setdefault((doc_id, field), set()).update(array.array("I", blob))
+        return result
+
+    def _docs_with_phrase(self, words) -> set:
+        if not words:
+            return set()
+        candidates = self._docs_with_term(words[0])
+        for word in words[1:]:
+            candidates &= self._docs_with_term(word)
+        if len(words) == 1 or not candidates:
+            return candidates
+        # fraza: słowo i-te na pozycji start + i w tym samym polu
+        starts = self._positions(words[0], candidates)
+        for offset, word in enumerate(words[1:], start=1):
+            positions = self._positions(word, candidates)
+            starts = {key: {start for start in value if start + offset in positions.get(key, ())}
+                      for key, value in starts.items()}
+        return {doc_id for (doc_id, _), value in starts.items() if value}
+
+    def _docs_for(self, token) -> set:
+        if token.startswith('"'):
+            return self._docs_with_phrase(tokenize(token.strip('"')))
+        words = tokenize(token.rstrip("*"))
+        if token.endswith("*") and words:
+            # samo "*" nie jest prefiksem - tokenize zwraca wtedy pustą listę
+            words[-1] += "*"
+        return self._docs_with_phrase(words)
+
+    def search(self, query, since=None) -> list:
+        """
+        Zwraca linki ofert pasujących do zapytania (składnia w opisie modułu),
+        opcjonalnie tylko widzianych od daty since ("RRRR-MM-DD").
+        """
+        groups = [[]]
+        negate = False
+        for token in _QUERY.findall(query):
+            if token == "OR":
+                groups.append([])
+            elif token == "NOT":
+                negate = True
+            else:
+                if token.startswith("-") and len(token) > 1:
+                    negate, token = True, token[1:]
+                groups[-1].append((negate, token))
+                negate = False
+
+        with self._lock:
+            matched = set()
+            for group in groups:
+                positive = [token for negated, token in group if not negated]
+                if not positive:
+                    continue
+                docs = None
+                for token in positive:
+                    docs = self._docs_for(token) if docs is None else docs & self._docs_for(token)
+                    if not docs:
+                        break
+                for token in (token for negated, token in group if negated):
+                    if not docs:
+                        break
+                    docs -= self._docs_for(token)
+                matched |= docs or set()
+
+            matched = sorted(matched)
+            links = []
+            for start in range(0, len(matched), SQL_BATCH):
+                batch = matched[start:start + SQL_BATCH]
+                sql = f"SELECT link FROM docs WHERE doc_id IN ({','.join('?' * len(batch))})"
+                if since:
+                    sql += " AND last_seen >= ?"
+                    batch = batch + [since]
+                links.extend(row[0] for row in self._conn.execute(sql + " ORDER BY doc_id", batch))
+            return links
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wyszukiwanie ofert w indeksie tytułów i opisów")
+    parser.add_argument("query")
+    parser.add_argument("--index", default="text_index.sqlite")
+    parser.add_argument("--since", default=None, help="tylko oferty widziane od daty RRRR-MM-DD")
+    args = parser.parse_args()
+
+    index = TextIndex(args.index)
+    start = time.perf_counter()
+    links = index.search(args.query, args.since)
+    print("\n".join(links))
+    print(f"{len(links)} ofert, {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -1,16 +1,43 @@
+import concurrent.futures
+import hashlib
+import json
 import os
+import threading
+import time
+
+import google_auth_httplib2
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
 
+from instrumentation import tracer
+from rate_control import backoff_delay
+
 # If modifying these scopes, delete the file token.json.
 # We need 'drive' scope to list and manage all files, not just those created by the app.
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 
-def authenticate_google_drive():
-    """Authenticates with Google Drive API and returns the service object."""
+# Drive batch requests accept at most 100 calls each; several batches run in parallel.
+BATCH_SIZE = 100
+PARALLEL_BATCHES = 4
+# per-item errors worth retrying inside a batch (rate limits and server errors)
+RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+MAX_BATCH_RETRIES = 3
+
+# Resumable upload chunk size (must be a multiple of 256 KiB) and retries per chunk.
+UPLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+UPLOAD_RETRIES = 5
+
+# Folder IDs found by find_or_create_folder, so the lookups are not repeated every run.
+# Delete the file to force new lookups.
+FOLDER_CACHE_PATH = "drive_folders.json"
+
+def load_credentials():
+    """Loads (refreshing or re-authorizing if needed) the user's Google Drive credentials."""
     creds = None
     if os.path.exists("token.json"):
         creds = Credentials.from_authorized_user_file("token.json", SCOPES)
@@ -22,9 +49,39 @@ def authenticate_google_drive():
             creds = flow.run_local_server(port=0)
         with open("token.json", "w") as token:
             token.write(creds.to_json())
-    return build("drive", "v3", credentials=creds)
+    return creds
+
+
+def authenticate_google_drive():
+    """Authenticates with Google Drive API and returns the service object."""
+    return build("drive", "v3", credentials=load_credentials())
+
+def _load_folder_cache(cache_path):
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-def find_or_create_folder(service, folder_name, source_folder_name="root"):
+
+def _save_folder_cache(cache_path, folders):
+    if not cache_path:
+        return
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(folders, f, indent=2)
+    os.replace(tmp_path, cache_path)
+
+
+def forget_cached_folders(cache_path=FOLDER_CACHE_PATH):
+    """Removes the local folder ID cache (e.g. after a cached folder was deleted on Drive)."""
+    if cache_path and os.path.exists(cache_path):
+        os.remove(cache_path)
+
+
+def find_or_create_folder(service, folder_name, source_folder_name="root", cache_path=FOLDER_CACHE_PATH):
     """
     Finds the 'Archive' folder in the user's Drive. If not found, creates it.
 
@@ -32,10 +89,24 @@ def find_or_create_folder(service, folder_name, source_folder_name="root"):
         service: The authenticated Google Drive service object.
         folder_name (str): The desired name for the folder.
         source_folder_name (str): The desired name for the source folder.
+        cache_path (str): Local JSON file with known folder IDs (None disables the cache).
 
     Returns:
         str: The ID of the 'Archive' folder.
     """
+    folders = _load_folder_cache(cache_path)
+    cache_key = f"{source_folder_name}/{folder_name}"
+    if cache_key in folders:
+        return folders[cache_key]
+
+    folder_id = _find_or_create_folder(service, folder_name, source_folder_name)
+    if folder_id:
+        folders[cache_key] = folder_id
+        _save_folder_cache(cache_path, folders)
+    return folder_id
+
+
+def _find_or_create_folder(service, folder_name, source_folder_name):
     # Search for the folder
     query = (
         f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' "
@@ -68,15 +139,25 @@ def find_or_create_folder(service, folder_name, source_folder_name="root"):
         return folder.get("id")
 
 def move_files_to_folder(
-    service, source_folder_id, destination_folder_id
+    service, source_folder_id, destination_folder_id, credentials=None
 ):
     """
     Moves all non-folder files from a source folder (or root) to a destination folder.
+    The moves are sent as Drive batch requests of up to BATCH_SIZE files, PARALLEL_BATCHES
+    at a time; files that hit rate limits are retried in a later round.
 
     Args:
         service: The authenticated Google Drive service object.
         source_folder_id (str): The ID of the folder to check for files. Use 'root' for My Drive.
         destination_folder_id (str): The ID of the folder to move files into.
+        credentials: Credentials of the service. Each worker thread sends its batches through
+                     its own connection authorized with them; without credentials the batches
+                     go through the service's connection, one at a time.
+
+    Returns:
+        dict: {"moved": number of moved files, "failed": {file ID: error message},
+               "not_found": IDs of files whose move failed with 404, e.g. because
+               one of the folders no longer exists}.
     """
     print(f"\nChecking for files to move from '{source_folder_id}' to '{destination_folder_id}'...")
 
@@ -107,51 +188,205 @@ def move_files_to_folder(
 
     if not files_to_move:
         print("No files found to move.")
-        return
+        return {"moved": 0, "failed": {}, "not_found": []}
 
     print(f"Found {len(files_to_move)} files to move.")
 
+    pending = []
     for file_item in files_to_move:
-        file_id = file_item["id"]
-        file_name = file_item["name"]
-        current_parents = file_item.get("parents", [])
-
         # Ensure the destination folder is not already a parent to avoid errors
-        if destination_folder_id in current_parents:
-            print(f"Skipping '{file_name}' (ID: {file_id}) - already in archive.")
+        if destination_folder_id in file_item.get("parents", []):
+            print(f"Skipping '{file_item['name']}' (ID: {file_item['id']}) - already in archive.")
             continue
+        pending.append(file_item)
 
-        try:
-            # Remove the current parent and add the new parent
-            # If a file has multiple parents, we remove the specified source_folder_id
-            # and add the destination_folder_id.
-            # 'fields': Specifies what fields to return after the update
-            (
-                service.files()
-                .update(
-                    fileId=file_id,
-                    addParents=destination_folder_id,
-                    removeParents=source_folder_id,
-                    fields="id, parents",
-                )
-                .execute()
+    # httplib2.Http is not thread-safe: one authorized connection per worker thread
+    connections = threading.local()
+
+    def move_batch(batch):
+        if credentials is not None and not hasattr(connections, "http"):
+            connections.http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+        return _move_batch(service, batch, source_folder_id, destination_folder_id,
+                           http=getattr(connections, "http", None))
+
+    moved = 0
+    errors = {}
+    workers = PARALLEL_BATCHES if credentials is not None else 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for attempt in range(MAX_BATCH_RETRIES + 1):
+            if attempt:
+                time.sleep(backoff_delay(attempt - 1))
+            batches = [pending[i:i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)]
+            results = list(executor.map(move_batch, batches))
+
+            pending = []
+            for batch_moved, batch_errors in results:
+                moved += batch_moved
+                for file_item, error in batch_errors:
+                    if attempt < MAX_BATCH_RETRIES and _is_retryable(error):
+                        pending.append(file_item)
+                    else:
+                        errors[file_item["id"]] = (file_item["name"], error)
+            if not pending:
+                break
+
+    for file_id, (file_name, error) in errors.items():
+        print(f"Error moving '{file_name}' (ID: {file_id}): {error}")
+    print(f"Moved {moved} files to archive, {len(errors)} failed.")
+    return {
+        "moved": moved,
+        "failed": {file_id: str(error) for file_id, (_, error) in errors.items()},
+        "not_found": [file_id for file_id, (_, error) in errors.items()
+                      if isinstance(error, HttpError) and error.resp.status == 404],
+    }
+
+
+def _is_retryable(error):
+    if not isinstance(error, HttpError) or error.resp.status not in RETRY_STATUSES:
+        return False
+    # 403 is also used for missing permissions, which a retry does not fix
+    return error.resp.status != 403 or "rateLimitExceeded" in str(error.content)
+
+
+def _move_batch(service, file_items, source_folder_id, destination_folder_id, http=None):
+    """
+    Moves up to BATCH_SIZE files with one batch HTTP request, sent through http
+    (None - the service's own connection).
+
+    Returns:
+        tuple: (number of moved files, list of (file_item, exception) for failed files).
+    """
+    by_id = {file_item["id"]: file_item for file_item in file_items}
+    moved = []
+    errors = []
+
+    def callback(request_id, response, exception):
+        # called once per file; request_id is the file ID given to batch.add
+        if exception is not None:
+            errors.append((by_id[request_id], exception))
+        else:
+            moved.append(request_id)
+
+    batch = service.new_batch_http_request(callback=callback)
+    for file_id in by_id:
+        # Remove the current parent and add the new parent
+        batch.add(
+            service.files().update(
+                fileId=file_id,
+                addParents=destination_folder_id,
+                removeParents=source_folder_id,
+                fields="id, parents",
+            ),
+            request_id=file_id,
+        )
+    try:
+        batch.execute(http=http)
+    except Exception as e:
+        # the whole batch failed (e.g. connection error) - report every file in it
+        done = set(moved) | {file_item["id"] for file_item, _ in errors}
+        errors.extend((file_item, e) for file_id, file_item in by_id.items() if file_id not in done)
+    return len(moved), errors
+
+def file_md5(file_path, block_size=1024 * 1024):
+    """MD5 of a local file, comparable with Drive's md5Checksum field."""
+    digest = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_file_by_md5(service, folder_id, md5):
+    """Returns metadata of a file in folder_id with the given content hash, or None."""
+    query = (
+        f"'{folder_id}' in parents and "
+        "mimeType!='application/vnd.google-apps.folder' and "
+        "trashed=false"
+    )
+    page_token = None
+    while True:
+        results = (
+            service.files()
+            .list(
+                q=query,
+                spaces="drive",
+                fields="nextPageToken, files(id, name, md5Checksum)",
+                pageToken=page_token,
             )
-            print(f"Moved '{file_name}' (ID: {file_id}) to archive.")
-        except Exception as e:
-            print(f"Error moving '{file_name}' (ID: {file_id}): {e}")
+            .execute()
+        )
+        for file_item in results.get("files", []):
+            if file_item.get("md5Checksum") == md5:
+                return file_item
+        page_token = results.get("nextPageToken", None)
+        if not page_token:
+            return None
+
+
+def _upload_state_path(file_path):
+    return file_path + ".upload.json"
+
+
+def _load_upload_state(file_path, md5):
+    """Resumable session URI of an interrupted upload of the same content, or None."""
+    try:
+        with open(_upload_state_path(file_path)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("md5") != md5:
+        return None
+    return state.get("resumable_uri")
+
+
+def _forget_upload_state(file_path):
+    if os.path.exists(_upload_state_path(file_path)):
+        os.remove(_upload_state_path(file_path))
+
+
+def _upload_session_status(http, resumable_uri, size):
+    """
+    Asks Drive how much of an interrupted upload it has received (an empty PUT to the session URI).
+
+    Returns:
+        tuple: (number of received bytes, None) for an unfinished upload,
+               (None, file metadata) when the upload had already finished.
+
+    Raises:
+        HttpError: e.g. 404/410 when the session has expired.
+    """
+    resp, content = http.request(
+        resumable_uri, "PUT", headers={"Content-Range": f"bytes */{size}", "Content-Length": "0"}
+    )
+    if resp.status in (200, 201):
+        return None, json.loads(content)
+    if resp.status != 308:
+        raise HttpError(resp, content, uri=resumable_uri)
+    # "bytes=0-N"; no Range header means nothing was received yet
+    received = resp.get("range")
+    return (int(received.split("-")[1]) + 1 if received else 0), None
+
 
 def upload_file_to_folder(
-    service, file_path, folder_id, new_file_name=None
+    service, file_path, folder_id, new_file_name=None, chunk_size=UPLOAD_CHUNK_SIZE, md5=None
 ):
     """
     Uploads a file to a specific Google Drive folder.
 
+    The file is sent in chunk_size pieces through a resumable upload session. Failed chunks are
+    retried by the client library; if the upload still fails, the session URI is kept in
+    file_path + '.upload.json' and the next call with the same file asks Drive how much it
+    received and continues from there instead of starting over. When that session has expired
+    (404/410), the upload is restarted with a new session.
+
     Args:
         service: The authenticated Google Drive service object.
         file_path (str): The path to the file you want to upload.
         folder_id (str): The ID of the target Google Drive folder.
         new_file_name (str, optional): The name to give the file on Google Drive.
                                        If None, the original file name is used.
+        chunk_size (int): Upload chunk size in bytes (a multiple of 256 KiB).
+        md5 (str, optional): Precomputed MD5 of the file.
 
     Returns:
         dict: The uploaded file's metadata.
@@ -162,36 +397,74 @@ def upload_file_to_folder(
 
     if new_file_name is None:
         new_file_name = os.path.basename(file_path)
+    md5 = md5 or file_md5(file_path)
 
     file_metadata = {
         "name": new_file_name,
         "parents": [folder_id],
     }
-    media = MediaFileUpload(file_path, resumable=True)
-
-    try:
-        file = (
-            service.files()
-            .create(body=file_metadata, media_body=media, fields="id, name")
-            .execute()
+    resumable_uri = _load_upload_state(file_path, md5)
+    for attempt in range(2):
+        # a new upload and request for every attempt - a restart begins with a new session
+        media = MediaFileUpload(file_path, chunksize=chunk_size, resumable=True)
+        request = service.files().create(
+            body=file_metadata, media_body=media, fields="id, name, md5Checksum"
         )
-        print(f"File ID: {file.get('id')}")
-        print(f"File Name: {file.get('name')}")
-        print(f"File '{new_file_name}' uploaded successfully to folder ID '{folder_id}'!")
-        return file
-    except Exception as e:
-        print(f"An error occurred during upload: {e}")
-        return None
+        file = None
+        try:
+            if resumable_uri:
+                received, file = _upload_session_status(request.http, resumable_uri, media.size())
+                if file is None:
+                    print(f"Resuming interrupted upload of '{new_file_name}' at byte {received}...")
+                    request.resumable_uri = resumable_uri
+                    request.resumable_progress = received
+            while file is None:
+                status, file = request.next_chunk(num_retries=UPLOAD_RETRIES)
+                if request.resumable_uri and request.resumable_uri != resumable_uri:
+                    resumable_uri = request.resumable_uri
+                    with open(_upload_state_path(file_path), "w") as f:
+                        json.dump({"md5": md5, "resumable_uri": resumable_uri}, f)
+                if status:
+                    print(f"Uploaded {int(status.progress() * 100)}%")
+        except HttpError as e:
+            if resumable_uri and e.resp.status in (404, 410) and not attempt:
+                # the upload session expired - start over with a new one
+                print(f"Upload session of '{new_file_name}' expired - restarting the upload.")
+                _forget_upload_state(file_path)
+                resumable_uri = None
+                continue
+            print(f"An error occurred during upload: {e}")
+            return None
+        except Exception as e:
+            print(f"An error occurred during upload: {e}")
+            return None
+        break
 
-def upload_file(file_path: str):
+    _forget_upload_state(file_path)
+    if file.get("md5Checksum") not in (None, md5):
+        print(f"Warning: checksum mismatch for '{new_file_name}' ({file.get('md5Checksum')} != {md5})")
+    print(f"File ID: {file.get('id')}")
+    print(f"File Name: {file.get('name')}")
+    print(f"File '{new_file_name}' uploaded successfully to folder ID '{folder_id}'!")
+    return file
+
+@tracer.traced("upload", "drive")
+def upload_file(file_path: str, chunk_size=UPLOAD_CHUNK_SIZE, skip_unchanged=True):
+    """
+    Archives the files currently in the OtoDom folder and uploads file_path there.
+    With skip_unchanged, nothing is moved or uploaded when the OtoDom folder already
+    holds a file with the same content (MD5), e.g. when a finished run is repeated.
+    """
     TARGET_UPLOAD_FOLDER_NAME = "OtoDom"
 
     ARCHIVE_FOLDER_NAME = "Archive"
 
     # Authenticate and get the Drive service
-    drive_service = authenticate_google_drive()
+    credentials = load_credentials()
+    drive_service = build("drive", "v3", credentials=credentials)
 
-    if drive_service:
+    md5 = file_md5(file_path) if os.path.exists(file_path) else None
+    for attempt in range(2):
         otodom_folder_id = find_or_create_folder(
             drive_service, TARGET_UPLOAD_FOLDER_NAME
         )
@@ -200,25 +473,45 @@ def upload_file(file_path: str):
         archive_folder_id = find_or_create_folder(
             drive_service, ARCHIVE_FOLDER_NAME, otodom_folder_id
         )
+        if not archive_folder_id:
+            print("Could not get or create the Archive folder. Aborting upload.")
+            return
+
+        try:
+            if skip_unchanged and md5:
+                existing = find_file_by_md5(drive_service, otodom_folder_id, md5)
+                if existing:
+                    print(f"'{existing['name']}' (ID: {existing['id']}) has the same content - skipping upload.")
+                    return
 
-        if archive_folder_id:
             # 2. Move existing non-folder files to the 'Archive' folder
-            move_files_to_folder(
-                drive_service, otodom_folder_id, archive_folder_id
+            moved = move_files_to_folder(
+                drive_service, otodom_folder_id, archive_folder_id, credentials
             )
+            folder_missing = bool(moved["not_found"])
+        except HttpError as e:
+            if e.resp.status != 404 or attempt:
+                raise
+            folder_missing = True
+        if not folder_missing or attempt:
+            break
+        # a cached folder no longer exists (404 from a listing or from a move in a batch) -
+        # look the folders up again (once)
+        print("A cached folder was not found on Drive - looking the folders up again.")
+        forget_cached_folders()
 
-            # 3. Upload the new file to the specified target folder
-            print(f"\nAttempting to upload '{file_path}' to '{otodom_folder_id}'...")
-            uploaded_file_info = upload_file_to_folder(
-                drive_service,
-                file_path,
-                otodom_folder_id,
-            )
-            if uploaded_file_info:
-                print("\nUpload complete.")
-            else:
-                print("\nFile upload failed.")
-        else:
-            print("Could not get or create the Archive folder. Aborting upload.")
+    # 3. Upload the new file to the specified target folder
+    print(f"\nAttempting to upload '{file_path}' to '{otodom_folder_id}'...")
+    uploaded_file_info = upload_file_to_folder(
+        drive_service,
+        file_path,
+        otodom_folder_id,
+        chunk_size=chunk_size,
+        md5=md5,
+    )
+    if uploaded_file_info:
+        print("\nUpload complete.")
     else:
-        print("Failed to authenticate with Google Drive.")
\ No newline at end of file
+        # the target folder may be gone as well - the next run looks it up again
+        forget_cached_folders()
+        print("\nFile upload failed.")
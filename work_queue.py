@@ -0,0 +1,250 @@
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# Trwała kolejka zadań crawla w SQLite dla wielu procesów (worker.py).
+# Zadanie to strona wyników (kind='listing', payload = numer strony) albo strona oferty
+# (kind='offer', payload = ścieżka). Worker pobiera zadania z dzierżawą (lease) na określony czas;
+# zadanie, którego dzierżawa wygasła (worker padł albo się zawiesił), wraca do kolejki.
+# Pobieranie zadań odbywa się w transakcji BEGIN IMMEDIATE, więc dwa procesy nie dostaną tego samego.
+#
+# Workery na kilku maszynach muszą widzieć ten sam plik bazy; SQLite wymaga wtedy systemu plików
+# z działającymi blokadami (np. lokalny dysk współdzielony przez kontenery - NFS bywa zawodny).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY,
+    run TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    target TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (run, kind, payload)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (run, status, kind);
+CREATE TABLE IF NOT EXISTS rate_budget (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    rate REAL NOT NULL,
+    burst REAL NOT NULL,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+Job = namedtuple("Job", "job_id run kind target payload attempts")
+
+
+def _connect(path):
+    # isolation_level=None - transakcje otwierane jawnie (BEGIN IMMEDIATE), timeout - czekanie na blokadę
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class WorkQueue:
+    """
+    Kolejka zadań crawla (bezpieczna dla wątków i procesów).
+
+    Args:
+        path (str): Plik bazy SQLite współdzielony przez workery.
+        run (str): Identyfikator przebiegu, np. data; zadania z innych przebiegów są pomijane.
+    """
+
+    def __init__(self, path="work_queue.sqlite", run="default"):
+        self.path = path
+        self.run = run
+        self._lock = threading.Lock()
+        self._conn = _connect(path)
+
+    def _transaction(self, function):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = function(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, kind, target, payloads) -> int:
+        """Dodaje zadania (istniejące w tym przebiegu są pomijane). Zwraca liczbę nowych zadań."""
+        now = time.time()
+        rows = [(self.run, kind, target, str(payload), now, now) for payload in payloads]
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (run, kind, target, payload, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return conn.total_changes - before
+
+        return self._transaction(insert)
+
+    def claim(self, worker_id, lease_seconds=300.0, limit=1) -> list:
+        """
+        Dzierżawi do limit zadań na lease_seconds sekund. Najpierw wraca do kolejki wszystko,
+        czego dzierżawa wygasła; strony wyników mają pierwszeństwo przed ofertami.
+        """
+        def claim_jobs(conn):
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'pending', lease_owner = NULL, updated = ? "
+                "WHERE run = ? AND status = 'leased' AND lease_expires < ?",
+                (now, self.run, now),
+            )
+            rows = conn.execute(
+                "SELECT job_id, run, kind, target, payload, attempts FROM jobs "
+                "WHERE run = ? AND status = 'pending' ORDER BY kind = 'offer', job_id LIMIT ?",
+                (self.run, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE job_id = ?",
+                [(worker_id, now + lease_seconds, now, row[0]) for row in rows],
+            )
+            return [Job(*row[:5], row[5] + 1) for row in rows]
+
+        return self._transaction(claim_jobs)
+
+    def renew(self, jobs, worker_id, lease_seconds=300.0) -> int:
+        """Przedłuża dzierżawę zadań, które nadal należą do worker_id. Zwraca liczbę przedłużonych."""
+        now = time.time()
+
+        def renew_jobs(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE jobs SET lease_expires = ?, updated = ? "
+                "WHERE job_id = ? AND status = 'leased' AND lease_owner = ?",
+                [(now + lease_seconds, now, job.job_id, worker_id) for job in jobs],
+            )
+            return conn.total_changes - before
+
+        return self._transaction(renew_jobs)
+
+    def complete(self, jobs, worker_id) -> int:
+        """
+        Oznacza zadania jako wykonane. Zadanie, którego dzierżawa wygasła i które przejął
+        inny worker, nie jest zmieniane. Zwraca liczbę oznaczonych zadań.
+        """
+        now = time.time()
+
+        def complete_jobs(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires = NULL, updated = ? "
+                "WHERE job_id = ? AND status = 'leased' AND lease_owner = ?",
+                [(now, job.job_id, worker_id) for job in jobs],
+            )
+            return conn.total_changes - before
+
+        return self._transaction(complete_jobs)
+
+    def fail(self, job, worker_id, error, max_attempts=5):
+        """Zwraca zadanie do kolejki albo, po max_attempts próbach, oznacza je jako nieudane."""
+        now = time.time()
+        status = "failed" if job.attempts >= max_attempts else "pending"
+
+        def fail_job(conn):
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, last_error = ?, updated = ? "
+                "WHERE job_id = ? AND status = 'leased' AND lease_owner = ?",
+                (status, str(error)[:500], now, job.job_id, worker_id),
+            )
+
+        self._transaction(fail_job)
+
+    def counts(self) -> dict:
+        """{(rodzaj, status): liczba zadań} w bieżącym przebiegu."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, status, COUNT(*) FROM jobs WHERE run = ? GROUP BY kind, status", (self.run,)
+            ).fetchall()
+        return {(kind, status): count for kind, status, count in rows}
+
+    def unfinished(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE run = ? AND status IN ('pending', 'leased')", (self.run,)
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SharedRateBudget:
+    """
+    Token bucket zapisany w bazie kolejki: jeden limit zapytań na sekundę dla wszystkich workerów
+    i wszystkich wyszukiwań. Ma ten sam interfejs co rate_control.TokenBucket (acquire, rate),
+    więc można go podstawić jako http_client.controller.bucket - zmiany tempa po 429/5xx
+    (AIMD) w jednym workerze obowiązują wtedy wszystkie.
+    """
+
+    def __init__(self, path="work_queue.sqlite", rate=None, burst=None):
+        self._lock = threading.Lock()
+        self._conn = _connect(path)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            initial_rate = rate or 10.0
+            initial_burst = burst or max(initial_rate, 1.0)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO rate_budget (id, rate, burst, tokens, updated) VALUES (1, ?, ?, ?, ?)",
+                (initial_rate, initial_burst, initial_burst, now),
+            )
+            if rate is not None:
+                self._conn.execute("UPDATE rate_budget SET rate = ?, burst = ? WHERE id = 1",
+                                   (initial_rate, initial_burst))
+            self._conn.execute("COMMIT")
+
+    def _take(self):
+        """Pobiera token, jeśli jest; zwraca 0 albo czas do pojawienia się następnego tokenu."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rate, burst, tokens, updated = self._conn.execute(
+                    "SELECT rate, burst, tokens, updated FROM rate_budget WHERE id = 1").fetchone()
+                now = time.time()
+                tokens = min(burst, tokens + max(now - updated, 0.0) * rate)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / rate
+                self._conn.execute("UPDATE rate_budget SET tokens = ?, updated = ? WHERE id = 1", (tokens, now))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return wait
+
+    def acquire(self):
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    @property
+    def rate(self) -> float:
+        with self._lock:
+            return self._conn.execute("SELECT rate FROM rate_budget WHERE id = 1").fetchone()[0]
+
+    @rate.setter
+    def rate(self, value):
+        with self._lock:
+            self._conn.execute("UPDATE rate_budget SET rate = ? WHERE id = 1", (float(value),))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
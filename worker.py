@@ -0,0 +1,170 @@
+"""
+Tryb rozproszony: dowolna liczba procesów (na jednej albo kilku maszynach) pobiera zadania
+ze wspólnej kolejki (work_queue.py) i dopisuje wyniki do wspólnego katalogu.
+
+    python worker.py seed --targets warszawa-sprzedaz-mieszkanie warszawa-wynajem-mieszkanie --pages 120 --rate 10
+    python worker.py work --output-dir wyniki      # w dowolnej liczbie procesów
+    python worker.py status
+    python worker.py merge --output-dir wyniki dane.csv
+
+Każdy worker zapisuje wiersze do własnego pliku part-<worker>.csv w output-dir, więc procesy nie
+piszą do jednego pliku. Zadanie jest oznaczane jako wykonane dopiero po zapisaniu jego wyników;
+gdy worker padnie wcześniej, zadanie wraca do kolejki po wygaśnięciu dzierżawy. Oferta może wtedy
+trafić do wyników dwa razy - merge usuwa powtórzenia po linku.
+"""
+import argparse
+import concurrent.futures
+import glob
+import os
+import socket
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import http_client
+from cleanup import clean_offers
+from get_data_mulithreaded import fetch_and_parse_offer
+from get_offers import DEFAULT_TARGET, fetch_listing_page
+from output_sink import CsvSink
+from records import ColumnarAccumulator
+from work_queue import SharedRateBudget, WorkQueue
+
+
+def seed(queue, targets, pages) -> int:
+    """Dodaje strony wyników 1..pages każdego wyszukiwania. Zwraca liczbę nowych zadań."""
+    return sum(queue.enqueue("listing", target, range(1, pages + 1)) for target in targets)
+
+
+def _run_job(job):
+    if job.kind == "listing":
+        return fetch_listing_page(int(job.payload), job.target)
+    return fetch_and_parse_offer(job.payload)
+
+
+def run_worker(queue, output_dir, worker_id=None, max_threads=16, lease_seconds=300.0, max_attempts=5,
+               poll_interval=5.0) -> int:
+    """
+    Przetwarza zadania, dopóki w kolejce są niewykonane zadania bieżącego przebiegu.
+
+    Args:
+        queue (WorkQueue): Wspólna kolejka.
+        output_dir (str): Wspólny katalog wyników.
+        worker_id (str): Identyfikator workera; domyślnie host-pid.
+        max_threads (int): Liczba wątków pobierających; worker dzierżawi max_threads * 2 zadań naraz.
+        lease_seconds (float): Czas dzierżawy. Dopóki paczka zadań jest w toku, worker przedłuża
+                               dzierżawę co lease_seconds / 3; zadania workera, który padł,
+                               wracają do kolejki najpóźniej po lease_seconds.
+        max_attempts (int): Po tylu nieudanych próbach zadanie jest oznaczane jako nieudane.
+        poll_interval (float): Odstęp sprawdzania kolejki, gdy wszystkie zadania są wydzierżawione.
+
+    Returns:
+        int: Liczba zapisanych ofert.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    os.makedirs(output_dir, exist_ok=True)
+    sink = CsvSink(os.path.join(output_dir, f"part-{worker_id}.csv"))
+    written = 0
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+        while True:
+            jobs = queue.claim(worker_id, lease_seconds, limit=max_threads * 2)
+            if not jobs:
+                if queue.unfinished() == 0:
+                    break
+                # pozostałe zadania mają inni workerzy - czekamy, aż skończą albo dzierżawy wygasną
+                time.sleep(poll_interval)
+                continue
+
+            results = ColumnarAccumulator()
+            done = []
+            futures = {executor.submit(_run_job, job): job for job in jobs}
+            pending = set(futures)
+            renewed = time.monotonic()
+            while pending:
+                finished, pending = concurrent.futures.wait(
+                    pending, timeout=lease_seconds / 3, return_when=concurrent.futures.FIRST_COMPLETED)
+                if time.monotonic() - renewed >= lease_seconds / 3:
+                    # wyniki paczki są zapisywane razem - dzierżawa wszystkich zadań musi trwać do complete
+                    queue.renew(jobs, worker_id, lease_seconds)
+                    renewed = time.monotonic()
+                for future in finished:
+                    job = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as exc:
+                        print(f"{job.kind} {job.payload} wygenerowało wyjątek: {exc}")
+                        queue.fail(job, worker_id, exc, max_attempts)
+                        continue
+                    if job.kind == "listing":
+                        if result is None:
+                            # strony nie udało się pobrać - ponowienie, po max_attempts próbach zadanie nieudane
+                            queue.fail(job, worker_id, "nie udało się pobrać strony wyników", max_attempts)
+                            continue
+                        queue.enqueue("offer", job.target, result)
+                    else:
+                        results.append(result)
+                    done.append(job)
+
+            if len(results):
+                sink.write(clean_offers(results))
+                written += len(results)
+            queue.complete(done, worker_id)
+
+    return written
+
+
+def merge(output_dir, output_path) -> int:
+    """Łączy pliki part-*.csv workerów w jeden plik bez powtórzonych ofert. Zwraca liczbę wierszy."""
+    parts = sorted(glob.glob(os.path.join(output_dir, "part-*.csv")))
+    if not parts:
+        return 0
+    data = pd.concat((pd.read_csv(part) for part in parts), ignore_index=True)
+    data = data.drop_duplicates(subset="link", keep="last")
+    data.to_csv(output_path, index=False)
+    return len(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rozproszony crawl z kolejką zadań w SQLite")
+    parser.add_argument("--queue", default="work_queue.sqlite", help="plik kolejki współdzielony przez workery")
+    parser.add_argument("--run", default=datetime.now().strftime("%Y_%m_%d"), help="identyfikator przebiegu")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="dodaj strony wyników do kolejki")
+    seed_parser.add_argument("--targets", nargs="+", default=[DEFAULT_TARGET],
+                             help="nazwy z get_offers.SEARCH_TARGETS albo ścieżki wyników")
+    seed_parser.add_argument("--pages", type=int, default=120)
+    seed_parser.add_argument("--rate", type=float, default=None,
+                             help="wspólny limit zapytań na sekundę dla wszystkich workerów")
+
+    work_parser = commands.add_parser("work", help="przetwarzaj zadania z kolejki")
+    work_parser.add_argument("--output-dir", default="wyniki")
+    work_parser.add_argument("--worker-id", default=None)
+    work_parser.add_argument("--threads", type=int, default=16)
+    work_parser.add_argument("--lease", type=float, default=300.0, help="czas dzierżawy zadań w sekundach")
+
+    commands.add_parser("status", help="liczba zadań według rodzaju i stanu")
+
+    merge_parser = commands.add_parser("merge", help="połącz wyniki workerów w jeden plik CSV")
+    merge_parser.add_argument("--output-dir", default="wyniki")
+    merge_parser.add_argument("output")
+
+    args = parser.parse_args()
+    queue = WorkQueue(args.queue, args.run)
+
+    if args.command == "seed":
+        print(f"Dodano zadań: {seed(queue, args.targets, args.pages)}")
+        if args.rate is not None:
+            SharedRateBudget(args.queue, rate=args.rate).close()
+    elif args.command == "work":
+        # wspólny limit tempa w bazie kolejki zamiast lokalnego token bucket
+        http_client.controller.bucket = SharedRateBudget(args.queue)
+        zapisane = run_worker(queue, args.output_dir, args.worker_id, args.threads, args.lease)
+        print(f"Zapisano ofert: {zapisane}")
+        print(f"HTTP: {http_client.stats.snapshot()}")
+    elif args.command == "status":
+        for (kind, status), count in sorted(queue.counts().items()):
+            print(f"{kind:8} {status:8} {count}")
+    elif args.command == "merge":
+        print(f"Zapisano ofert: {merge(args.output_dir, args.output)}")